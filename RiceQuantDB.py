@@ -1,219 +1,399 @@
-from rqdatac import *
-import pandas as pd
-import numpy as np
-import datetime as dt
-from collections import defaultdict
-
-# 主力连续合约
-class DominantContractAnalyzer:
-    def __init__(self, future_symbol, rule=0, lookback_days=3, threshold=1.1,field='settlement'):
-        """
-        主力合约分析器初始化
-        参数:
-        - future_symbol: 期货品种代码(如'EG'表示乙二醇)
-        - rule: 主力月切换规则 ，= 0时为持续lookback_days天持仓大于原主力月  = 1时为首次持仓大于原主力月持仓的threshold倍
-        - lookback_days: 持续天数
-        - threshold: 倍数阈值
-        """
-        self.future_symbol = future_symbol
-        self._initialize_rqdata()
-        self.rule = rule
-        self.lookback_days = lookback_days
-        self.threshold = threshold
-        self.field=field
-        self.dominant_contract = self._analyze_dominant_contracts()
-        self.dominant_contract_close = self._fetch_data()
-
-    def _initialize_rqdata(self):
-        """初始化RiceQuant数据连接"""
-        try:
-            init()
-        except Exception as e:
-            raise ConnectionError(f"无法连接RQData: {str(e)}")
-
-    def _generate_contract_codes(self):
-        """生成要查询的合约代码列表"""
-        months = [f"{i:02d}" for i in range(1, 13)]
-        current_year_short = int(dt.datetime.today().strftime('%y'))
-        years = [f"{i:02d}" for i in range(current_year_short + 1, 10, -1)]
-        return [self.future_symbol + y + m for y in years for m in months]
-
-    def _fetch_open_interest_data(self):
-        """获取所有合约的持仓量数据"""
-        contract_codes = self._generate_contract_codes()
-        open_interest_data = pd.DataFrame()
-        for contract in contract_codes:
-            try:
-                data = get_price(contract,start_date='2000-01-01',end_date=dt.datetime.today(),fields=['open_interest']).droplevel(level='order_book_id').iloc[::-1]
-                data.columns = [contract[-4:]]
-                open_interest_data = pd.concat([open_interest_data, data],axis=1)
-            except Exception as e:
-                pass
-
-        return open_interest_data.sort_index(ascending=True)
-
-    def _fetch_data(self):
-        """获取所有合约的收盘价数据"""
-        contract_codes = self._generate_contract_codes()
-        close_data = pd.DataFrame()
-        for contract in contract_codes:
-            try:
-                data = get_price(contract,start_date='2000-01-01',end_date=dt.datetime.today(),fields=[self.field]).droplevel(level='order_book_id').iloc[::-1]
-                data.columns = [contract[-4:]]
-                close_data = pd.concat([close_data, data],axis=1)
-            except Exception as e:
-                pass
-
-        return close_data.sort_index(ascending=True)
-
-    def _find_next_main_contracts(self, start_index, candidates, reference_contract):
-        """
-        寻找次主力和次次主力合约
-        参数:
-        - start_index: 数组循环开始下标
-        - candidates: 按持仓量排序的合约列表
-        - reference_contract: 参考合约(通常是当前主力合约)
-
-        返回:
-        - (secondary_main, thirdly_main) 元组
-        """
-        for i in range(start_index, len(candidates)):
-            if int(candidates[i]) > int(reference_contract):
-                secondary = candidates[i]
-                for j in range(i+1, len(candidates)):
-                    if int(candidates[j]) > int(candidates[i]):
-                        return secondary, candidates[j]
-                return secondary, None
-        return None, None
-
-    def _analyze_dominant_contracts(self):
-        """
-        分析主力合约变化
-        返回:
-        - 包含主力、次主力和次次主力合约信息的DataFrame
-        """
-        open_interest = self._fetch_open_interest_data()
-        results = pd.DataFrame(
-            index=open_interest.index,
-            columns=[
-                'main', 'secondary_main', 'thirdly_main',
-                'main_oi', 'secondary_main_oi', 'thirdly_main_oi'
-            ]
-        )
-
-        current_main = None
-        secondary_main = None
-        thirdly_main = None
-        count = defaultdict(int)
-        for date, row in open_interest.iterrows():
-            sorted_contract = row.dropna().sort_values(ascending=False)
-            candidates = sorted_contract.index.tolist()
-
-            if not candidates:
-                continue
-
-            # 主力合约初始化或切换逻辑
-            if self.rule == 0:
-                # 初始化逻辑
-                if current_main is None:
-                    # 主力合约即为持仓量最大的合约
-                    current_main = candidates[0]
-                    # 次主力和次次主力为持仓量第二和第三的合约
-                    secondary_main, thirdly_main = self._find_next_main_contracts(1,candidates, current_main)
-                # 切换逻辑
-                elif int(candidates[0]) > int(current_main) and sorted_contract.loc[candidates[0]] > sorted_contract.loc[current_main]:
-                    # 当有其他月份的持仓超过主力合约持仓时，计数+1
-                    count[candidates[0]] = count[candidates[0]] + 1
-                    # 当有某合约计数超过设定天数时，切换主力合约为该合约
-                    if count[candidates[0]] >= self.lookback_days:
-                        current_main = candidates[0]
-                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
-                else:
-                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
-
-            elif self.rule == 1:
-                # 初始化逻辑
-                if (current_main is None):
-                    current_main = candidates[0]
-                    secondary_main, thirdly_main = self._find_next_main_contracts(1,candidates, current_main)
-                # 切换逻辑
-                # 出现月份持仓量超过主力月持仓量且比值大于1.1倍时,进行主力月切换
-                elif int(candidates[0]) > int(current_main) and sorted_contract.loc[candidates[0]] > self.threshold*sorted_contract.loc[current_main]:
-                    current_main = candidates[0]
-                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
-                # 出现月份持仓量超过主力月持仓量但比值小于1.1倍时，不进行主力月切换
-                else:
-                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
-
-            # 存储结果
-            results.loc[date] = [
-                current_main,
-                secondary_main,
-                thirdly_main,
-                sorted_contract.get(current_main, None),
-                sorted_contract.get(secondary_main, None),
-                sorted_contract.get(thirdly_main, None)
-            ]
-
-        return results
-
-    def get_dominant_contract(self,rank=0,start_date='2015-01-01',end_date=dt.datetime.today()):
-        """
-        分析主力合约列表
-        参数:
-        - rank=0: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
-        - start_date: 开始时间
-        - end_date: 结束时间
-        返回:
-        - 包含主力合约列表
-        """
-        columns = self.dominant_contract.columns.tolist()
-        r = {0:'main_contract',
-             1:'secondary_main_contract',}
-        if start_date is None:
-            result = self.dominant_contract.loc[:end_date,columns[rank]].sort_index(ascending=False)
-            return result.to_frame()
-        else:
-            result = self.dominant_contract.loc[start_date:end_date,columns[rank]].sort_index(ascending=False)
-            return result.to_frame()
-
-    def get_dominant_contract_price(self,rank=0,start_date='2015-01-01',end_date=dt.datetime.today()):
-        """
-        分析主力合约列表
-        参数:
-        - rank: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
-        - start_date: 开始时间
-        - end_date: 结束时间
-        返回:
-        - 主力合约价格
-        """
-        # 获取主力连续合约列表
-        dominant_contract = self.get_dominant_contract(rank,start_date,end_date)
-        column = dominant_contract.columns
-        dominant_contract_price = pd.DataFrame(index=dominant_contract.index,columns=[column[0]])
-        for date, row in dominant_contract.iterrows():
-            dominant_contract_price.loc[date,column[0]] = self.dominant_contract_close.loc[date,row[column[0]]]
-        return dominant_contract_price
-
-    def get_low_high_price(self,rank=0):
-        """
-        获取主力合约的最高最低价
-        参数:
-        - rank: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
-        - start_date: 开始时间
-        - end_date: 结束时间
-        返回:
-        - 主力合约的最高最低价
-        """
-        # 获取主力连续合约列表
-        dominant_contract = self.get_dominant_contract(rank)
-        dominant_contract['main'] = self.future_symbol + dominant_contract['main']
-        price_data = pd.DataFrame()
-        # 获取主力连续合约价格数据
-        for contract in sorted(set(dominant_contract['main'])):
-            min_date = min(dominant_contract[dominant_contract['main'] == contract].index.to_list())
-            max_date = max(dominant_contract[dominant_contract['main'] == contract].index.to_list())
-            price_data = pd.concat(
-                [price_data, get_price(contract, min_date, max_date, fields=['low', 'high', 'open', 'close'])], axis=0)
-        price_data = price_data.reset_index().set_index(['date'])
-        return price_data
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import datetime as dt
+from collections import defaultdict
+
+
+def contract_codes(future_symbol):
+    """生成要查询的合约代码列表：下一年至 2011 年的全部月份"""
+    months = [f"{i:02d}" for i in range(1, 13)]
+    current_year_short = int(dt.datetime.today().strftime('%y'))
+    years = [f"{i:02d}" for i in range(current_year_short + 1, 10, -1)]
+    return [future_symbol + y + m for y in years for m in months]
+
+
+class RQDataSource:
+    """
+    RQData 的共享数据层，同一进程内的分析器共用
+    - 首次取数时才导入 rqdatac 并 init，之后不再重复连接；导入本模块不会发起任何网络请求
+    - 一次 get_price 批量获取多个品种全部合约的日线（FIELDS 与调用方需要的字段一起获取），不再逐个合约请求
+    - 结果按品种缓存在内存中；cache_dir 非空时同时写入 <cache_dir>/<品种>_daily.csv，不超过 max_age_days 天时直接读取
+    """
+
+    FIELDS = ['open_interest', 'settlement', 'open', 'high', 'low', 'close']
+
+    def __init__(self, cache_dir=None, max_age_days=1.0, start_date='2000-01-01'):
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.start_date = start_date
+        self._rq = None
+        self._listed = None
+        self._frames = {}  # 品种 -> 日线，索引为 (order_book_id, date)
+        self._lock = threading.RLock()
+
+    def client(self):
+        """已初始化的 rqdatac 模块；未安装时抛出 ImportError，连接失败时抛出 ConnectionError"""
+        with self._lock:
+            if self._rq is None:
+                import rqdatac
+                try:
+                    rqdatac.init()
+                except Exception as e:
+                    raise ConnectionError(f"无法连接RQData: {str(e)}")
+                self._rq = rqdatac
+            return self._rq
+
+    def contracts(self, future_symbol):
+        """品种的合约代码，只保留米筐合约列表中存在的合约（列表获取失败时不筛选）"""
+        codes = contract_codes(future_symbol)
+        with self._lock:
+            if self._listed is None:
+                rq = self.client()
+                try:
+                    self._listed = set(rq.all_instruments(type='Future')['order_book_id'])
+                except Exception:
+                    self._listed = set()
+        return [c for c in codes if c in self._listed] if self._listed else codes
+
+    def daily(self, symbols, fields=()):
+        """各品种全部合约的日线 {品种: DataFrame}，缺少缓存的品种在一次请求中获取"""
+        symbols = list(symbols)
+        fields = list(dict.fromkeys([*self.FIELDS, *fields]))
+        with self._lock:
+            missing = []
+            for symbol in symbols:
+                frame = self._frames.get(symbol)
+                if frame is None or not set(fields) <= set(frame.columns):
+                    frame = self._frames[symbol] = self._load(symbol, fields)
+                if frame is None:
+                    missing.append(symbol)
+            if missing:
+                self._fetch(missing, fields)
+            return {symbol: self._frames[symbol] for symbol in symbols}
+
+    def wide(self, future_symbol, field):
+        """单个字段的宽表：索引为日期，列为四位年月（如 2509）"""
+        frame = self.daily([future_symbol], [field])[future_symbol][field].unstack('order_book_id')
+        frame.columns = [c[-4:] for c in frame.columns]
+        return frame.sort_index(ascending=True)
+
+    def _fetch(self, symbols, fields):
+        rq = self.client()
+        codes = [c for symbol in symbols for c in self.contracts(symbol)]
+        started = time.perf_counter()
+        data = rq.get_price(codes, start_date=self.start_date, end_date=dt.datetime.today(), fields=fields)
+        if data is None:
+            data = pd.DataFrame(columns=fields, index=pd.MultiIndex.from_arrays([[], []], names=['order_book_id', 'date']))
+        print(f"RQData 获取 {'/'.join(symbols)} 共 {len(codes)} 个合约的日线，用时 {time.perf_counter() - started:.1f}s")
+        prefix = data.index.get_level_values('order_book_id').str.extract(r'^([A-Za-z]+)', expand=False)
+        for symbol in symbols:
+            frame = data[prefix == symbol].sort_index()
+            self._frames[symbol] = frame
+            self._save(symbol, frame)
+
+    def _path(self, symbol):
+        return os.path.join(self.cache_dir, f"{symbol}_daily.csv")
+
+    def _load(self, symbol, fields):
+        if not self.cache_dir:
+            return None
+        path = self._path(symbol)
+        if not os.path.exists(path) or time.time() - os.path.getmtime(path) >= self.max_age_days * 86400:
+            return None
+        frame = pd.read_csv(path, parse_dates=['date']).set_index(['order_book_id', 'date'])
+        return frame if set(fields) <= set(frame.columns) else None
+
+    def _save(self, symbol, frame):
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            frame.to_csv(self._path(symbol))
+
+
+_default_source = None
+
+
+def default_source():
+    """进程内共用的数据层"""
+    global _default_source
+    if _default_source is None:
+        _default_source = RQDataSource()
+    return _default_source
+
+
+# 主力连续合约
+class DominantContractAnalyzer:
+    def __init__(self, future_symbol, rule=0, lookback_days=3, threshold=1.1,field='settlement',source=None):
+        """
+        主力合约分析器初始化
+        参数:
+        - future_symbol: 期货品种代码(如'EG'表示乙二醇)
+        - rule: 主力月切换规则 ，= 0时为持续lookback_days天持仓大于原主力月  = 1时为首次持仓大于原主力月持仓的threshold倍
+        - lookback_days: 持续天数
+        - threshold: 倍数阈值
+        - source: 共享数据层，缺省为 default_source()
+        构造时不连接RQData，首次访问主力合约表或价格时才取数与计算
+        """
+        self.future_symbol = future_symbol
+        self.rule = rule
+        self.lookback_days = lookback_days
+        self.threshold = threshold
+        self.field=field
+        self.source = source
+        self._dominant_contract = None
+        self._dominant_contract_close = None
+
+    @property
+    def dominant_contract(self):
+        if self._dominant_contract is None:
+            self._dominant_contract = self._analyze_dominant_contracts()
+        return self._dominant_contract
+
+    @property
+    def dominant_contract_close(self):
+        if self._dominant_contract_close is None:
+            self._dominant_contract_close = self._fetch_data()
+        return self._dominant_contract_close
+
+    def _source(self):
+        return self.source or default_source()
+
+    def _initialize_rqdata(self):
+        """初始化RiceQuant数据连接（进程内只连接一次）"""
+        self._source().client()
+
+    def _generate_contract_codes(self):
+        """生成要查询的合约代码列表"""
+        return contract_codes(self.future_symbol)
+
+    def _fetch_open_interest_data(self):
+        """获取所有合约的持仓量数据"""
+        return self._source().wide(self.future_symbol, 'open_interest')
+
+    def _fetch_data(self):
+        """获取所有合约的收盘价数据"""
+        return self._source().wide(self.future_symbol, self.field)
+
+    def _find_next_main_contracts(self, start_index, candidates, reference_contract):
+        """
+        寻找次主力和次次主力合约
+        参数:
+        - start_index: 数组循环开始下标
+        - candidates: 按持仓量排序的合约列表
+        - reference_contract: 参考合约(通常是当前主力合约)
+
+        返回:
+        - (secondary_main, thirdly_main) 元组
+        """
+        for i in range(start_index, len(candidates)):
+            if int(candidates[i]) > int(reference_contract):
+                secondary = candidates[i]
+                for j in range(i+1, len(candidates)):
+                    if int(candidates[j]) > int(candidates[i]):
+                        return secondary, candidates[j]
+                return secondary, None
+        return None, None
+
+    def _analyze_dominant_contracts(self, open_interest=None):
+        """
+        分析主力合约变化
+        参数:
+        - open_interest: 各合约持仓量，缺省时从数据层获取
+        返回:
+        - 包含主力、次主力和次次主力合约信息的DataFrame
+        """
+        if open_interest is None:
+            open_interest = self._fetch_open_interest_data()
+        results = pd.DataFrame(
+            index=open_interest.index,
+            columns=[
+                'main', 'secondary_main', 'thirdly_main',
+                'main_oi', 'secondary_main_oi', 'thirdly_main_oi'
+            ]
+        )
+
+        current_main = None
+        secondary_main = None
+        thirdly_main = None
+        count = defaultdict(int)
+        for date, row in open_interest.iterrows():
+            sorted_contract = row.dropna().sort_values(ascending=False)
+            candidates = sorted_contract.index.tolist()
+
+            if not candidates:
+                continue
+
+            # 主力合约初始化或切换逻辑
+            if self.rule == 0:
+                # 初始化逻辑
+                if current_main is None:
+                    # 主力合约即为持仓量最大的合约
+                    current_main = candidates[0]
+                    # 次主力和次次主力为持仓量第二和第三的合约
+                    secondary_main, thirdly_main = self._find_next_main_contracts(1,candidates, current_main)
+                # 切换逻辑
+                elif int(candidates[0]) > int(current_main) and sorted_contract.loc[candidates[0]] > sorted_contract.loc[current_main]:
+                    # 当有其他月份的持仓超过主力合约持仓时，计数+1
+                    count[candidates[0]] = count[candidates[0]] + 1
+                    # 当有某合约计数超过设定天数时，切换主力合约为该合约
+                    if count[candidates[0]] >= self.lookback_days:
+                        current_main = candidates[0]
+                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
+                else:
+                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
+
+            elif self.rule == 1:
+                # 初始化逻辑
+                if (current_main is None):
+                    current_main = candidates[0]
+                    secondary_main, thirdly_main = self._find_next_main_contracts(1,candidates, current_main)
+                # 切换逻辑
+                # 出现月份持仓量超过主力月持仓量且比值大于1.1倍时,进行主力月切换
+                elif int(candidates[0]) > int(current_main) and sorted_contract.loc[candidates[0]] > self.threshold*sorted_contract.loc[current_main]:
+                    current_main = candidates[0]
+                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
+                # 出现月份持仓量超过主力月持仓量但比值小于1.1倍时，不进行主力月切换
+                else:
+                    secondary_main, thirdly_main = self._find_next_main_contracts(0,candidates, current_main)
+
+            # 存储结果
+            results.loc[date] = [
+                current_main,
+                secondary_main,
+                thirdly_main,
+                sorted_contract.get(current_main, None),
+                sorted_contract.get(secondary_main, None),
+                sorted_contract.get(thirdly_main, None)
+            ]
+
+        return results
+
+    def get_dominant_contract(self,rank=0,start_date='2015-01-01',end_date=dt.datetime.today()):
+        """
+        分析主力合约列表
+        参数:
+        - rank=0: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
+        - start_date: 开始时间
+        - end_date: 结束时间
+        返回:
+        - 包含主力合约列表
+        """
+        columns = self.dominant_contract.columns.tolist()
+        r = {0:'main_contract',
+             1:'secondary_main_contract',}
+        if start_date is None:
+            result = self.dominant_contract.loc[:end_date,columns[rank]].sort_index(ascending=False)
+            return result.to_frame()
+        else:
+            result = self.dominant_contract.loc[start_date:end_date,columns[rank]].sort_index(ascending=False)
+            return result.to_frame()
+
+    def get_dominant_contract_price(self,rank=0,start_date='2015-01-01',end_date=dt.datetime.today()):
+        """
+        分析主力合约列表
+        参数:
+        - rank: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
+        - start_date: 开始时间
+        - end_date: 结束时间
+        返回:
+        - 主力合约价格
+        """
+        # 获取主力连续合约列表
+        dominant_contract = self.get_dominant_contract(rank,start_date,end_date)
+        column = dominant_contract.columns
+        dominant_contract_price = pd.DataFrame(index=dominant_contract.index,columns=[column[0]])
+        for date, row in dominant_contract.iterrows():
+            dominant_contract_price.loc[date,column[0]] = self.dominant_contract_close.loc[date,row[column[0]]]
+        return dominant_contract_price
+
+    def get_low_high_price(self,rank=0):
+        """
+        获取主力合约的最高最低价
+        参数:
+        - rank: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
+        - start_date: 开始时间
+        - end_date: 结束时间
+        返回:
+        - 主力合约的最高最低价
+        """
+        # 获取主力连续合约列表
+        dominant_contract = self.get_dominant_contract(rank)
+        column = dominant_contract.columns[0]
+        dominant_contract['order_book_id'] = self.future_symbol + dominant_contract[column]
+        # 每个合约作为主力的首末日期
+        spans = dominant_contract.rename_axis('date').reset_index().groupby('order_book_id')['date'].agg(['min', 'max'])
+        # 获取主力连续合约价格数据（与持仓量同一批量请求获取并缓存）
+        fields = ['low', 'high', 'open', 'close']
+        daily = self._source().daily([self.future_symbol], fields)[self.future_symbol]
+        price_data = daily[fields].reset_index().merge(spans, left_on='order_book_id', right_index=True)
+        price_data = price_data[(price_data['date'] >= price_data['min']) & (price_data['date'] <= price_data['max'])]
+        price_data = price_data.drop(columns=['min', 'max']).sort_values(['order_book_id', 'date']).set_index(['date'])
+        return price_data
+
+
+def _analyze(future_symbol, open_interest, rule, lookback_days, threshold):
+    """进程池任务：只计算主力合约表，不连接RQData"""
+    analyzer = DominantContractAnalyzer(future_symbol, rule, lookback_days, threshold)
+    return analyzer._analyze_dominant_contracts(open_interest)
+
+
+# 多品种主力合约
+class MultiDominantAnalyzer:
+    """
+    多品种主力合约分析器：各品种共用一个数据层，RQData只初始化一次，全部品种的日线在一次批量请求中获取，
+    各品种的主力合约表在进程池中并行计算（workers 为 1 时在当前进程依次计算）
+    构造时不取数，首次访问时才构建；analyzer['PR'] 返回单品种的 DominantContractAnalyzer
+    """
+
+    def __init__(self, symbols=('PR', 'TA', 'EG'), rule=0, lookback_days=3, threshold=1.1, field='settlement',
+                 source=None, workers=None):
+        self.source = source or default_source()
+        self.field = field
+        self.workers = workers
+        self.analyzers = {symbol: DominantContractAnalyzer(symbol, rule, lookback_days, threshold, field, self.source)
+                          for symbol in symbols}
+
+    def __getitem__(self, symbol):
+        self.build()
+        return self.analyzers[symbol]
+
+    def build(self):
+        """获取全部品种的持仓量并并行计算主力合约表，已计算的品种跳过"""
+        pending = {symbol: a for symbol, a in self.analyzers.items() if a._dominant_contract is None}
+        if not pending:
+            return self
+        self.source.daily(pending, ['open_interest', self.field])
+        tables = [self.source.wide(symbol, 'open_interest') for symbol in pending]
+        analyzers = list(pending.values())
+        args = (list(pending), tables, [a.rule for a in analyzers], [a.lookback_days for a in analyzers],
+                [a.threshold for a in analyzers])
+        started = time.perf_counter()
+        workers = min(self.workers or os.cpu_count() or 1, len(pending))
+        if workers == 1:
+            results = list(map(_analyze, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_analyze, *args))
+        for analyzer, result in zip(analyzers, results):
+            analyzer._dominant_contract = result
+        print(f"主力合约分析 {'/'.join(pending)}，用时 {time.perf_counter() - started:.1f}s")
+        return self
+
+    def get_dominant_contract(self, rank=0, start_date='2015-01-01', end_date=None):
+        """
+        各品种的主力合约列表
+        参数:
+        - rank: rank=0表示获取主力合约，=1表示次主力合约 =2 表示次次主力合约
+        - start_date: 开始时间，None 表示不限制
+        - end_date: 结束时间，None 表示不限制
+        返回:
+        - 列为品种代码的DataFrame
+        """
+        self.build()
+        return pd.DataFrame({
+            symbol: analyzer.get_dominant_contract(rank, start_date, end_date).iloc[:, 0]
+            for symbol, analyzer in self.analyzers.items()
+        }).sort_index(ascending=False)
@@ -0,0 +1,431 @@
+import asyncio
+import math
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from tqsdk.exceptions import BacktestFinished
+
+from commission import CommissionModel
+from eod import close_strategy
+from recorder import load_ticks
+from trading_calendar import TradingCalendar
+
+# 合约默认参数：合约乘数、最小变动价位、手续费（按手数 / 按成交额比例）
+DEFAULT_CONTRACT_SPECS = {
+    'pr': {'volume_multiple': 15, 'price_tick': 2, 'commission_per_lot': 0, 'commission_rate': 1.01e-5},
+    'ta': {'volume_multiple': 5, 'price_tick': 2, 'commission_per_lot': 3, 'commission_rate': 0},
+    'eg': {'volume_multiple': 10, 'price_tick': 1, 'commission_per_lot': 4, 'commission_rate': 0},
+}
+
+
+class SimQuote:
+    """模拟盘口，字段名与 tqsdk Quote 保持一致"""
+    __slots__ = ('instrument_id', 'datetime', 'bid_price1', 'ask_price1', 'bid_volume1', 'ask_volume1',
+                 'last_price', 'volume_multiple', 'price_tick', 'upper_limit', 'lower_limit',
+                 'open_interest', 'expire_rest_days', 'open')
+
+    def __init__(self, instrument_id, volume_multiple, price_tick):
+        self.instrument_id = instrument_id
+        self.datetime = ''
+        self.bid_price1 = math.nan
+        self.ask_price1 = math.nan
+        self.bid_volume1 = 0
+        self.ask_volume1 = 0
+        self.last_price = math.nan
+        self.volume_multiple = volume_multiple
+        self.price_tick = price_tick
+        self.upper_limit = math.nan
+        self.lower_limit = math.nan
+        self.open_interest = math.nan
+        self.expire_rest_days = math.nan
+        self.open = math.nan
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class SimOrder:
+    """模拟委托单，字段名与 tqsdk Order 保持一致"""
+
+    def __init__(self, order_id, exchange_id, instrument_id, direction, offset, volume, limit_price):
+        self.order_id = order_id
+        self.exchange_id = exchange_id
+        self.instrument_id = instrument_id
+        self.direction = direction
+        self.offset = offset
+        self.volume_orign = volume
+        self.volume_left = volume
+        self.limit_price = limit_price
+        self.status = 'ALIVE'
+        self.trade_records = {}
+        self.insert_date_time = 0
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class SimAccount:
+    """模拟账户，仅维护回测需要的字段"""
+
+    def __init__(self, init_balance):
+        self.static_balance = init_balance
+        self.balance = init_balance
+        self.available = init_balance
+        self.commission = 0.0
+        self.close_profit = 0.0
+        self.margin = 0.0
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class SimPosition:
+    """模拟持仓，字段名与 tqsdk Position 保持一致"""
+
+    def __init__(self, instrument_id):
+        self.instrument_id = instrument_id
+        self.pos_long = 0
+        self.pos_short = 0
+        self.open_price_long = math.nan
+        self.open_price_short = math.nan
+
+    @property
+    def pos(self):
+        return self.pos_long - self.pos_short
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class SimApi:
+    """
+    TqApi 的回测替身：逐行回放录制行情，按盘口撮合委托
+    参数:
+    - quotes: 行情 DataFrame，列为 datetime 以及每条腿的 {leg}_bid / {leg}_ask，
+      可选 {leg}_bid_volume / {leg}_ask_volume；只有 {leg} 列（K线收盘价）时买卖价均取该列。
+      {leg} 为合约品种代码小写，如 CZCE.PR509 对应 pr
+    - slippage_ticks: 市价单滑点（跳），int 或按腿的 dict
+    - contract_specs: 合约乘数、最小变动价位、手续费，缺省取 DEFAULT_CONTRACT_SPECS
+    - init_balance: 初始资金
+    """
+
+    def __init__(self, quotes: pd.DataFrame, slippage_ticks=0, contract_specs=None, init_balance=10_000_000,
+                 calendar=None):
+        self.quotes_frame = quotes
+        self.slippage_ticks = slippage_ticks
+        self.contract_specs = contract_specs or {}
+
+        # 预先转换为 list，逐行回放时避免 pandas 索引开销
+        times = pd.to_datetime(quotes['datetime'])
+        self._times = times.dt.to_pydatetime().tolist()
+        self._time_strs = times.dt.strftime('%Y-%m-%d %H:%M:%S.%f').tolist()
+        # 夜盘行情归属下一个交易日，按交易日而非自然日切换成交文件
+        self.calendar = calendar or TradingCalendar.load()
+        self._trading_days = self.calendar.trading_days_of(times).tolist()
+        self._index = -1
+        self._day = None
+        self.on_new_day = None  # 回调：跨交易日时调用，参数为新交易日
+
+        self._quotes = {}
+        self._rows = {}
+        self._specs = {}
+        self._slippage = {}
+        self._positions = {}
+        # 按合约参数中的手续费撮合扣费，策略的逐笔手续费归属共用同一费率表
+        self.commission_model = CommissionModel()
+        self._account = SimAccount(init_balance)
+        self._orders = {}
+        self._alive = []
+        self._changing = set()
+        self._order_seq = 0
+        self._trade_seq = 0
+        self._closed = False
+
+    @staticmethod
+    def leg_of(symbol) -> str:
+        """由合约代码得到行情列前缀，如 CZCE.PR509 -> pr"""
+        instrument_id = symbol.split('.')[-1]
+        return instrument_id.rstrip('0123456789').lower()
+
+    def _register(self, symbol):
+        """首次订阅时按腿取出行情列"""
+        leg = self.leg_of(symbol)
+        frame = self.quotes_frame
+        bid_col = f'{leg}_bid' if f'{leg}_bid' in frame else leg
+        ask_col = f'{leg}_ask' if f'{leg}_ask' in frame else leg
+        if bid_col not in frame or ask_col not in frame:
+            raise KeyError(f"行情数据缺少合约 {symbol} 对应的列 {bid_col}/{ask_col}")
+        self._rows[symbol] = (
+            frame[bid_col].astype(float).tolist(),
+            frame[ask_col].astype(float).tolist(),
+            frame[f'{leg}_bid_volume'].tolist() if f'{leg}_bid_volume' in frame else None,
+            frame[f'{leg}_ask_volume'].tolist() if f'{leg}_ask_volume' in frame else None,
+        )
+        spec = {**DEFAULT_CONTRACT_SPECS.get(leg, DEFAULT_CONTRACT_SPECS['pr']), **self.contract_specs.get(leg, {})}
+        ticks = (self.slippage_ticks.get(leg, 0) if isinstance(self.slippage_ticks, dict)
+                 else self.slippage_ticks)
+        self._specs[symbol] = spec
+        self.commission_model.set_rate(leg, spec['commission_per_lot'], spec['commission_rate'])
+        self._slippage[symbol] = ticks * spec['price_tick']
+        self._quotes[symbol] = SimQuote(symbol.split('.')[-1], spec['volume_multiple'], spec['price_tick'])
+        self._positions[symbol] = SimPosition(symbol.split('.')[-1])
+
+    # ---- 行情 ----
+    def get_quote(self, symbol):
+        if symbol not in self._quotes:
+            self._register(symbol)
+        return self._quotes[symbol]
+
+    def get_account(self):
+        return self._account
+
+    def get_position(self, symbol=None):
+        if symbol is None:
+            return self._positions
+        if symbol not in self._positions:
+            self._register(symbol)
+        return self._positions[symbol]
+
+    def get_order(self, order_id=None):
+        if order_id is None:
+            return self._orders
+        return self._orders[order_id]
+
+    def now(self) -> datetime:
+        """当前回放时间"""
+        if self._index < 0:
+            return self._times[0]
+        return self._times[min(self._index, len(self._times) - 1)]
+
+    def is_changing(self, obj, key=None):
+        return id(obj) in self._changing
+
+    def wait_update(self, deadline=None):
+        """推进一行行情并撮合挂单，行情回放完毕时抛出 BacktestFinished"""
+        self._index += 1
+        i = self._index
+        if i >= len(self._times):
+            raise BacktestFinished(self)
+        day = self._trading_days[i]
+        if day != self._day:
+            if self._day is not None and self.on_new_day:
+                self.on_new_day(day)
+            self._day = day
+        changing = self._changing
+        changing.clear()
+        ts = self._time_strs[i]
+        for contract, quote in self._quotes.items():
+            bids, asks, bid_vols, ask_vols = self._rows[contract]
+            bid, ask = bids[i], asks[i]
+            if bid != quote.bid_price1 or ask != quote.ask_price1:
+                quote.bid_price1 = bid
+                quote.ask_price1 = ask
+                quote.last_price = (bid + ask) / 2
+                changing.add(id(quote))
+            if bid_vols is not None:
+                quote.bid_volume1 = bid_vols[i]
+                quote.ask_volume1 = ask_vols[i]
+            quote.datetime = ts
+        if self._alive:
+            self._match_alive()
+        return True
+
+    # ---- 交易 ----
+    def insert_order(self, symbol, direction, offset, volume, limit_price=None, **kwargs):
+        exchange_id, instrument_id = symbol.split('.')
+        self._order_seq += 1
+        order = SimOrder(f"SIM{self._order_seq}", exchange_id, instrument_id, direction, offset, volume, limit_price)
+        order.insert_date_time = self.now()
+        self._orders[order.order_id] = order
+        self._try_fill(symbol, order, arriving=True)
+        if order.status == 'ALIVE':
+            self._alive.append((symbol, order))
+        return order
+
+    def cancel_order(self, order_or_id):
+        order = order_or_id if isinstance(order_or_id, SimOrder) else self._orders[order_or_id]
+        if order.status == 'ALIVE':
+            order.status = 'FINISHED'
+            self._alive = [(s, o) for s, o in self._alive if o is not order]
+
+    def _match_alive(self):
+        still_alive = []
+        for symbol, order in self._alive:
+            self._try_fill(symbol, order)
+            if order.status == 'ALIVE':
+                still_alive.append((symbol, order))
+        self._alive = still_alive
+
+    def _try_fill(self, symbol, order, arriving=False):
+        """
+        按对手价撮合：市价单带滑点全部成交；
+        限价单报入时可成交则按对手价（不劣于限价）全部成交，挂单之后被行情触及时按限价全部成交
+        """
+        quote = self._quotes[symbol]
+        if order.direction == 'BUY':
+            best = quote.ask_price1
+            if order.limit_price is None:
+                price = best + self._slippage[symbol]
+            elif best <= order.limit_price:
+                price = min(order.limit_price, best) if arriving else order.limit_price
+            else:
+                return
+        else:
+            best = quote.bid_price1
+            if order.limit_price is None:
+                price = best - self._slippage[symbol]
+            elif best >= order.limit_price:
+                price = max(order.limit_price, best) if arriving else order.limit_price
+            else:
+                return
+        if math.isnan(price):
+            return
+        self._fill(symbol, order, price, order.volume_left)
+
+    def _fill(self, symbol, order, price, volume):
+        spec = self._specs[symbol]
+        self._trade_seq += 1
+        trade_id = f"T{self._trade_seq}"
+        order.trade_records[trade_id] = {
+            'order_id': order.order_id,
+            'trade_id': trade_id,
+            'exchange_id': order.exchange_id,
+            'instrument_id': order.instrument_id,
+            'direction': order.direction,
+            'offset': order.offset,
+            'price': price,
+            'volume': volume,
+            'trade_date_time': self.now(),
+        }
+        order.volume_left -= volume
+        if order.volume_left == 0:
+            order.status = 'FINISHED'
+
+        commission = self.commission_model.commission(order.instrument_id, price, volume, spec['volume_multiple'])
+        self._account.commission += commission
+        self._account.balance -= commission
+
+        pos = self._positions[symbol]
+        if order.offset == 'OPEN':
+            if order.direction == 'BUY':
+                pos.pos_long += volume
+            else:
+                pos.pos_short += volume
+        else:
+            if order.direction == 'BUY':
+                pos.pos_short -= volume
+            else:
+                pos.pos_long -= volume
+
+    def close(self):
+        self._closed = True
+
+
+def load_quotes(path, start=None, end=None) -> pd.DataFrame:
+    """读取录制行情（csv / parquet / 策略盘口记录 ticks/*.bin 或其目录），按时间排序并截取区间"""
+    path = Path(path)
+    if path.suffix == '.bin' or path.is_dir():
+        df = load_ticks(path)
+    elif path.suffix == '.parquet':
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df = df.sort_values('datetime')
+    if start is not None:
+        df = df[df['datetime'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['datetime'] <= pd.Timestamp(end)]
+    return df.dropna(how='all', subset=[c for c in df.columns if c != 'datetime']).reset_index(drop=True)
+
+
+class Backtester:
+    """
+    离线事件驱动回测：用 SimApi 驱动未经修改的 BaseGridStrategy 子类，
+    输出与实盘相同的 trade / position / merged_data / profit 文件
+    strategy_cls 也可以是返回策略实例的工厂，如 partial(ConfigGridStrategy, settings)
+    """
+
+    def __init__(self, strategy_cls, quotes: pd.DataFrame, output_dir=None, slippage_ticks=0,
+                 contract_specs=None, init_balance=10_000_000, calendar=None):
+        self.strategy_cls = strategy_cls
+        self.quotes = quotes
+        self.output_dir = output_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "backtest_logs",
+            datetime.now().strftime('%y%m%d_%H%M%S'))
+        self.slippage_ticks = slippage_ticks
+        self.contract_specs = contract_specs
+        self.init_balance = init_balance
+        self.calendar = calendar
+
+    def run(self) -> dict:
+        """执行回测并生成利润文件，返回汇总信息"""
+        started = time.perf_counter()
+        api = SimApi(self.quotes, self.slippage_ticks, self.contract_specs, self.init_balance, self.calendar)
+        strategy = self.strategy_cls(None, api=api, log_root=self.output_dir)
+        strategy.verbose = False
+
+        def roll_trade_file(day):
+            strategy._init_paths()
+            strategy._init_files()
+        api.on_new_day = roll_trade_file
+
+        asyncio.run(strategy.run())
+        replay_seconds = time.perf_counter() - started
+
+        # 与实盘收盘后流程一致：合并三腿交易并计算利润
+        log_path = Path(strategy.log_path)
+        closed = close_strategy(log_path, api.calendar)
+        if closed['error']:
+            raise RuntimeError(f"收盘处理失败 {log_path}: {closed['error']}")
+        profit_rows = closed['profit_rows']
+
+        summary = {
+            'strategy': strategy.name,
+            'ticks': len(self.quotes),
+            'orders': len(api.get_order()),
+            'profit_rows': profit_rows,
+            'commission': api.get_account().commission,
+            'final_layer': strategy.layer,
+            'quote_rejects': dict(strategy.quote_guard.rejects),
+            'suppressed_transitions': dict(strategy.suppressed_transitions),
+            'risk_vetoes': dict(strategy.risk.vetoes),
+            'position_drifts': len(strategy.reconciler.history),
+            'position': {sym: dict(pos) for sym, pos in strategy.position.items()},
+            'replay_seconds': replay_seconds,
+            'log_path': str(log_path),
+        }
+        print(f"回测完成：{summary['strategy']} 回放 {summary['ticks']} 条行情，"
+              f"委托 {summary['orders']} 笔，手续费 {summary['commission']:.2f}，"
+              f"耗时 {replay_seconds:.2f}s，日志目录 {log_path}")
+        return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+
+    parser = argparse.ArgumentParser(description="网格策略离线回测")
+    parser.add_argument("strategy", help="配置文件中的策略（月份或策略名），如 strategies.toml:2509，"
+                                         "或可导入的策略类路径 模块:类名")
+    parser.add_argument("quotes", help="录制行情文件（csv / parquet / 策略盘口记录 .bin 或 ticks 目录）")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--slippage", type=int, default=0, help="市价单滑点（跳）")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    module_name, class_name = args.strategy.split(":")
+    if module_name.endswith(('.toml', '.yaml', '.yml')):
+        from functools import partial
+        from strategy_runner import ConfigGridStrategy, load_config, resolve_strategies
+        settings = next(s for s in resolve_strategies(load_config(module_name))
+                        if class_name in (s['name'], s['month']))
+        strategy_cls = partial(ConfigGridStrategy, settings)
+    else:
+        strategy_cls = getattr(importlib.import_module(module_name), class_name)
+    Backtester(strategy_cls, load_quotes(args.quotes, args.start, args.end),
+               output_dir=args.output, slippage_ticks=args.slippage).run()
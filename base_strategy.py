@@ -1,358 +1,580 @@
-# base_strategy.py
-from abc import ABC, abstractmethod
-import uuid
-from tqsdk import TqApi, TqAuth, TqAccount
-from datetime import datetime
-import pandas as pd
-import os
-
-class BaseGridStrategy(ABC):
-    def __init__(self, auth: TqAuth, account=None):
-        """基础策略类"""
-        # 必需由子类定义的属性
-        self.symbols = self._get_symbols()
-        self.grid_settings = self._get_grid_settings()
-        self.min_unit = self._get_min_unit()
-        self.layer = 0
-        
-        # 初始化核心组件
-        self.api = TqApi(account, auth)
-        self._init_paths()
-        self._init_files()
-        self.position = self._load_position()
-        self.running = True
-        self.quotePrice = {
-            "pr": {"bid":0,"ask":0},
-            "ta": {"bid":0,"ask":0},
-            "eg": {"bid":0,"ask":0}
-        }
-
-        # 订阅合约
-        self.quotes = {
-            sym: self.api.get_quote(contract)
-            for sym, contract in self.symbols.items()
-        }
-        self.account = self.api.get_account()
-
-    @abstractmethod
-    def _get_symbols(self) -> dict:
-        """子类必须实现的合约配置"""
-        pass
-
-    @abstractmethod
-    def _get_grid_settings(self) -> list:
-        """子类必须实现的网格参数"""
-        pass
-
-    @abstractmethod
-    def _get_min_unit(self) -> dict:
-        """子类必须实现的最小交易单位"""
-        pass
-
-    def _init_paths(self):
-        """可被子类覆盖的路径生成逻辑"""
-        date_str = datetime.now().strftime("%y%m%d")
-        self.log_path = os.path.join(
-            os.path.dirname(__file__), 
-            "logs",  # 默认日志目录
-            self.__class__.__name__  # 自动添加策略类名子目录
-        )
-        os.makedirs(self.log_path, exist_ok=True)
-        self.position_file = os.path.join(self.log_path, "position.csv")
-        self.trade_file = os.path.join(self.log_path, f"{date_str}_trade.csv")
-
-    # 通用方法
-    def _init_files(self):
-        """初始化数据文件"""
-        if not os.path.exists(self.position_file):
-            cols = ['timestamp', 'pr_long', 'pr_short', 'ta_long', 'ta_short', 'eg_long', 'eg_short', 'layer']
-            pd.DataFrame(columns=cols).to_csv(self.position_file, index=False)
-            
-        if not os.path.exists(self.trade_file):
-            cols = ['trade_id', 'timestamp', 'contract', 'action', 'price', 'volume', 'offset', 'commission', 'fee', 'quote',
-                    'pr_long', 'pr_short', 'ta_long', 'ta_short', 'eg_long', 'eg_short', 'flag']
-            pd.DataFrame(columns=cols).to_csv(self.trade_file, index=False)
-
-    def _load_position(self):
-        """ 从文件加载最新持仓"""
-        if os.path.exists(self.position_file):
-            df = pd.read_csv(self.position_file)
-            if not df.empty:
-                last = df.iloc[-1]
-                self.layer = last['layer']
-                return {
-                    'pr': {'long':last['pr_long'], 'short':last['pr_short']},
-                    'ta': {'long':last['ta_long'], 'short':last['ta_short']},
-                    'eg': {'long':last['eg_long'], 'short':last['eg_short']}
-                }
-        return {
-            'pr': {'long': 0, 'short': 0},
-            'ta': {'long': 0, 'short': 0},
-            'eg': {'long': 0, 'short': 0}
-        }
-
-    def _get_current_grid(self, fee):
-        """获取当前网格区间"""
-        for grid in self.grid_settings:
-            if grid['min'] <= fee < grid['max']:
-                return grid
-        return None
-    async def _save_position(self):
-        """保存持仓到文件（异步）"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-        new_row = {
-            'timestamp': timestamp,
-            'pr_long': self.position['pr']['long'],
-            'pr_short': self.position['pr']['short'],
-            'ta_long': self.position['ta']['long'],
-            'ta_short': self.position['ta']['short'],
-            'eg_long': self.position['eg']['long'],
-            'eg_short': self.position['eg']['short'],
-            'layer': self.layer
-        }
-        
-        with open(self.position_file, 'a') as f:
-            f.write(f"{new_row['timestamp']},"
-                   f"{new_row['pr_long']},{new_row['pr_short']},"
-                   f"{new_row['ta_long']},{new_row['ta_short']},"
-                   f"{new_row['eg_long']},{new_row['eg_short']},"
-                   f"{new_row['layer']}\n")
-
-    async def _save_trade(self, trade_records, commission, fee, symbol, id):
-        """保存交易记录（异步）"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-        pos = self.position
-        trade = trade_records.get(next(iter(trade_records)))
-        total_price = sum([trade["price"] * trade["volume"] for trade in trade_records.values()])
-        total_volume = sum([trade['volume'] for trade in trade_records.values()])
-        quote_price = (self.quotePrice[symbol]['ask'] if trade['direction'] == 'BUY' 
-                  else self.quotePrice[symbol]['bid'])
-        record = {
-            'trade_id': id,
-            'timestamp': timestamp,
-            'contract': trade['instrument_id'],
-            'action': trade['direction'],
-            'price': total_price / total_volume,
-            'volume': total_volume,
-            'offset': trade['offset'],
-            'commission': commission,
-            'fee': fee,
-            'quote': quote_price,
-            'pr_long': pos['pr']['long'],
-            'pr_short':  pos['pr']['short'],
-            'ta_long':  pos['ta']['long'],
-            'ta_short': pos['ta']['short'],
-            'eg_long': pos['eg']['long'],
-            'eg_short': pos['eg']['short'],
-            'flag': 1
-        }
-        
-        with open(self.trade_file, 'a') as f:
-            f.write(f"{record['trade_id']},"
-                f"{record['timestamp']},"
-                f"{record['contract']},"
-                f"{record['action']},"
-                f"{record['price']},"
-                f"{record['volume']},"
-                f"{record['offset']},"
-                f"{record['commission']},"
-                f"{record['fee']},"
-                f"{record['quote']},"
-                f"{record['pr_long']},{record['pr_short']},"
-                f"{record['ta_long']},{record['ta_short']},"
-                f"{record['eg_long']},{record['eg_short']},"
-                f"{record['flag']}\n")
-
-    async def place_orders(self, symbol, volume, direction, fee, id):
-        """下单函数"""
-        if volume == 0:
-            return
-
-        contract = self.symbols[symbol]
-        temp = self.account.commission
-        if direction == 'BUY':
-            if self.position[symbol]['short'] > 0:
-                #先平空头
-                close_vol = min(volume, self.position[symbol]['short'])
-                order = self.api.insert_order(
-                    contract,
-                    direction=direction,
-                    offset='CLOSE',
-                    volume=close_vol
-                )
-                self.position[symbol]['short'] -= close_vol
-                volume -= close_vol
-                #剩余开多头
-                if volume > 0:
-                    while order.status != 'FINISHED':
-                        self.api.wait_update()
-                    await self._save_trade(order.trade_records, self.account.commission - temp, fee, symbol, id)
-                    temp = self.account.commission
-
-                    order = self.api.insert_order(
-                        contract,
-                        direction=direction,
-                        offset='OPEN',
-                        volume=volume
-                    )
-                    self.position[symbol]['long'] += volume
-
-            else:
-                order = self.api.insert_order(
-                    contract,
-                    direction=direction,
-                    offset='OPEN',
-                    volume=volume
-                )
-                self.position[symbol]['long'] += volume
-        else:
-            if self.position[symbol]['long'] > 0:
-                #先平多头
-                close_vol = min(volume, self.position[symbol]['long'])
-                order = self.api.insert_order(
-                    contract,
-                    direction=direction,
-                    offset='CLOSE',
-                    volume=close_vol
-                )
-                self.position[symbol]['long'] -= close_vol
-                volume -= close_vol
-
-                #剩余开空头
-                if volume > 0:
-                    while order.status != 'FINISHED':
-                        self.api.wait_update()
-                    await self._save_trade(order.trade_records, self.account.commission - temp, fee, symbol, id)
-                    temp = self.account.commission
-
-                    order = self.api.insert_order(
-                        contract,
-                        direction=direction,
-                        offset='OPEN',
-                        volume=volume
-                    )
-                    self.position[symbol]['short'] += volume
-            else:
-                order = self.api.insert_order(
-                    contract,
-                    direction=direction,
-                    offset='OPEN',
-                    volume=volume
-                )
-                self.position[symbol]['short'] += volume
-        
-        # 等待订单成交
-        while order.status != 'FINISHED':
-            self.api.wait_update()
-        
-        # 记录交易
-        #await self._update_position(symbol, volume, direction)
-        await self._save_trade(order.trade_records, self.account.commission - temp, fee, symbol, id)
-        await self._save_position()
-
-    async def strategy_loop(self):
-        """策略主循环"""
-        while self.running:
-            try:
-                # 等待行情更新
-                self.api.wait_update()
-                
-                time = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-                print(f"Strategy:{self.__class__.__name__} Time: { time }")
-                # 计算加工费
-                fee_buy = self._calculate_fee(direction='BUY')
-                # 获取当前网格
-                grid_buy = self._get_current_grid(fee_buy)
-                if not grid_buy:
-                    print(f"当前 BUY 方向加工费：{ fee_buy } ,未触发网格")
-                else:
-                    new_layer = grid_buy['layer']
-                    print(f"当前 BUY 方向加工费 { fee_buy } 位于第 { new_layer } 层 ")
-                    if(new_layer < self.layer):   
-                        target = {k: v * grid_buy['down'] for k, v in self.min_unit.items()}
-                        flag = True
-
-                        orders = []
-                        for sym in ['pr', 'ta', 'eg']:
-                            current = self.position[sym]
-                            target_net = target[sym]
-                            current_net = current['long'] - current['short']
-                            delta = target_net - current_net
-                            if( delta > 0 ):
-                                orders.append((sym, delta, 'BUY'))
-                            elif( delta == 0):
-                                flag = False
-                            else:
-                                orders.append((sym, -delta, 'SELL'))
-                        if( flag ):
-                            print(f"原加工费位于第 { self.layer } 层,高于现在,下单方向:BUY")
-                            self.layer = new_layer
-                            trade_id = str(uuid.uuid4())
-                            for sym, vol, direction in orders:
-                                await self.place_orders(sym, vol, direction, fee_buy, trade_id)
-                        else:
-                            print(f"原加工费位于第 { self.layer } 层,高于现在,但无需调整持仓")
-                    else:
-                        print(f"原加工费位于第 { self.layer } 层,无需调整持仓")
-
-                
-                fee_sell = self._calculate_fee(direction='SELL')
-                grid_sell = self._get_current_grid(fee_sell)
-                if not grid_sell:
-                    print(f"当前 SELL 方向加工费：{ fee_sell } ,未触发网格")
-                else:
-                    new_layer = grid_sell['layer']
-                    print(f"当前 SELL 方向加工费 { fee_sell } 位于第{ new_layer } 层 ")
-                    if(new_layer > self.layer):
-                        target = {k: v * grid_sell['up'] for k, v in self.min_unit.items()}
-                        flag = True
-
-                        orders = []
-                        for sym in ['pr', 'ta', 'eg']:
-                            current = self.position[sym]
-                            target_net = target[sym]
-                            current_net = current['long'] - current['short']
-                            delta = current_net - target_net
-                            if( delta > 0 ):
-                                orders.append((sym, delta, 'SELL'))
-                            elif( delta == 0):
-                                flag = False
-                            else:
-                                orders.append((sym, -delta, 'BUY'))
-                        if( flag ):
-                            print(f"原加工费位于第 { self.layer } 层,低于现在,下单方向:SELL")
-                            self.layer = new_layer
-                            trade_id = str(uuid.uuid4())
-                            for sym, vol, direction in orders:
-                                await self.place_orders(sym, vol, direction, fee_sell, trade_id)
-                        else:
-                            print(f"原加工费位于第 { self.layer } 层,低于现在,但无需调整持仓")
-                    else:
-                        print(f"原加工费位于 { self.layer } 层,无需调整持仓")
-                                                
-            except Exception as e:
-                print(f"策略异常类型: {type(e)}，信息：{str(e)}")
-                await self.stop()
-    def _calculate_fee(self, direction: str) -> float:
-        """具体加工费计算"""
-        self.quotePrice['pr']['bid'] = self.quotes['pr'].bid_price1
-        self.quotePrice['eg']['bid'] = self.quotes['eg'].ask_price1
-        self.quotePrice['ta']['bid'] = self.quotes['ta'].ask_price1
-        self.quotePrice['pr']['ask'] = self.quotes['pr'].ask_price1
-        self.quotePrice['eg']['ask'] = self.quotes['eg'].bid_price1
-        self.quotePrice['ta']['ask'] = self.quotes['ta'].bid_price1
-        if direction == 'SELL':
-            return self.quotes['pr'].bid_price1 - 0.857 * self.quotes['ta'].ask_price1 - 0.335 * self.quotes['eg'].ask_price1
-        else:
-            return self.quotes['pr'].ask_price1 - 0.857 * self.quotes['ta'].bid_price1 - 0.335 * self.quotes['eg'].bid_price1
-
-
-    # 通用生命周期管理
-    async def stop(self):
-        """停止策略（通用）"""
-        self.running = False
-        self.api.close()
-
-    async def run(self):
-        """启动策略（通用）"""
+# base_strategy.py
+from abc import ABC, abstractmethod
+import time
+import uuid
+from collections import Counter
+from tqsdk import TqApi, TqAuth, TqAccount
+from tqsdk.exceptions import BacktestFinished
+from quote_guard import QuoteGuard, EXCHANGE_TZ
+from execution import SpreadExecutor
+from order_slicer import OrderSlicer
+from latency import LatencyRecorder
+from spread import PR_SPREAD
+from risk import RiskEngine
+from reconcile import PositionReconciler
+from recorder import TickRecorder
+from state import LegBook, LegPosition
+from fee_stats import FeeStatistics
+from recovery import TradeRecovery
+from commission import CommissionLedger, CommissionModel
+from datetime import datetime
+import pandas as pd
+import os
+
+class BaseGridStrategy(ABC):
+    def __init__(self, auth: TqAuth, account=None, api=None, log_root=None):
+        """
+        基础策略类
+        参数:
+        - auth: 天勤账号
+        - account: 交易账户，默认为模拟账户
+        - api: 已创建的 TqApi 或兼容对象（如回测用的 SimApi），传入时忽略 auth/account
+        - log_root: 日志根目录，默认为本文件所在目录下的 logs
+        """
+        # 必需由子类定义的属性
+        self.name = self._get_name()
+        self.symbols = self._get_symbols()
+        self.grid_settings = self._get_grid_settings()
+        self.min_unit = self._get_min_unit()
+        self.spread = self._get_spread()
+        self.quote_guard = QuoteGuard(**self._get_guard_settings())
+        self.latency = LatencyRecorder(**self._get_latency_settings())
+        self.hysteresis = {'band': 0.0, 'min_dwell': 0.0, **self._get_hysteresis_settings()}
+        self.suppressed_transitions = Counter()  # 被迟滞/驻留抑制的换层次数
+        self._suppressed_key = {}
+        self._last_transition = None
+        self.layer = 0
+        self.verbose = True
+        self.portfolio = None  # 多策略运行时由 Portfolio.register 设置
+        self.scheduler = None  # 多策略运行时由 OrderScheduler.register 设置，报单、撤单前按令牌桶限速
+        self.log_root = log_root
+        
+        # 初始化核心组件
+        self.api = api if api is not None else TqApi(account, auth)
+        # 回测时使用行情时间，实盘使用交易所时区的当前时间（不带时区，与行情时间、交易日历口径一致）
+        self._now = getattr(self.api, 'now', lambda: datetime.now(EXCHANGE_TZ).replace(tzinfo=None))
+        self.calendar = getattr(self.api, 'calendar', None)  # 交易日历，提供时成交文件按交易日命名
+        self._init_paths()
+        self._init_files()
+        self.position = self._load_position()
+        self.running = True
+        # 最近一次计算加工费时各腿的对手价（卖出价差, 买入价差），按 spread.keys 顺序
+        self._take_prices = ([0] * len(self.spread.keys), [0] * len(self.spread.keys))
+
+        # 订阅合约
+        self.quotes = {
+            sym: self.api.get_quote(contract)
+            for sym, contract in self.symbols.items()
+        }
+        # 按价差腿顺序对齐的定长状态，热路径按下标遍历
+        self.legs = LegBook(self.spread, self.min_unit, self.position, self.quotes)
+        self.account = self.api.get_account()
+        commission = dict(self._get_commission_settings())
+        model = CommissionModel(commission.pop('rates', None), commission.pop('broker_markup', 0.0))
+        # 回测时与 SimApi 撮合扣费共用同一费率表
+        self.commissions = CommissionLedger(self, getattr(self.api, 'commission_model', model), **commission)
+        self.executor = SpreadExecutor(self, **self._get_execution_settings())
+        self.slicer = OrderSlicer(self, **self._get_slicing_settings())
+        self.risk = RiskEngine(self, **self._get_risk_settings())
+        self.reconciler = PositionReconciler(self, **self._get_reconcile_settings())
+        self.recorder = TickRecorder(self, **self._get_recorder_settings())
+        self.fee_stats = FeeStatistics(self, **self._get_fee_stats_settings())
+        self.recovery = TradeRecovery(self, **self._get_recovery_settings())
+
+    @abstractmethod
+    def _get_symbols(self) -> dict:
+        """子类必须实现的合约配置"""
+        pass
+
+    @abstractmethod
+    def _get_grid_settings(self) -> list:
+        """子类必须实现的网格参数"""
+        pass
+
+    @abstractmethod
+    def _get_min_unit(self) -> dict:
+        """子类必须实现的最小交易单位"""
+        pass
+
+    @property
+    def quotePrice(self) -> dict:
+        """各腿最近一次计算加工费时的对手价：bid 为卖出价差所取价格，ask 为买入价差所取价格"""
+        sell, buy = self._take_prices
+        return {key: {"bid": bid, "ask": ask} for key, bid, ask in zip(self.spread.keys, sell, buy)}
+
+    def _get_spread(self):
+        """价差定义（腿、系数、乘数），默认为瓶片加工费 pr - 0.857 * ta - 0.335 * eg"""
+        return PR_SPREAD
+
+    def _get_guard_settings(self) -> dict:
+        """行情校验参数（max_lag / confirm_ticks / max_age / enabled），子类可覆盖"""
+        return {}
+
+    def _get_hysteresis_settings(self) -> dict:
+        """换层迟滞参数：band 为需越过网格边界的加工费幅度，min_dwell 为每层最短驻留秒数"""
+        return {}
+
+    def _get_execution_settings(self) -> dict:
+        """调仓执行参数（enabled / timeout / cross_ticks），默认按原顺序市价成交"""
+        return {}
+
+    def _get_slicing_settings(self) -> dict:
+        """大额调仓拆单参数（enabled / mode / child_volume / interval / participation / max_slices）"""
+        return {}
+
+    def _get_latency_settings(self) -> dict:
+        """耗时埋点参数（enabled），结果在策略停止时写入 latency.csv"""
+        return {}
+
+    def _get_risk_settings(self) -> dict:
+        """下单前风控参数（enabled / min_expire_days / limit_distance / max_position / margin_rate 等）"""
+        return {}
+
+    def _get_reconcile_settings(self) -> dict:
+        """持仓对账参数（enabled / auto_correct / grace），偏差记录写入 drift.csv"""
+        return {}
+
+    def _get_recorder_settings(self) -> dict:
+        """盘口与决策记录参数（enabled / flush_interval），按交易日写入日志目录下的 ticks/"""
+        return {}
+
+    def _get_fee_stats_settings(self) -> dict:
+        """盘中加工费统计参数（enabled / horizons / fee_file），每日一行写入 fee_stats.csv"""
+        return {}
+
+    def _get_commission_settings(self) -> dict:
+        """手续费参数（rates / broker_markup / enabled / interval / tolerance），逐笔计算并定期与柜台对账"""
+        return {}
+
+    def _get_recovery_settings(self) -> dict:
+        """启动恢复参数（enabled / mode / lookback / timeout），处理上次退出时腿数不完整的交易组"""
+        return {}
+
+    def _get_name(self) -> str:
+        """策略名称，用作日志子目录，默认为类名"""
+        return self.__class__.__name__
+
+    def _init_paths(self):
+        """可被子类覆盖的路径生成逻辑"""
+        now = self._now()
+        date_str = (self.calendar.trading_day(now) if self.calendar else now).strftime("%y%m%d")
+        self.log_path = os.path.join(
+            self.log_root or os.path.join(os.path.dirname(__file__), "logs"),  # 默认日志目录
+            self.name  # 自动添加策略名子目录
+        )
+        os.makedirs(self.log_path, exist_ok=True)
+        self.position_file = os.path.join(self.log_path, "position.csv")
+        self.trade_file = os.path.join(self.log_path, f"{date_str}_trade.csv")
+
+    # 通用方法
+    def _init_files(self):
+        """初始化数据文件"""
+        if not os.path.exists(self.position_file):
+            cols = ['timestamp', 'pr_long', 'pr_short', 'ta_long', 'ta_short', 'eg_long', 'eg_short', 'layer']
+            pd.DataFrame(columns=cols).to_csv(self.position_file, index=False)
+            
+        if not os.path.exists(self.trade_file):
+            cols = ['trade_id', 'timestamp', 'contract', 'action', 'price', 'volume', 'offset', 'commission', 'fee', 'quote',
+                    'pr_long', 'pr_short', 'ta_long', 'ta_short', 'eg_long', 'eg_short', 'flag']
+            pd.DataFrame(columns=cols).to_csv(self.trade_file, index=False)
+
+    def _load_position(self):
+        """ 从文件加载最新持仓"""
+        if os.path.exists(self.position_file):
+            df = pd.read_csv(self.position_file)
+            if not df.empty:
+                last = df.iloc[-1]
+                self.layer = last['layer']
+                return {
+                    'pr': LegPosition(last['pr_long'], last['pr_short']),
+                    'ta': LegPosition(last['ta_long'], last['ta_short']),
+                    'eg': LegPosition(last['eg_long'], last['eg_short'])
+                }
+        return {
+            'pr': LegPosition(),
+            'ta': LegPosition(),
+            'eg': LegPosition()
+        }
+
+    def _log(self, msg):
+        """输出逐笔日志，verbose 关闭时（如回测）不打印"""
+        if self.verbose:
+            print(msg)
+
+    def _get_current_grid(self, fee):
+        """获取当前网格区间"""
+        for grid in self.grid_settings:
+            if grid['min'] <= fee < grid['max']:
+                return grid
+        return None
+    def _get_transition_grid(self, direction, fee, grid):
+        """
+        网格换层判定，返回需要换入的网格，无需换层时返回 None
+        - 迟滞：BUY 方向按 fee + band、SELL 方向按 fee - band 定位网格，加工费越过边界 band 后才换层
+        - 驻留：距上次换层不足 min_dwell 秒时不换层
+        被抑制的换层按原因计入 self.suppressed_transitions，同一次抑制只计一次
+        """
+        lower = direction == 'BUY'
+        if not grid or (grid['layer'] >= self.layer if lower else grid['layer'] <= self.layer):
+            self._suppressed_key.pop(direction, None)
+            return None
+        band = self.hysteresis['band']
+        if band:
+            grid = self._get_current_grid(fee + band if lower else fee - band)
+            if not grid or (grid['layer'] >= self.layer if lower else grid['layer'] <= self.layer):
+                self._suppress(direction, 'hysteresis')
+                return None
+        min_dwell = self.hysteresis['min_dwell']
+        if min_dwell and self._last_transition is not None \
+                and (self._now() - self._last_transition).total_seconds() < min_dwell:
+            self._suppress(direction, 'dwell', grid['layer'])
+            return None
+        self._suppressed_key.pop(direction, None)
+        return grid
+
+    def _suppress(self, direction, reason, layer=None):
+        key = (reason, self.layer, layer)
+        if self._suppressed_key.get(direction) != key:
+            self._suppressed_key[direction] = key
+            self.suppressed_transitions[reason] += 1
+
+    def _dump_transitions(self, path):
+        """把本次运行被迟滞 / 驻留抑制的换层次数与当时的参数追加到 path（csv）"""
+        row = {
+            'timestamp': self._now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'hysteresis': self.suppressed_transitions['hysteresis'],
+            'dwell': self.suppressed_transitions['dwell'],
+            'band': self.hysteresis['band'],
+            'min_dwell': self.hysteresis['min_dwell'],
+        }
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(row) + "\n")
+            f.write(",".join(str(v) for v in row.values()) + "\n")
+        self._log(f"本次运行被抑制的换层：迟滞 {row['hysteresis']} 次，驻留 {row['dwell']} 次")
+
+    def _rebalance_orders(self, units):
+        """
+        按目标持仓单位数计算三腿调仓 [(sym, volume, direction), ...]
+        任一腿无需调整时返回 None（与原逻辑一致，视为无需调整持仓）
+        """
+        return self.legs.rebalance(units)
+
+    def _set_layer(self, layer):
+        """更新当前层并记录换层时间"""
+        self.layer = layer
+        self._last_transition = self._now()
+
+    async def _save_position(self):
+        """保存持仓到文件（异步）"""
+        timestamp = self._now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        new_row = {
+            'timestamp': timestamp,
+            'pr_long': self.position['pr'].long,
+            'pr_short': self.position['pr'].short,
+            'ta_long': self.position['ta'].long,
+            'ta_short': self.position['ta'].short,
+            'eg_long': self.position['eg'].long,
+            'eg_short': self.position['eg'].short,
+            'layer': self.layer
+        }
+        
+        with open(self.position_file, 'a') as f:
+            f.write(f"{new_row['timestamp']},"
+                   f"{new_row['pr_long']},{new_row['pr_short']},"
+                   f"{new_row['ta_long']},{new_row['ta_short']},"
+                   f"{new_row['eg_long']},{new_row['eg_short']},"
+                   f"{new_row['layer']}\n")
+
+    async def _save_trade(self, trade_records, commission, fee, symbol, id):
+        """保存交易记录（异步）"""
+        timestamp = self._now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        pos = self.position
+        trade = trade_records.get(next(iter(trade_records)))
+        total_price = sum([trade["price"] * trade["volume"] for trade in trade_records.values()])
+        total_volume = sum([trade['volume'] for trade in trade_records.values()])
+        sell, buy = self._take_prices
+        quote_price = (buy if trade['direction'] == 'BUY' else sell)[self.legs.index[symbol]]
+        record = {
+            'trade_id': id,
+            'timestamp': timestamp,
+            'contract': trade['instrument_id'],
+            'action': trade['direction'],
+            'price': total_price / total_volume,
+            'volume': total_volume,
+            'offset': trade['offset'],
+            'commission': commission,
+            'fee': fee,
+            'quote': quote_price,
+            'pr_long': pos['pr'].long,
+            'pr_short':  pos['pr'].short,
+            'ta_long':  pos['ta'].long,
+            'ta_short': pos['ta'].short,
+            'eg_long': pos['eg'].long,
+            'eg_short': pos['eg'].short,
+            'flag': 1
+        }
+        
+        with open(self.trade_file, 'a') as f:
+            f.write(f"{record['trade_id']},"
+                f"{record['timestamp']},"
+                f"{record['contract']},"
+                f"{record['action']},"
+                f"{record['price']},"
+                f"{record['volume']},"
+                f"{record['offset']},"
+                f"{record['commission']},"
+                f"{record['fee']},"
+                f"{record['quote']},"
+                f"{record['pr_long']},{record['pr_short']},"
+                f"{record['ta_long']},{record['ta_short']},"
+                f"{record['eg_long']},{record['eg_short']},"
+                f"{record['flag']}\n")
+
+    def _wait_update(self, deadline=None):
+        """下单执行期间等待更新，期间的行情变化同样写入盘口记录"""
+        updated = self.api.wait_update(deadline=deadline)
+        self.recorder.tick()
+        return updated
+
+    async def place_orders(self, symbol, volume, direction, fee, id, limit_price=None, timeout=None):
+        """
+        下单函数：先平反向持仓，剩余手数再开仓，返回成交均价
+        - limit_price 为 None 时按市价成交
+        - 给定 limit_price 时先挂限价单，超过 timeout 秒未成交的部分撤单后按对手价成交
+        """
+        if volume == 0:
+            return None
+
+        contract = self.symbols[symbol]
+        opposite, same = ('short', 'long') if direction == 'BUY' else ('long', 'short')
+        steps = []
+        close_vol = min(volume, self.position[symbol][opposite])
+        if close_vol > 0:
+            #先平反向持仓
+            steps.append(('CLOSE', close_vol))
+        if volume - close_vol > 0:
+            #剩余开仓
+            steps.append(('OPEN', volume - close_vol))
+
+        total_value = total_volume = 0
+        for offset, vol in steps:
+            held = self.position[symbol][opposite]
+            internal = self._internalize(contract, direction, offset, vol) if self.portfolio else {}
+            left = vol - sum(t['volume'] for t in internal.values())
+            trade_records = self._work_order(contract, direction, offset, left, limit_price, timeout) if left else {}
+            trade_records.update(internal)
+            filled = sum(t['volume'] for t in trade_records.values())
+            if offset == 'CLOSE':
+                self.position[symbol][opposite] -= filled
+            else:
+                self.position[symbol][same] += filled
+            if trade_records:
+                # 记录交易
+                t = self.latency.now()
+                commission = self.commissions.attribute(trade_records, held)
+                await self._save_trade(trade_records, commission, fee, symbol, id)
+                self.latency.record('journal_write', t)
+                total_value += sum(t['price'] * t['volume'] for t in trade_records.values())
+                total_volume += filled
+        t = self.latency.now()
+        await self._save_position()
+        self.latency.record('journal_write', t)
+        return total_value / total_volume if total_volume else None
+
+    def _internalize(self, contract, direction, offset, volume):
+        """与共用该合约的其他策略的反向调仓内部撮合，返回与 order.trade_records 同格式的内部成交"""
+        quote = self.api.get_quote(contract)
+        crossed, price = self.portfolio.cross(self, contract, direction, volume,
+                                              (quote.bid_price1 + quote.ask_price1) / 2)
+        if not crossed:
+            return {}
+        self._log(f"{contract} {direction} {crossed} 手与其他策略内部成交，价格 {price}")
+        return {f"internal-{uuid.uuid4().hex}": {
+            'instrument_id': contract.split('.')[1], 'direction': direction, 'offset': offset,
+            'price': price, 'volume': crossed,
+        }}
+
+    def _work_order(self, contract, direction, offset, volume, limit_price=None, timeout=None):
+        """
+        报单并等待完成，返回全部成交记录
+        限价单超时未完成时撤单，剩余手数按对手价加 executor.cross_ticks 跳重新报单，直到全部成交
+        """
+        cross_ticks = self.executor.cross_ticks
+        trade_records = {}
+        working = limit_price is not None and timeout is not None
+        while True:
+            if self.scheduler is not None:
+                self.scheduler.acquire(contract, 'insert', offset)
+            t = self.latency.now()
+            order = self.api.insert_order(contract, direction=direction, offset=offset,
+                                          volume=volume, limit_price=limit_price)
+            self.latency.record('insert_order', t)
+            self.latency.since_tick('tick_to_insert')
+            started = self._now()
+            canceled = False
+            # 等待订单成交
+            while order.status != 'FINISHED':
+                if not working:
+                    self._wait_update()
+                    continue
+                self._wait_update(deadline=time.time() + timeout)
+                if order.status != 'FINISHED' and (self._now() - started).total_seconds() >= timeout:
+                    if self.scheduler is not None:
+                        self.scheduler.acquire(contract, 'cancel')
+                    self.api.cancel_order(order)
+                    canceled = True
+                    while order.status != 'FINISHED':
+                        self._wait_update()
+            self.latency.record('order_finished', t)
+            trade_records.update(order.trade_records)
+            volume = order.volume_left
+            # 市价单、全部成交或被拒单时结束
+            if volume == 0 or not working or not canceled:
+                break
+            # 超时未成交部分按对手价重新报单
+            quote = self.api.get_quote(contract)
+            if direction == 'BUY':
+                limit_price = quote.ask_price1 + cross_ticks * quote.price_tick
+            else:
+                limit_price = quote.bid_price1 - cross_ticks * quote.price_tick
+        return trade_records
+
+    async def _execute_orders(self, orders, fee, trade_id, side):
+        """
+        执行一次三腿调仓：大额调仓先由拆单器按比例拆组，每组由执行器决定腿的顺序与报价
+        拆组后每组使用独立的 trade_id（原 id 加序号），保证 merge_trade 按三腿一组合并
+        """
+        slices = self.slicer.split(orders)
+        if len(slices) == 1:
+            await self.executor.execute(orders, fee, trade_id, side)
+            return
+        self._log(f"调仓拆分为 { len(slices) } 组执行")
+        for i, child in enumerate(slices):
+            if i > 0:
+                self.slicer.wait()
+            await self.executor.execute(child, fee, f"{trade_id}-{i + 1}", side)
+
+    async def strategy_loop(self):
+        """策略主循环"""
+        while self.running:
+            try:
+                # 等待行情更新
+                t = self.latency.now()
+                self.api.wait_update()
+                self.latency.record('wait_update', t)
+                self.latency.tick()
+                self.risk.update()
+                # 与柜台持仓对账，偏差持续超过宽限期时已按柜台持仓修正
+                if self.reconciler.check():
+                    await self._save_position()
+                self.commissions.reconcile()
+                self.recorder.capture()
+                
+                if self.verbose:
+                    now = self._now().strftime('%Y-%m-%d %H:%M:%S.%f')
+                    print(f"Strategy:{self.name} Time: { now }")
+                # 行情校验：盘口无效、交叉、某条腿滞后或行情过期时不计算加工费
+                reason = self.quote_guard.check(self.quotes, self._now())
+                if reason:
+                    self._log(f"行情校验未通过：{ reason }，跳过本次计算")
+                    self.recorder.record()
+                    continue
+                # 计算加工费
+                fee_buy = self._calculate_fee(direction='BUY')
+                self.latency.since_tick('fee_computed')
+                self.fee_stats.update()
+                # 获取当前网格
+                grid_buy = self._get_current_grid(fee_buy)
+                next_grid = self._get_transition_grid('BUY', fee_buy, grid_buy)
+                self.latency.since_tick('grid_decided')
+                buy_confirmed = self.quote_guard.confirm('BUY', next_grid['layer'] if next_grid else None)
+                if not grid_buy:
+                    self._log(f"当前 BUY 方向加工费：{ fee_buy } ,未触发网格")
+                else:
+                    new_layer = grid_buy['layer']
+                    self._log(f"当前 BUY 方向加工费 { fee_buy } 位于第 { new_layer } 层 ")
+                    if(next_grid and not buy_confirmed):
+                        self._log(f"原加工费位于第 { self.layer } 层,高于现在,等待换层确认")
+                    elif(next_grid):
+                        orders = self._rebalance_orders(next_grid['down'])
+                        checked = self.risk.check(orders) if orders else None
+                        if( checked ):
+                            self._log(f"原加工费位于第 { self.layer } 层,高于现在,下单方向:BUY")
+                            self._set_layer(next_grid['layer'])
+                            trade_id = str(uuid.uuid4())
+                            await self._execute_orders(checked, fee_buy, trade_id, 'BUY')
+                        elif( orders ):
+                            self._log(f"原加工费位于第 { self.layer } 层,高于现在,风控拦截：{ self.risk.last_reason }")
+                        else:
+                            self._log(f"原加工费位于第 { self.layer } 层,高于现在,但无需调整持仓")
+                    else:
+                        self._log(f"原加工费位于第 { self.layer } 层,无需调整持仓")
+
+                
+                fee_sell = self._calculate_fee(direction='SELL')
+                self.latency.since_tick('fee_computed')
+                grid_sell = self._get_current_grid(fee_sell)
+                next_grid = self._get_transition_grid('SELL', fee_sell, grid_sell)
+                self.latency.since_tick('grid_decided')
+                sell_confirmed = self.quote_guard.confirm('SELL', next_grid['layer'] if next_grid else None)
+                if not grid_sell:
+                    self._log(f"当前 SELL 方向加工费：{ fee_sell } ,未触发网格")
+                else:
+                    new_layer = grid_sell['layer']
+                    self._log(f"当前 SELL 方向加工费 { fee_sell } 位于第{ new_layer } 层 ")
+                    if(next_grid and not sell_confirmed):
+                        self._log(f"原加工费位于第 { self.layer } 层,低于现在,等待换层确认")
+                    elif(next_grid):
+                        orders = self._rebalance_orders(next_grid['up'])
+                        checked = self.risk.check(orders) if orders else None
+                        if( checked ):
+                            self._log(f"原加工费位于第 { self.layer } 层,低于现在,下单方向:SELL")
+                            self._set_layer(next_grid['layer'])
+                            trade_id = str(uuid.uuid4())
+                            await self._execute_orders(checked, fee_sell, trade_id, 'SELL')
+                        elif( orders ):
+                            self._log(f"原加工费位于第 { self.layer } 层,低于现在,风控拦截：{ self.risk.last_reason }")
+                        else:
+                            self._log(f"原加工费位于第 { self.layer } 层,低于现在,但无需调整持仓")
+                    else:
+                        self._log(f"原加工费位于 { self.layer } 层,无需调整持仓")
+                self.recorder.record(fee_buy, fee_sell, grid_buy, grid_sell)
+                                                
+            except BacktestFinished:
+                print(f"Strategy:{self.name} 回测行情回放结束")
+                await self.stop()
+            except Exception as e:
+                print(f"策略异常类型: {type(e)}，信息：{str(e)}")
+                await self.stop()
+    def _calculate_fee(self, direction: str) -> float:
+        """具体加工费计算：按价差定义取各腿对手价，系数与 merge_trade / 执行器 / 离线分析共用"""
+        legs = self.legs
+        sell = legs.take_prices('SELL')
+        buy = legs.take_prices('BUY')
+        self._take_prices = (sell, buy)
+        return self.spread.fee(sell if direction == 'SELL' else buy)
+
+
+    # 通用生命周期管理
+    async def stop(self, close_api=True):
+        """停止策略（通用）；与其他策略共用 api 时 close_api 为 False，由创建者关闭"""
+        if self.running:
+            self.latency.dump(os.path.join(self.log_path, "latency.csv"))
+            self._dump_transitions(os.path.join(self.log_path, "transitions.csv"))
+            self.recorder.close()
+            self.fee_stats.flush()
+        self.running = False
+        if close_api:
+            self.api.close()
+
+    async def run(self):
+        """启动策略（通用）：先恢复上次退出时腿数不完整的交易组，各腿持仓平衡后再进入主循环"""
+        try:
+            await self.recovery.recover()
+        except Exception as e:
+            print(f"Strategy:{self.name} 启动恢复失败，类型: {type(e)}，信息：{str(e)}")
+            await self.stop()
+            return
         await self.strategy_loop()
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+离线微基准：覆盖加工费计算、网格查找、调仓计算、下单前风控、成交合并、盈亏处理和主力合约分析
+全部使用合成行情与仓库内的 *_trade.csv 样例，不需要连接天勤或米筐
+结果输出为 JSON，便于随交易历史增长对比回归：
+    python benchmark.py --scale 10 --output bench.json
+    python benchmark.py --compare bench.json
+"""
+
+import gc
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest import SimApi
+from profit import merge_trade, process_trades
+from strategy_runner import ConfigGridStrategy, load_config, resolve_strategies
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 各基准的默认输入规模，--scale 按倍数放大
+DEFAULT_SIZES = {
+    'calculate_fee': [10_000, 100_000],
+    'current_grid': [10_000, 100_000],
+    'rebalance_orders': [10_000, 100_000],
+    'risk_check': [10_000, 100_000],
+    'merge_trade': [100, 1_000],
+    'process_trades': [100, 500],
+    'analyze_dominant': [250, 2_500],
+}
+
+
+def synthetic_quotes(n, seed=0) -> pd.DataFrame:
+    """随机游走生成三腿一档行情，列名与回测录制文件一致"""
+    rng = np.random.default_rng(seed)
+    start = {'pr': 5800.0, 'ta': 4500.0, 'eg': 4300.0}
+    tick = {'pr': 2.0, 'ta': 2.0, 'eg': 1.0}
+    data = {'datetime': pd.date_range('2025-05-07 09:00:00', periods=n, freq='s')}
+    for leg, price in start.items():
+        mid = price + np.cumsum(rng.integers(-1, 2, n)) * tick[leg]
+        data[f'{leg}_bid'] = mid
+        data[f'{leg}_ask'] = mid + tick[leg]
+        data[f'{leg}_bid_volume'] = rng.integers(1, 50, n)
+        data[f'{leg}_ask_volume'] = rng.integers(1, 50, n)
+    return pd.DataFrame(data)
+
+
+def make_strategy(log_root):
+    """用配置文件中第一个启用的策略和 SimApi 构造策略实例"""
+    settings = resolve_strategies(load_config(os.path.join(ROOT, "strategies.toml")))[0]
+    api = SimApi(synthetic_quotes(100))
+    strategy = ConfigGridStrategy(settings, None, api=api, log_root=log_root)
+    strategy.verbose = False
+    api.wait_update()
+    return strategy
+
+
+def fixture_groups() -> list:
+    """读取仓库内的成交样例，按 trade_id 分组作为复制模板"""
+    files = sorted(glob.glob(os.path.join(ROOT, "*_trade.csv")))
+    df = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+    df = df.dropna(subset=['trade_id', 'offset'])
+    return [group for _, group in df.groupby('trade_id', sort=False) if len(group) == 3]
+
+
+def synthetic_trades(n_groups) -> pd.DataFrame:
+    """复制样例成交组到 n_groups 组，trade_id 加序号，时间按组递增，flag 置 1 待合并"""
+    templates = fixture_groups()
+    base = pd.Timestamp('2025-05-07 09:00:00')
+    frames = []
+    for i in range(n_groups):
+        group = templates[i % len(templates)].copy()
+        group['trade_id'] = f"{group['trade_id'].iloc[0]}-{i}"
+        group['timestamp'] = [str(base + pd.Timedelta(seconds=60 * i + j)) for j in range(len(group))]
+        group['flag'] = 1
+        frames.append(group)
+    return pd.concat(frames, ignore_index=True)
+
+
+def synthetic_open_interest(n_days, n_contracts=12, seed=0) -> pd.DataFrame:
+    """
+    生成逐月合约依次成为主力的持仓量，列名为四位年月
+    合约在持仓峰值前 3 个周期上市，此后每天都有持仓，任意天数下主力合约都有数据
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2015-01-05', periods=n_days)
+    columns = [f"{15 + i // 12:02d}{i % 12 + 1:02d}" for i in range(n_contracts)]
+    t = np.arange(n_days)[:, None]
+    peak = np.linspace(0, n_days, n_contracts)[None, :]
+    width = n_days / n_contracts
+    oi = 1e5 * np.exp(-((t - peak) / width) ** 2) + rng.uniform(1, 1e3, (n_days, n_contracts))
+    oi[t < peak - 3 * width] = np.nan
+    return pd.DataFrame(oi, index=index, columns=columns)
+
+
+def measure(func, setup, repeat):
+    """每轮先执行未计时的 setup，再计时 func(setup())，返回各轮耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_calculate_fee(n, workdir, repeat):
+    strategy = make_strategy(workdir)
+
+    def run(_):
+        for _ in range(n // 2):
+            strategy._calculate_fee('BUY')
+            strategy._calculate_fee('SELL')
+    timings = measure(run, lambda: None, repeat)
+    strategy.api.close()
+    return timings
+
+
+def bench_current_grid(n, workdir, repeat):
+    strategy = make_strategy(workdir)
+    # 首尾层通常是开区间（±inf），用内部边界确定取值范围
+    edges = [g['max'] for g in strategy.grid_settings[:-1]]
+    fees = np.random.default_rng(1).uniform(min(edges) - 5, max(edges) + 5, n).tolist()
+
+    def run(_):
+        for fee in fees:
+            strategy._get_current_grid(fee)
+    timings = measure(run, lambda: None, repeat)
+    strategy.api.close()
+    return timings
+
+
+def bench_rebalance_orders(n, workdir, repeat):
+    strategy = make_strategy(workdir)
+    rng = np.random.default_rng(2)
+    units = rng.integers(-10, 11, n).tolist()
+    held = rng.integers(-10, 11, n).tolist()
+
+    def run(_):
+        for u, h in zip(units, held):
+            for sym, position in strategy.position.items():
+                net = strategy.min_unit[sym] * h
+                position['long'], position['short'] = max(net, 0), max(-net, 0)
+            strategy._rebalance_orders(u)
+    timings = measure(run, lambda: None, repeat)
+    strategy.api.close()
+    return timings
+
+
+def bench_risk_check(n, workdir, repeat):
+    strategy = make_strategy(workdir)
+    strategy.risk.max_position = {'pr': 10 * abs(strategy.min_unit['pr'])}
+    rng = np.random.default_rng(3)
+    batches = [strategy._rebalance_orders(int(u)) for u in rng.integers(1, 15, n)]
+
+    def run(_):
+        for orders in batches:
+            if orders:
+                strategy.risk.check(orders)
+    timings = measure(run, lambda: None, repeat)
+    strategy.api.close()
+    return timings
+
+
+def bench_merge_trade(n, workdir, repeat):
+    trades = synthetic_trades(n)
+    trade_path = os.path.join(workdir, "bench_trade.csv")
+    merged_path = os.path.join(workdir, "merged_data.csv")
+
+    def setup():
+        if os.path.exists(merged_path):
+            os.remove(merged_path)
+        trades.to_csv(trade_path, index=False)
+        return trade_path
+    return measure(merge_trade, setup, repeat)
+
+
+def bench_process_trades(n, workdir, repeat):
+    trade_path = os.path.join(workdir, "bench_trade.csv")
+    synthetic_trades(n).to_csv(trade_path, index=False)
+    merge_trade(trade_path)
+    source = os.path.join(workdir, "merged_source.csv")
+    shutil.move(os.path.join(workdir, "merged_data.csv"), source)
+    merged_path = os.path.join(workdir, "merged_data.csv")
+    profit_path = os.path.join(workdir, "profit.csv")
+
+    def setup():
+        shutil.copy(source, merged_path)
+        if os.path.exists(profit_path):
+            os.remove(profit_path)
+        return merged_path
+    return measure(lambda path: process_trades(path, profit_path), setup, repeat)
+
+
+def bench_analyze_dominant(n, workdir, repeat):
+    from RiceQuantDB import DominantContractAnalyzer
+    open_interest = synthetic_open_interest(n)
+    analyzer = DominantContractAnalyzer.__new__(DominantContractAnalyzer)
+    analyzer.future_symbol, analyzer.rule, analyzer.lookback_days, analyzer.threshold = 'EG', 0, 3, 1.1
+    analyzer._fetch_open_interest_data = lambda: open_interest.copy()
+    return measure(lambda _: analyzer._analyze_dominant_contracts(), lambda: None, repeat)
+
+
+BENCHMARKS = {
+    'calculate_fee': bench_calculate_fee,
+    'current_grid': bench_current_grid,
+    'rebalance_orders': bench_rebalance_orders,
+    'risk_check': bench_risk_check,
+    'merge_trade': bench_merge_trade,
+    'process_trades': bench_process_trades,
+    'analyze_dominant': bench_analyze_dominant,
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_benchmarks(only=None, scale=1.0, repeat=5) -> dict:
+    results = []
+    for name, func in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        for size in DEFAULT_SIZES[name]:
+            n = max(int(size * scale), 1)
+            workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+            entry = {'name': name, 'size': n, 'repeat': repeat}
+            try:
+                # 基准内部的打印（如 merge_trade 的处理完成提示）不混入结果
+                with open(os.devnull, 'w') as devnull:
+                    stdout, sys.stdout = sys.stdout, devnull
+                    try:
+                        timings = func(n, workdir, repeat)
+                    finally:
+                        sys.stdout = stdout
+            except ImportError as e:
+                entry['skipped'] = f"缺少依赖: {e}"
+                print(f"{name:<18} {n:>9} 跳过（{entry['skipped']}）")
+                results.append(entry)
+                break
+            except Exception as e:
+                # 单个基准失败不影响其余基准与结果输出
+                entry['error'] = f"{type(e).__name__}: {e}"
+                print(f"{name:<18} {n:>9} 失败（{entry['error']}）")
+                results.append(entry)
+                continue
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            entry.update({
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.mean(timings),
+                'per_item_us': statistics.median(timings) / n * 1e6,
+            })
+            print(f"{name:<18} {n:>9} 中位数 {entry['median'] * 1e3:10.2f} ms  单条 {entry['per_item_us']:10.2f} us")
+            results.append(entry)
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'scale': scale,
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """按 (name, size) 对比中位数耗时，打印相对基线的倍数"""
+    base = {(r['name'], r['size']): r for r in baseline['results'] if 'median' in r}
+    print(f"\n对比基线 {baseline.get('commit', '')} ({baseline.get('timestamp', '')})")
+    for r in report['results']:
+        old = base.get((r['name'], r['size']))
+        if old and 'median' in r:
+            print(f"{r['name']:<18} {r['size']:>9} {r['median'] / old['median']:6.2f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="策略与盈亏计算热点的离线微基准")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="只运行指定基准")
+    parser.add_argument("--scale", type=float, default=1.0, help="输入规模倍数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个规模重复次数")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    parser.add_argument("--compare", default=None, help="与之前输出的 JSON 对比")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.only, args.scale, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.output}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
@@ -0,0 +1,174 @@
+import os
+import re
+import time
+
+# 手续费率表（交易所标准），按品种：per_lot 为每手固定金额，rate 为成交额比例；
+# close_today_* 为平今费率，缺省与开仓 / 平昨相同
+DEFAULT_RATES = {
+    'pr': {'per_lot': 0, 'rate': 1.01e-5},
+    'ta': {'per_lot': 3, 'rate': 0},
+    'eg': {'per_lot': 4, 'rate': 0},
+}
+
+
+def product_of(instrument_id) -> str:
+    """合约代码对应的品种：CZCE.PR509 / PR509 -> pr，DCE.eg2509 -> eg"""
+    return re.match(r'[A-Za-z]+', instrument_id.split('.')[-1]).group().lower()
+
+
+class CommissionModel:
+    """
+    按费率表逐笔计算手续费，不依赖账户手续费的前后差值
+    - rates：{品种: {per_lot, rate, close_today_per_lot, close_today_rate}}，未列出的品种取 DEFAULT_RATES
+    - broker_markup：期货公司在交易所标准上加收的比例（0.5 即按交易所标准的 1.5 倍收取）
+    平今手数由调用方给出：郑商所、大商所按先开先平，平仓先平昨仓，超出昨仓的部分为平今
+    """
+
+    def __init__(self, rates=None, broker_markup=0.0):
+        self.broker_markup = broker_markup
+        self.rates = {}
+        for product, rate in {**DEFAULT_RATES, **(rates or {})}.items():
+            self.set_rate(product, **rate)
+        self._products = {}
+
+    def set_rate(self, product, per_lot=0, rate=0, close_today_per_lot=None, close_today_rate=None):
+        self.rates[product.lower()] = (
+            (per_lot, rate),
+            (per_lot if close_today_per_lot is None else close_today_per_lot,
+             rate if close_today_rate is None else close_today_rate),
+        )
+
+    def rate(self, instrument_id, close_today=False) -> tuple:
+        """(每手金额, 成交额比例)，已含期货公司加收"""
+        product = self._products.get(instrument_id)
+        if product is None:
+            product = self._products[instrument_id] = product_of(instrument_id)
+        per_lot, value_rate = self.rates[product][1 if close_today else 0]
+        scale = 1 + self.broker_markup
+        return per_lot * scale, value_rate * scale
+
+    def commission(self, instrument_id, price, volume, volume_multiple, close_today=0) -> float:
+        """一笔成交的手续费，close_today 为其中平今的手数"""
+        total = 0.0
+        for lots, today in ((volume - close_today, False), (close_today, True)):
+            if lots:
+                per_lot, value_rate = self.rate(instrument_id, today)
+                total += per_lot * lots + value_rate * price * lots * volume_multiple
+        return total
+
+
+class CommissionLedger:
+    """
+    策略的逐笔手续费归属与异步对账
+    - attribute：下单完成后按成交记录逐笔计算手续费（内部撮合的成交为 0），同时记下当日开仓手数用于区分平今
+    - reconcile：主循环中每 interval 秒把归属合计与柜台手续费比较，
+      偏差超过 tolerance 元时打印并写入日志目录下的 commission.csv，不阻塞下单
+    柜台手续费按交易日清零，对账时检测到回落即把前一日的金额累加，与归属合计同为启动以来的累计值
+    同账户的多个策略（Portfolio）由第一个注册的策略按全部策略的合计对账
+    """
+
+    COLUMNS = ['timestamp', 'expected', 'actual', 'diff']
+
+    def __init__(self, strategy, model, enabled=True, interval=5.0, tolerance=0.01):
+        self.strategy = strategy
+        self.model = model
+        self.enabled = enabled
+        self.interval = interval
+        self.tolerance = tolerance
+        self.expected = 0.0  # 启动以来归属的手续费合计
+        self.history = []
+        self._opened = {}  # (合约, 持仓方向) -> 当日开仓手数
+        self._day = None
+        self._start = self._account_commission()  # 启动前柜台已有的手续费不属于本次运行
+        self._last = self._start
+        self._carry = 0.0
+        self._next_check = 0.0
+        self._last_diff = 0.0
+
+    def _account_commission(self):
+        commission = self.strategy.account.commission
+        return commission if commission == commission else None
+
+    def attribute(self, trade_records, held=0) -> float:
+        """
+        一次报单全部成交记录的手续费合计
+        held 为平仓前该方向的持仓手数，其中超出当日开仓手数的部分视为昨仓
+        """
+        strategy = self.strategy
+        now = strategy._now()
+        day = strategy.calendar.trading_day(now) if strategy.calendar else now.date()
+        if day != self._day:
+            self._day = day
+            self._opened.clear()
+        total = 0.0
+        for key, trade in trade_records.items():
+            if key.startswith('internal-'):
+                continue
+            instrument = trade['instrument_id']
+            volume = trade['volume']
+            if trade['offset'] == 'OPEN':
+                side = (instrument, trade['direction'])
+                self._opened[side] = self._opened.get(side, 0) + volume
+                close_today = 0
+            else:
+                side = (instrument, 'SELL' if trade['direction'] == 'BUY' else 'BUY')
+                today = self._opened.get(side, 0)
+                close_today = min(max(volume - max(held - today, 0), 0), today)
+                self._opened[side] = today - close_today
+                held -= volume
+            total += self.model.commission(instrument, trade['price'], volume,
+                                           self._volume_multiple(instrument), close_today)
+        self.expected += total
+        return total
+
+    def _volume_multiple(self, instrument):
+        strategy = self.strategy
+        for sym, contract in strategy.symbols.items():
+            if contract.split('.')[-1] == instrument:
+                return strategy.quotes[sym].volume_multiple
+        return strategy.api.get_quote(instrument).volume_multiple
+
+    def reconcile(self):
+        """与柜台手续费对账，interval 内重复调用直接返回"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.interval
+        strategy = self.strategy
+        portfolio = strategy.portfolio
+        if portfolio is not None and portfolio.strategies and portfolio.strategies[0] is not strategy:
+            return
+        current = self._account_commission()
+        if current is None:
+            return
+        if self._start is None:
+            self._start = self._last = current - self.expected
+        if current < self._last - self.tolerance:
+            self._carry += self._last  # 交易日切换，柜台手续费清零
+        self._last = current
+        ledgers = [s.commissions for s in portfolio.strategies] if portfolio is not None else [self]
+        expected = sum(ledger.expected for ledger in ledgers)
+        actual = self._carry + current - self._start
+        diff = actual - expected
+        if abs(diff) <= self.tolerance or abs(diff - self._last_diff) <= self.tolerance:
+            return
+        self._last_diff = diff
+        record = {
+            'timestamp': strategy._now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'expected': round(expected, 2),
+            'actual': round(actual, 2),
+            'diff': round(diff, 2),
+        }
+        self.history.append(record)
+        self._save(record)
+        strategy._log(f"手续费对账偏差 {record['diff']}：逐笔归属 {record['expected']}，柜台 {record['actual']}")
+
+    def _save(self, record):
+        path = os.path.join(self.strategy.log_path, "commission.csv")
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(self.COLUMNS) + "\n")
+            f.write(",".join(str(record[k]) for k in self.COLUMNS) + "\n")
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from profit import merge_trade, process_trades
+from trade_db import TradeDB
+from trading_calendar import TradingCalendar
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "eod_state.json"
+SUMMARY_COLUMNS = ['strategy', 'trade_files', 'merged_files', 'merged_rows', 'profit_rows',
+                   'seconds', 'error', 'log_path']
+
+
+def discover(log_root=None) -> list:
+    """日志根目录下含 *_trade.csv 的策略子目录"""
+    log_root = Path(log_root or os.path.join(ROOT, "logs"))
+    if not log_root.is_dir():
+        return []
+    return sorted(p for p in log_root.iterdir() if p.is_dir() and any(p.glob("*_trade.csv")))
+
+
+def _signature(path) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_state(log_path) -> dict:
+    path = os.path.join(log_path, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_state(log_path, state):
+    path = os.path.join(log_path, STATE_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def close_strategy(log_path, calendar=None, force=False) -> dict:
+    """
+    单个策略目录的收盘处理：合并三腿成交，再计算利润
+    - eod_state.json 记录每个交易文件处理后的大小与修改时间，未变化的文件不再读取
+    - 没有新合并的交易组且 merged_data.csv 未变化时跳过利润计算，重复执行不产生任何写入
+    - force 时忽略记录重新检查全部交易文件（已合并的交易组 flag 为 0，不会重复合并）
+    """
+    log_path = Path(log_path)
+    started = time.perf_counter()
+    summary = dict.fromkeys(SUMMARY_COLUMNS, 0)
+    summary.update(strategy=log_path.name, error='', log_path=str(log_path))
+    try:
+        state = {} if force else _load_state(log_path)
+        files = state.setdefault('files', {})
+        trade_files = sorted(log_path.glob("*_trade.csv"))
+        summary['trade_files'] = len(trade_files)
+        for trade_file in trade_files:
+            if files.get(trade_file.name) == _signature(trade_file):
+                continue
+            with open(trade_file) as f:
+                has_rows = sum(1 for _ in f) > 1
+            if has_rows:
+                summary['merged_rows'] += len(merge_trade(trade_file))
+                summary['merged_files'] += 1
+            # merge_trade 会回写交易文件（合并后的行 flag 置 0），记录回写后的状态
+            files[trade_file.name] = _signature(trade_file)
+
+        merged_path = log_path / "merged_data.csv"
+        if merged_path.exists() and merged_path.stat().st_size > 0 and \
+                (summary['merged_rows'] or state.get('merged') != _signature(merged_path)):
+            summary['profit_rows'] = process_trades(merged_path, log_path / "profit.csv", calendar)
+            state['merged'] = _signature(merged_path)
+        _save_state(log_path, state)
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def run_eod(log_root=None, workers=None, force=False, calendar=None) -> pd.DataFrame:
+    """
+    收盘流程：发现日志目录下全部策略，在进程池中并行执行 close_strategy，返回并打印汇总表
+    交易日历在主进程加载一次后传给各子进程；全部完成后由主进程把新增成交同步到成交数据库（SQLite 只有一个写入者）
+    """
+    started = time.perf_counter()
+    log_root = log_root or os.path.join(ROOT, "logs")
+    dirs = discover(log_root)
+    if not dirs:
+        print(f"未发现策略日志目录：{log_root}")
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    calendar = calendar or TradingCalendar.load()
+    workers = min(workers or os.cpu_count() or 1, len(dirs))
+    if workers == 1:
+        rows = [close_strategy(d, calendar, force) for d in dirs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(close_strategy, dirs, [calendar] * len(dirs), [force] * len(dirs)))
+
+    with TradeDB(os.path.join(log_root, "trades.db")) as db:
+        synced = sum(db.sync_strategy(d) for d in dirs)
+
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    failed = summary[summary['error'] != '']
+    print(f"收盘处理完成：{len(summary)} 个策略，合并 {summary['merged_files'].sum()} 个交易文件 / "
+          f"{summary['merged_rows'].sum()} 个交易组，新增利润记录 {summary['profit_rows'].sum()} 条，"
+          f"入库成交 {synced} 条，失败 {len(failed)} 个，用时 {time.perf_counter() - started:.2f}s")
+    print(summary.drop(columns='log_path').to_string(index=False))
+    for _, row in failed.iterrows():
+        print(f"处理失败 {row['strategy']}: {row['error']}")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="收盘流程：并行合并全部策略的三腿成交并计算利润")
+    parser.add_argument("log_root", nargs="?", default=os.path.join(ROOT, "logs"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="忽略处理记录，重新检查全部交易文件")
+    parser.add_argument("--summary", help="汇总表另存为 CSV")
+    args = parser.parse_args()
+    result = run_eod(args.log_root, args.workers, args.force)
+    if args.summary:
+        result.to_csv(args.summary, index=False)
@@ -0,0 +1,101 @@
+import math
+import os
+
+
+class SpreadExecutor:
+    """
+    三腿调仓执行器
+    - 按盘口一档挂单量与所需手数之比排序，流动性最差的腿先成交
+    - 每条腿按目标加工费反推限价：已成交腿取成交价，未成交腿取当前对手价
+    - 限价单超过 timeout 秒未成交则撤单，剩余手数按对手价加 cross_ticks 跳成交
+    - 每次执行后记录实际加工费与目标加工费之差，写入日志目录下的 execution.csv
+    enabled 为 False 时保持原有行为：按 pr -> ta -> eg 顺序市价成交，但仍记录执行结果
+    """
+
+    def __init__(self, strategy, enabled=False, timeout=3.0, cross_ticks=1):
+        self.strategy = strategy
+        self.enabled = enabled
+        self.timeout = timeout
+        self.cross_ticks = cross_ticks
+        self.reports = []
+
+    def _take_price(self, sym, direction):
+        """按对手价成交时的价格"""
+        quote = self.strategy.quotes[sym]
+        return quote.ask_price1 if direction == 'BUY' else quote.bid_price1
+
+    def sequence(self, orders) -> list:
+        """流动性最差（一档挂单量 / 所需手数最小）的腿排在最前"""
+        def liquidity(order):
+            sym, volume, direction = order
+            quote = self.strategy.quotes[sym]
+            depth = quote.ask_volume1 if direction == 'BUY' else quote.bid_volume1
+            depth = depth if depth == depth else 0  # NaN 视为无挂单
+            return depth / volume
+        return sorted(orders, key=liquidity)
+
+    def limit_price(self, sym, direction, fee_target, fills, orders) -> float:
+        """由目标加工费反推该腿限价，买入向下、卖出向上取整到最小变动价位"""
+        spread = self.strategy.spread
+        directions = {s: d for s, _, d in orders}
+        others = 0.0
+        for leg, coef in zip(spread.keys, spread.coefficients):
+            if leg == sym:
+                continue
+            if leg in fills:
+                price = fills[leg]
+            elif leg in directions:
+                price = self._take_price(leg, directions[leg])
+            else:
+                price = self.strategy.quotes[leg].last_price
+            others += coef * price
+        price = (fee_target - others) / spread.coefficient(sym)
+        tick = self.strategy.quotes[sym].price_tick
+        if direction == 'BUY':
+            return math.floor(round(price / tick, 6)) * tick
+        return math.ceil(round(price / tick, 6)) * tick
+
+    async def execute(self, orders, fee, trade_id, side) -> dict:
+        """执行一组 (sym, volume, direction) 调仓并返回执行报告"""
+        strategy = self.strategy
+        started = strategy._now()
+        sequence = self.sequence(orders) if self.enabled else list(orders)
+        fills = {}
+        for sym, volume, direction in sequence:
+            limit = self.limit_price(sym, direction, fee, fills, orders) if self.enabled else None
+            price = await strategy.place_orders(sym, volume, direction, fee, trade_id,
+                                                limit_price=limit, timeout=self.timeout if self.enabled else None)
+            if price is not None:
+                fills[sym] = price
+
+        # 未调仓的腿按当前盘口计入，与 _calculate_fee 口径一致
+        spread = strategy.spread
+        opposite = 'SELL' if side == 'BUY' else 'BUY'
+        realized = spread.fee([
+            fills[leg] if leg in fills else self._take_price(leg, side if coef > 0 else opposite)
+            for leg, coef in zip(spread.keys, spread.coefficients)
+        ])
+        slippage = realized - fee if side == 'BUY' else fee - realized
+        report = {
+            'trade_id': trade_id,
+            'timestamp': started.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'side': side,
+            'sequence': '>'.join(sym for sym, _, _ in sequence),
+            'fee_target': round(fee, 2),
+            'fee_realized': round(realized, 2),
+            'slippage': round(slippage, 2),
+            'elapsed': (strategy._now() - started).total_seconds(),
+        }
+        self.reports.append(report)
+        self._save_report(report)
+        strategy._log(f"调仓执行完成：目标加工费 {report['fee_target']}，实际 {report['fee_realized']}，"
+                      f"滑点 {report['slippage']}，顺序 {report['sequence']}")
+        return report
+
+    def _save_report(self, report):
+        path = os.path.join(self.strategy.log_path, "execution.csv")
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(report) + "\n")
+            f.write(",".join(str(v) for v in report.values()) + "\n")
@@ -0,0 +1,159 @@
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+from trading_calendar import NIGHT_END, NIGHT_START, TradingCalendar
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class RollingRange:
+    """
+    时间窗口内的最大值 / 最小值：单调队列，每次 push 均摊 O(1)
+    窗口为 horizon 秒，push 时淘汰窗口外的旧值
+    """
+
+    def __init__(self, horizon):
+        self.horizon = horizon
+        self._max = deque()  # (t, value)，value 单调递减
+        self._min = deque()  # (t, value)，value 单调递增
+
+    def push(self, t, value):
+        start = t - self.horizon
+        highs, lows = self._max, self._min
+        while highs and highs[-1][1] <= value:
+            highs.pop()
+        highs.append((t, value))
+        while highs[0][0] < start:
+            highs.popleft()
+        while lows and lows[-1][1] >= value:
+            lows.pop()
+        lows.append((t, value))
+        while lows[0][0] < start:
+            lows.popleft()
+
+    @property
+    def range(self):
+        return self._max[0][1] - self._min[0][1] if self._max else math.nan
+
+    def clear(self):
+        self._max.clear()
+        self._min.clear()
+
+
+class FeeStatistics:
+    """
+    盘中加工费统计：按各腿最新价计算加工费（与 pr_calculate.ipynb 用 1 秒 K 线收盘价回补的口径一致），
+    每次行情 O(1) 更新当日最高 / 最低、各时间窗口（horizons 秒）的滚动波幅及其当日最大值、行情次数
+    交易日切换或策略停止时把当日一行写入日志目录下的 fee_stats.csv；
+    配置 fee_file（如 pr_fee.csv）时同时写入 date,high,low 一行，已交易的日期不再需要下载 K 线回补
+    同一交易日重启后再次写入时与已有的行合并（最高取大、最低取小、次数累加），重复写入结果不变
+    """
+
+    def __init__(self, strategy, enabled=True, horizons=(60, 300, 1800), fee_file=None):
+        self.strategy = strategy
+        self.enabled = enabled
+        self.horizons = tuple(horizons)
+        self.fee_file = os.path.join(ROOT, fee_file) if fee_file else None
+        self.path = os.path.join(strategy.log_path, "fee_stats.csv")
+        self.windows = [RollingRange(h) for h in self.horizons]
+        self.day = None
+        self._key = None
+        self._calendar = None
+        self._reset()
+
+    def _reset(self):
+        self.high = -math.inf
+        self.low = math.inf
+        self.ticks = 0
+        self.max_ranges = [0.0] * len(self.horizons)
+        self._written = None
+        for window in self.windows:
+            window.clear()
+
+    def update(self):
+        """在加工费计算之后调用，行情无效时跳过"""
+        if not self.enabled:
+            return
+        strategy = self.strategy
+        fee = strategy.spread.fee([q.last_price for q in strategy.legs.quotes])
+        if fee != fee:
+            return
+        now = strategy._now()
+        # 所属交易日只取决于自然日与是否处于夜盘 / 凌晨，同一段时间内不重复查日历
+        clock = now.time()
+        key = (now.toordinal(), clock >= NIGHT_START, clock < NIGHT_END)
+        if key != self._key:
+            self._key = key
+            day = self._trading_day(now)
+            if day != self.day:
+                self.flush()
+                self._reset()
+                self.day = day
+        t = now.toordinal() * 86400 + now.hour * 3600 + now.minute * 60 + now.second + now.microsecond * 1e-6
+        if fee > self.high:
+            self.high = fee
+        if fee < self.low:
+            self.low = fee
+        self.ticks += 1
+        ranges = self.max_ranges
+        for i, window in enumerate(self.windows):
+            window.push(t, fee)
+            r = window.range
+            if r > ranges[i]:
+                ranges[i] = r
+
+    def ranges(self) -> dict:
+        """当前各窗口的滚动波幅，{horizon: 波幅}"""
+        return {h: w.range for h, w in zip(self.horizons, self.windows)}
+
+    def _trading_day(self, now):
+        calendar = self.strategy.calendar
+        if calendar is None:
+            if self._calendar is None:
+                self._calendar = TradingCalendar.load()
+            calendar = self._calendar
+        return calendar.trading_day(now)
+
+    def row(self) -> dict:
+        row = {'date': str(self.day), 'high': round(self.high, 2), 'low': round(self.low, 2), 'ticks': self.ticks}
+        for h, r in zip(self.horizons, self.max_ranges):
+            row[f'range_{h}s'] = round(r, 2)
+        return row
+
+    def flush(self):
+        """写入当日统计；与上次写入后没有新行情时不重复写"""
+        if not self.enabled or self.day is None or self.ticks == 0 or self._written == self.ticks:
+            return
+        row = self.row()
+        previous = self._written or 0
+        _upsert(self.path, row, ticks_delta=self.ticks - previous)
+        if self.fee_file:
+            _upsert(self.fee_file, {k: row[k] for k in ('date', 'high', 'low')})
+        self._written = self.ticks
+
+
+def _upsert(path, row, ticks_delta=None):
+    """按日期写入一行：已有同日期的行时合并"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        df = pd.read_csv(path, dtype={'date': str})
+    else:
+        df = pd.DataFrame(columns=list(row))
+    match = df['date'] == row['date']
+    if match.any():
+        i = df.index[match][0]
+        for key, value in row.items():
+            old = df.loc[i, key] if key in df.columns else math.nan
+            if key == 'date' or pd.isna(old):
+                df.loc[i, key] = value
+            elif key == 'high' or key.startswith('range_'):
+                df.loc[i, key] = max(old, value)
+            elif key == 'low':
+                df.loc[i, key] = min(old, value)
+            elif key == 'ticks':
+                df.loc[i, key] = old + ticks_delta
+    else:
+        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True) if not df.empty else pd.DataFrame([row])
+    df.sort_values('date').to_csv(path, index=False, float_format='%.2f')
@@ -0,0 +1,256 @@
+import hashlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from commission import CommissionModel
+from spread import PR_SPREAD
+
+# 合约乘数（吨/手）与每手手续费估算，用于把加工费单位换算为资金
+VOLUME_MULTIPLE = PR_SPREAD.multipliers
+# 按成交额收取手续费的品种（pr）估算每手手续费所用的参考价格
+REFERENCE_PRICE = {'pr': 6000, 'ta': 4800, 'eg': 4400}
+
+
+def commission_per_lot(model=None, prices=None) -> dict:
+    """按手续费率表（与实盘 / 回测的 CommissionModel 一致）估算各腿每手手续费"""
+    model = model or CommissionModel()
+    prices = prices or REFERENCE_PRICE
+    return {leg.key: model.commission(leg.product, prices[leg.key], 1, leg.volume_multiple)
+            for leg in PR_SPREAD.legs}
+
+
+COMMISSION_PER_LOT = commission_per_lot()
+# 加工费公式中 ta / eg 的对冲比例（吨），取自价差定义：pr - 0.857 * ta - 0.335 * eg
+FEE_COEF = {key: -PR_SPREAD.coefficient(key) for key in ('ta', 'eg')}
+
+RESULT_COLUMNS = ['key', 'center', 'width', 'ladder_above', 'ladder_below', 'pr_lots', 'ta_lots', 'eg_lots',
+                  'pnl', 'gross_pnl', 'commission', 'turnover', 'trades', 'max_exposure', 'hedge_error']
+
+
+def load_fee_path(fee_file="pr_fee.csv", resolution=1.0) -> np.ndarray:
+    """
+    由每日加工费最高/最低值构造逐点价格路径
+    - 日内先到达离前一点更近的极值，再到达另一个极值
+    - 相邻点之间按 resolution 线性插值，保证网格边界被逐层穿越
+    """
+    df = pd.read_csv(fee_file)
+    df.columns = [c.lower() for c in df.columns]
+    df = df.rename(columns={'max': 'high', 'min': 'low'})
+    df = df.drop_duplicates(subset='date').sort_values('date')
+    points = [float(df['low'].iloc[0])]
+    for high, low in zip(df['high'].astype(float), df['low'].astype(float)):
+        if abs(points[-1] - high) < abs(points[-1] - low):
+            points.extend([high, low])
+        else:
+            points.extend([low, high])
+
+    path = [points[0]]
+    for a, b in zip(points[:-1], points[1:]):
+        steps = max(int(abs(b - a) / resolution), 1)
+        path.extend(np.linspace(a, b, steps + 1)[1:])
+    return np.asarray(path, dtype=float)
+
+
+def hedge_lots(pr_lots: int) -> dict:
+    """按加工费公式配平 TA/EG 手数，返回与策略 min_unit 相同格式"""
+    tons = pr_lots * VOLUME_MULTIPLE['pr']
+    return {
+        'pr': pr_lots,
+        'ta': -int(round(tons * FEE_COEF['ta'] / VOLUME_MULTIPLE['ta'])),
+        'eg': -int(round(tons * FEE_COEF['eg'] / VOLUME_MULTIPLE['eg'])),
+    }
+
+
+def generate_candidates(centers, widths, ladders_above, ladders_below, pr_lots=(70,)) -> list:
+    """
+    生成候选网格定义
+    - centers: 网格中心（第 -1 层与第 1 层的分界）
+    - widths: 每层宽度
+    - ladders_above / ladders_below: 中心上方/下方每穿越一层增加的持仓单位，如 (1, 1, 1, 1, 1, 2)
+    - pr_lots: 每单位持仓的 pr 手数，ta/eg 手数按公式配平
+    """
+    return [
+        {'center': float(c), 'width': float(w), 'ladder_above': tuple(la), 'ladder_below': tuple(lb),
+         'pr_lots': int(lots)}
+        for c, w, la, lb, lots in itertools.product(centers, widths, ladders_above, ladders_below, pr_lots)
+    ]
+
+
+def candidate_grid_settings(candidate) -> list:
+    """把候选定义展开为策略 _get_grid_settings 返回的网格列表"""
+    center, width = candidate['center'], candidate['width']
+    la, lb = candidate['ladder_above'], candidate['ladder_below']
+    n_above, n_below = len(la), len(lb)
+    grids = [{'layer': -(n_below + 1), 'min': 0, 'max': center - n_below * width,
+              'up': sum(lb), 'down': sum(lb)}]
+    for L in range(n_below, 0, -1):
+        grids.append({'layer': -L, 'min': center - L * width, 'max': center - (L - 1) * width,
+                      'up': sum(lb[:L]), 'down': sum(lb[:L - 1])})
+    for L in range(1, n_above + 1):
+        grids.append({'layer': L, 'min': center + (L - 1) * width, 'max': center + L * width,
+                      'up': -sum(la[:L - 1]), 'down': -sum(la[:L])})
+    grids.append({'layer': n_above + 1, 'min': center + n_above * width, 'max': float('inf'),
+                  'up': -sum(la), 'down': -sum(la)})
+    return grids
+
+
+def simulate_grids(path: np.ndarray, candidates: list) -> pd.DataFrame:
+    """
+    向量化网格模拟：沿价格路径逐点推进，所有候选同时计算
+    规则与 BaseGridStrategy.strategy_loop 一致：
+    - 加工费落入更低层时按该层 down 调仓，落入更高层时按该层 up 调仓
+    - 目标持仓与当前持仓相同时不调仓，层数也不更新
+    """
+    n = len(candidates)
+    center = np.array([c['center'] for c in candidates])
+    width = np.array([c['width'] for c in candidates])
+    n_below = np.array([len(c['ladder_below']) for c in candidates])
+    n_bands = np.array([len(c['ladder_above']) + len(c['ladder_below']) + 2 for c in candidates])
+    max_bands = int(n_bands.max())
+
+    # 每个候选每个区间的 up/down 目标（单位），区间 0 为最下方外层
+    up = np.zeros((n, max_bands))
+    down = np.zeros((n, max_bands))
+    for i, c in enumerate(candidates):
+        grids = candidate_grid_settings(c)
+        up[i, :len(grids)] = [g['up'] for g in grids]
+        down[i, :len(grids)] = [g['down'] for g in grids]
+
+    lower = center - n_below * width
+    top = n_bands - 1
+    rows = np.arange(n)
+    band_now = n_below + 0.5  # 初始 layer = 0 位于第 -1 层与第 1 层之间
+    pos = np.zeros(n)
+    pnl = np.zeros(n)
+    turnover = np.zeros(n)
+    trades = np.zeros(n, dtype=np.int64)
+    max_exposure = np.zeros(n)
+
+    prev = path[0]
+    for fee in path:
+        pnl += pos * (fee - prev)
+        prev = fee
+        band = np.clip(np.floor((fee - lower) / width).astype(np.int64) + 1, 0, top)
+        target = np.where(band < band_now, down[rows, band], np.where(band > band_now, up[rows, band], pos))
+        trade = target != pos
+        if trade.any():
+            turnover += np.abs(target - pos)
+            trades += trade
+            band_now = np.where(trade, band, band_now)
+            pos = target
+            np.maximum(max_exposure, np.abs(pos), out=max_exposure)
+
+    result = []
+    for i, c in enumerate(candidates):
+        lots = hedge_lots(c['pr_lots'])
+        unit_commission = sum(abs(lots[k]) * COMMISSION_PER_LOT[k] for k in lots)
+        gross = pnl[i] * lots['pr'] * VOLUME_MULTIPLE['pr']
+        commission = turnover[i] * unit_commission
+        pr_tons = lots['pr'] * VOLUME_MULTIPLE['pr']
+        # 手数取整带来的敞口（吨）
+        hedge_error = (abs(-lots['ta'] * VOLUME_MULTIPLE['ta'] - pr_tons * FEE_COEF['ta'])
+                       + abs(-lots['eg'] * VOLUME_MULTIPLE['eg'] - pr_tons * FEE_COEF['eg']))
+        result.append({
+            'center': c['center'],
+            'width': c['width'],
+            'ladder_above': '/'.join(map(str, c['ladder_above'])),
+            'ladder_below': '/'.join(map(str, c['ladder_below'])),
+            'pr_lots': lots['pr'],
+            'ta_lots': lots['ta'],
+            'eg_lots': lots['eg'],
+            'pnl': gross - commission,
+            'gross_pnl': gross,
+            'commission': commission,
+            'turnover': turnover[i] * sum(abs(v) for v in lots.values()),
+            'trades': int(trades[i]),
+            'max_exposure': max_exposure[i] * lots['pr'],
+            'hedge_error': hedge_error,
+        })
+    return pd.DataFrame(result)
+
+
+def _candidate_key(path_digest, candidate) -> str:
+    text = (f"{path_digest}|{candidate['center']}|{candidate['width']}|{candidate['ladder_above']}|"
+            f"{candidate['ladder_below']}|{candidate['pr_lots']}|{COMMISSION_PER_LOT}")
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def sweep(candidates, fee_file="pr_fee.csv", cache_file="sweep_cache.csv", resolution=1.0,
+          workers=None, chunk_size=256) -> pd.DataFrame:
+    """
+    并行网格参数扫描
+    - 结果按 (价格路径, 候选定义, 手续费) 的哈希缓存在 cache_file 中，重复扫描只计算新增候选
+    - 返回按净利润降序排列的结果表
+    """
+    path = load_fee_path(fee_file, resolution)
+    path_digest = hashlib.sha1(path.tobytes()).hexdigest()
+    keys = [_candidate_key(path_digest, c) for c in candidates]
+
+    cached = pd.DataFrame(columns=RESULT_COLUMNS)
+    if cache_file and os.path.exists(cache_file) and os.path.getsize(cache_file) > 0:
+        cached = pd.read_csv(cache_file, dtype={'ladder_above': str, 'ladder_below': str})
+    done = set(cached['key'])
+    pending = [(k, c) for k, c in zip(keys, candidates) if k not in done]
+    print(f"候选 {len(candidates)} 个，命中缓存 {len(candidates) - len(pending)} 个，待计算 {len(pending)} 个")
+
+    if pending:
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(simulate_grids, itertools.repeat(path), [[c for _, c in ch] for ch in chunks]))
+        fresh = pd.concat(frames, ignore_index=True)
+        fresh.insert(0, 'key', [k for k, _ in pending])
+        if cache_file:
+            file_exists = os.path.exists(cache_file) and os.path.getsize(cache_file) > 0
+            fresh.to_csv(cache_file, mode='a' if file_exists else 'w', header=not file_exists,
+                         index=False, float_format='%.2f')
+        cached = pd.concat([cached, fresh], ignore_index=True) if len(cached) else fresh
+
+    result = cached.drop_duplicates(subset='key', keep='last').set_index('key').loc[keys].reset_index()
+    return result.sort_values('pnl', ascending=False).reset_index(drop=True)
+
+
+def format_strategy_config(row) -> str:
+    """把一行扫描结果格式化为可直接粘贴到 strategies.toml 的策略配置（month 需按合约月份填写）"""
+    ladder_above = ', '.join(str(row['ladder_above']).split('/'))
+    ladder_below = ', '.join(str(row['ladder_below']).split('/'))
+    return "\n".join([
+        "[[strategy]]",
+        'month = "YYMM"',
+        f"min_unit = {{ pr = {int(row['pr_lots'])}, ta = {int(row['ta_lots'])}, eg = {int(row['eg_lots'])} }}",
+        f"grid = {{ center = {float(row['center']):g}, width = {float(row['width']):g}, "
+        f"ladder_above = [{ladder_above}], ladder_below = [{ladder_below}] }}",
+    ])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="基于 pr_fee 的网格参数并行扫描")
+    parser.add_argument("--fee-file", default="pr_fee.csv")
+    parser.add_argument("--cache", default="sweep_cache.csv")
+    parser.add_argument("--centers", default="380:430:5", help="起:止:步长")
+    parser.add_argument("--widths", default="5,8,10,12,15")
+    parser.add_argument("--layers", default="3,4,5,6,7", help="中心上下各自的层数")
+    parser.add_argument("--pr-lots", default="2,70")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    start, stop, step = (float(x) for x in args.centers.split(":"))
+    centers = np.arange(start, stop + step / 2, step)
+    widths = [float(x) for x in args.widths.split(",")]
+    ladders = []
+    for n in (int(x) for x in args.layers.split(",")):
+        ladders.append((1,) * n)                # 等量加仓
+        ladders.append((1,) * (n - 1) + (2,))   # 最外层加倍
+    lots = [int(x) for x in args.pr_lots.split(",")]
+
+    result = sweep(generate_candidates(centers, widths, ladders, ladders, lots),
+                   args.fee_file, args.cache, workers=args.workers)
+    print(result.drop(columns='key').head(args.top).to_string(index=False))
+    print("\n# 最优参数：")
+    print(format_strategy_config(result.iloc[0]))
@@ -0,0 +1,122 @@
+import os
+import time
+
+SUB_BUCKET_BITS = 7  # 每个数量级 64 个子桶，相对误差约 1.6%
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """HDR 风格的对数线性直方图，记录纳秒耗时，写入为 O(1) 且不分配内存"""
+
+    def __init__(self, max_bits=40):
+        self.counts = [0] * ((max_bits - SUB_BUCKET_BITS + 2) * SUB_BUCKET_HALF + SUB_BUCKET_HALF)
+        self.total = 0
+        self.max = 0
+        self.min = None
+
+    @staticmethod
+    def _index(value):
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * SUB_BUCKET_HALF + (value >> shift)
+
+    @staticmethod
+    def _value(index):
+        """桶的代表值（桶中点）"""
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift = index // SUB_BUCKET_HALF - 1
+        return ((index - shift * SUB_BUCKET_HALF) << shift) + ((1 << shift) >> 1)
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        if index >= len(self.counts):
+            index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def percentile(self, p):
+        if self.total == 0:
+            return 0
+        rank = max(int(self.total * p / 100 + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+
+class LatencyRecorder:
+    """
+    行情到成交链路的耗时埋点
+    - tick()：wait_update 返回时调用，作为本次行情的起点
+    - since_tick(stage)：记录从行情起点到当前的耗时（加工费计算、网格判定、报单等）
+    - record(stage, start)：记录从 start 到当前的耗时（wait_update 阻塞、订单完成、日志写入等）
+    enabled 为 False 时所有埋点直接返回
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.session_start = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._tick = 0
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    def _hist(self, stage):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        return hist
+
+    def tick(self):
+        if self.enabled:
+            self._tick = time.perf_counter_ns()
+        return self._tick
+
+    def since_tick(self, stage):
+        if self.enabled and self._tick:
+            self._hist(stage).record(time.perf_counter_ns() - self._tick)
+
+    def record(self, stage, start):
+        if self.enabled:
+            self._hist(stage).record(time.perf_counter_ns() - start)
+
+    def summary(self) -> list:
+        """各阶段的次数与分位数（微秒）"""
+        rows = []
+        for stage, hist in self.histograms.items():
+            row = {'session': self.session_start, 'stage': stage, 'count': hist.total}
+            for p in PERCENTILES:
+                row[f'p{p:g}_us'] = round(hist.percentile(p) / 1000, 2)
+            row['max_us'] = round(hist.max / 1000, 2)
+            rows.append(row)
+        return rows
+
+    def dump(self, path):
+        """把本次会话的分位数追加到 path（csv），并清空直方图"""
+        rows = self.summary()
+        if not self.enabled or not rows:
+            return
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(rows[0]) + "\n")
+            for row in rows:
+                f.write(",".join(str(v) for v in row.values()) + "\n")
+        for row in rows:
+            print(f"{row['stage']}: 次数 {row['count']} p50 {row['p50_us']}us p99 {row['p99_us']}us "
+                  f"max {row['max_us']}us")
+        self.histograms.clear()
@@ -0,0 +1,196 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+# 优先级：撤单与平仓（减少风险暴露）先于开仓
+CANCEL, CLOSE, OPEN = 0, 1, 2
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 burst 个"""
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+
+    def wait_time(self, now) -> float:
+        """补充令牌，返回还需等待的秒数（有令牌时为 0）"""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class OrderScheduler:
+    """
+    同一进程内全部策略共用的报单调度：交易所对报单、撤单次数过多的合约会采取监管措施
+    - 令牌桶分三级限速：账户（account）、交易所（exchanges，按 CZCE / DCE）、合约（contract，每个合约一个桶）
+    - 等待令牌的请求按优先级排队：撤单、平仓先于开仓；高优先级请求等待账户或交易所令牌时，低优先级请求不能插队
+    - 按交易日累计每个合约与交易所的报单、撤单次数；达到每日预算的 budget_warn 比例时提示，
+      达到预算后 exhausted 为真，风控只允许减仓
+    各策略运行在独立线程中，共享状态都在同一把锁内访问；计数定期写入 logs/order_counts.csv，重启后从中恢复当日计数
+    """
+
+    COLUMNS = ['trading_day', 'key', 'orders', 'cancels', 'throttled', 'wait']
+
+    def __init__(self, enabled=True, account=None, exchanges=None, contract=None, budget_warn=0.8,
+                 counter_file=None, calendar=None):
+        self.enabled = enabled
+        self.account = dict(account or {'rate': 10, 'burst': 10})
+        self.exchanges = {k: dict(v) for k, v in (exchanges or {}).items()}
+        self.contract = dict(contract or {'rate': 2, 'burst': 4})
+        self.budget_warn = budget_warn
+        self.counter_file = counter_file
+        self.calendar = calendar
+        self.strategies = []
+        self.counts = Counter()  # (key, 'orders' / 'cancels' / 'throttled' / 'wait') -> 当日累计，key 为合约或交易所
+        self.day = None
+        self._account_bucket = TokenBucket(self.account['rate'], self.account.get('burst'))
+        self._buckets = {}
+        self._warned = set()
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def register(self, strategy):
+        with self._cond:
+            self.strategies.append(strategy)
+        strategy.scheduler = self
+
+    # 限速
+    def _contract_buckets(self, contract):
+        buckets = self._buckets.get(contract)
+        if buckets is None:
+            exchange = contract.split('.')[0]
+            if exchange not in self._buckets:
+                spec = self.exchanges.get(exchange)
+                self._buckets[exchange] = TokenBucket(spec['rate'], spec.get('burst')) if spec else None
+            shared = tuple(b for b in (self._account_bucket, self._buckets[exchange]) if b is not None)
+            own = TokenBucket(self.contract['rate'], self.contract.get('burst'))
+            buckets = self._buckets[contract] = (shared, own)
+        return buckets
+
+    def acquire(self, contract, kind='insert', offset='OPEN') -> float:
+        """
+        报单（kind 为 insert）或撤单（cancel）前调用，阻塞到各级令牌都可用，返回等待的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        priority = CANCEL if kind == 'cancel' else CLOSE if offset == 'CLOSE' else OPEN
+        started = time.monotonic()
+        with self._cond:
+            shared, own = self._contract_buckets(contract)
+            entry = (priority, next(self._seq), shared, own)
+            heapq.heappush(self._queue, entry)
+            throttled = False
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(entry, now)
+                if wait <= 0:
+                    break
+                throttled = True
+                self._cond.wait(wait)
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            for bucket in (*shared, own):
+                bucket.take()
+            waited = now - started if throttled else 0.0
+            self._count(contract, 'cancels' if kind == 'cancel' else 'orders', waited)
+            self._cond.notify_all()
+        return waited
+
+    def _wait_time(self, entry, now) -> float:
+        """轮到该请求时返回 0，否则返回建议的等待秒数；排在前面且在等待共用令牌的请求优先"""
+        blocked = set()
+        for other in sorted(self._queue):
+            shared, own = other[2], other[3]
+            waits = [b.wait_time(now) for b in shared]
+            if other is entry:
+                if any(id(b) in blocked for b in shared):
+                    return 0.05
+                return max(*waits, own.wait_time(now), 0.0)
+            blocked.update(id(b) for b, w in zip(shared, waits) if w > 0 or own.wait_time(now) == 0)
+        return 0.0
+
+    # 计数
+    def _trading_day(self):
+        """当前交易日；未传入 calendar 时读取本地缓存（没有缓存时按周一至周五近似，节假日前后会提前切换计数）"""
+        now = pd.Timestamp.now()
+        if self.calendar is None:
+            from trading_calendar import TradingCalendar
+            self.calendar = TradingCalendar.load()
+        return self.calendar.trading_day(now)
+
+    def _roll_day(self):
+        day = self._trading_day()
+        if day != self.day:
+            self.day = day
+            self.counts = self._load(day)
+            self._warned.clear()
+
+    def _count(self, contract, field, waited):
+        self._roll_day()
+        exchange = contract.split('.')[0]
+        for key in (contract, exchange):
+            self.counts[(key, field)] += 1
+            if waited > 0:
+                self.counts[(key, 'throttled')] += 1
+                self.counts[(key, 'wait')] += waited
+        for key, limits in ((contract, self.contract), (exchange, self.exchanges.get(exchange, {}))):
+            limit = limits.get(f'daily_{field}')
+            if limit and self.counts[(key, field)] >= self.budget_warn * limit and (key, field) not in self._warned:
+                self._warned.add((key, field))
+                print(f"{key} 当日{'撤单' if field == 'cancels' else '报单'} {self.counts[(key, field)]} 次，"
+                      f"已用预算 {limit} 的 {self.counts[(key, field)] / limit:.0%}")
+
+    def exhausted(self, contract) -> bool:
+        """合约或所在交易所的当日报单 / 撤单次数达到预算，此后只允许减仓"""
+        if not self.enabled:
+            return False
+        exchange = contract.split('.')[0]
+        with self._cond:
+            self._roll_day()
+            for key, limits in ((contract, self.contract), (exchange, self.exchanges.get(exchange, {}))):
+                for field in ('orders', 'cancels'):
+                    limit = limits.get(f'daily_{field}')
+                    if limit and self.counts[(key, field)] >= limit:
+                        return True
+        return False
+
+    def usage(self) -> pd.DataFrame:
+        """当日各合约与交易所的报单、撤单、被限速次数与累计等待秒数"""
+        with self._cond:
+            keys = sorted({key for key, _ in self.counts})
+            rows = [{'trading_day': str(self.day), 'key': key,
+                     **{f: self.counts[(key, f)] for f in self.COLUMNS[2:]}} for key in keys]
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    def _load(self, day) -> Counter:
+        counts = Counter()
+        if self.counter_file and os.path.exists(self.counter_file):
+            df = pd.read_csv(self.counter_file, dtype={'trading_day': str})
+            for _, row in df[df['trading_day'] == str(day)].iterrows():
+                for field in self.COLUMNS[2:]:
+                    counts[(row['key'], field)] = row[field]
+        return counts
+
+    def save(self, path=None):
+        """当日计数写入 csv，同一交易日的行被覆盖"""
+        path = path or self.counter_file
+        if not path or self.day is None:
+            return
+        usage = self.usage()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            old = pd.read_csv(path, dtype={'trading_day': str})
+            usage = pd.concat([old[old['trading_day'] != str(self.day)], usage], ignore_index=True)
+        usage.to_csv(path, index=False, float_format='%.3f')
@@ -0,0 +1,63 @@
+import math
+import time
+
+
+class OrderSlicer:
+    """
+    大额调仓拆单：把一次三腿调仓按比例拆成若干子单组，每组三腿都成交后再发下一组，
+    各腿始终保持配平，腿间敞口不超过一组子单
+    - mode = 'twap'：每腿每组不超过 child_volume 手，组间间隔 interval 秒
+    - mode = 'depth'：每腿每组不超过一档挂单量的 participation 倍（且不超过 child_volume）
+    拆分数不超过 max_slices，也不超过手数最少的腿的手数，保证每组三腿都有成交
+    """
+
+    def __init__(self, strategy, enabled=False, mode='twap', child_volume=None, interval=1.0,
+                 participation=0.5, max_slices=20):
+        if mode not in ('twap', 'depth'):
+            raise ValueError(f"未知的拆单模式: {mode}")
+        self.strategy = strategy
+        self.enabled = enabled
+        self.mode = mode
+        self.child_volume = child_volume or {'pr': 10, 'ta': 30, 'eg': 10}
+        self.interval = interval
+        self.participation = participation
+        self.max_slices = max_slices
+
+    def slice_count(self, orders) -> int:
+        """计算拆分组数"""
+        if not self.enabled or not orders:
+            return 1
+        n = 1
+        for sym, volume, direction in orders:
+            limit = self.child_volume.get(sym, volume)
+            if self.mode == 'depth':
+                quote = self.strategy.quotes[sym]
+                depth = quote.ask_volume1 if direction == 'BUY' else quote.bid_volume1
+                if depth == depth and depth > 0:
+                    limit = min(limit, max(int(depth * self.participation), 1))
+            n = max(n, math.ceil(volume / max(limit, 1)))
+        return max(min(n, self.max_slices, min(volume for _, volume, _ in orders)), 1)
+
+    def split(self, orders) -> list:
+        """按累计取整把每条腿拆成 n 份，返回子单组列表"""
+        n = self.slice_count(orders)
+        if n == 1:
+            return [list(orders)]
+        slices = []
+        for k in range(n):
+            child = []
+            for sym, volume, direction in orders:
+                vol = round(volume * (k + 1) / n) - round(volume * k / n)
+                if vol > 0:
+                    child.append((sym, vol, direction))
+            slices.append(child)
+        return slices
+
+    def wait(self):
+        """组间等待 interval 秒，期间继续接收行情"""
+        if not self.interval:
+            return
+        strategy = self.strategy
+        started = strategy._now()
+        while (strategy._now() - started).total_seconds() < self.interval:
+            strategy._wait_update(deadline=time.time() + self.interval)
@@ -0,0 +1,104 @@
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+class Portfolio:
+    """
+    跨策略组合层：汇总同一进程内所有策略的持仓，并在策略之间内部撮合反向调仓
+    - exposure() 按品种（pr / ta / eg）和合约汇总各策略的多空手数与净头寸
+    - internalize 为 True 时，共用同一合约的策略报单前先在内部撮合簿中与其他策略的反向调仓对冲，
+      对冲部分按中间价内部成交、不发往交易所；没有对手时挂单最多等待 window 秒
+    各策略运行在独立线程中，所有共享状态都在同一把锁内访问
+    """
+
+    def __init__(self, internalize=False, window=0.5, snapshot_interval=60.0):
+        self.internalize = internalize
+        self.window = window
+        self.snapshot_interval = snapshot_interval
+        self.strategies = []
+        self.internalized = Counter()  # 合约 -> 内部成交手数
+        self._cond = threading.Condition()
+        self._book = []  # 等待对手的调仓意向
+
+    def register(self, strategy):
+        with self._cond:
+            self.strategies.append(strategy)
+        strategy.portfolio = self
+
+    def shared(self, contract) -> bool:
+        """是否有多个策略交易同一合约"""
+        return sum(contract in s.symbols.values() for s in self.strategies) > 1
+
+    def position(self, contract) -> tuple:
+        """所有策略在该合约上的多空手数合计"""
+        long = short = 0
+        for strategy in self.strategies:
+            for sym, code in strategy.symbols.items():
+                if code == contract:
+                    long += strategy.position[sym]['long']
+                    short += strategy.position[sym]['short']
+        return long, short
+
+    def exposure(self) -> dict:
+        """
+        按品种与合约汇总持仓
+        返回 {'pr': {'long': .., 'short': .., 'net': ..}, ..., 'CZCE.TA509': {...}, ...}
+        """
+        result = {}
+        for strategy in list(self.strategies):
+            for sym, contract in strategy.symbols.items():
+                pos = strategy.position[sym]
+                for key in (sym, contract):
+                    item = result.setdefault(key, {'long': 0, 'short': 0, 'net': 0})
+                    item['long'] += pos['long']
+                    item['short'] += pos['short']
+                    item['net'] += pos['long'] - pos['short']
+        return result
+
+    def cross(self, strategy, contract, direction, volume, price):
+        """
+        与其他策略在同一合约上的反向调仓内部撮合，返回 (内部成交手数, 成交价)
+        先吃掉撮合簿中已有的反向意向，成交价取对手挂出时的价格；
+        没有对手时把本次意向挂入撮合簿，最多等待 window 秒，超时未成交部分由调用方发往交易所
+        """
+        if not self.internalize or volume <= 0 or not self.shared(contract):
+            return 0, None
+        with self._cond:
+            crossed = 0
+            value = 0.0
+            for intent in self._book:
+                if (intent['strategy'] is strategy or intent['contract'] != contract
+                        or intent['direction'] == direction or intent['left'] == 0):
+                    continue
+                qty = min(volume - crossed, intent['left'])
+                intent['left'] -= qty
+                crossed += qty
+                value += qty * intent['price']
+                if crossed == volume:
+                    break
+            if crossed:
+                self.internalized[contract] += crossed
+                self._cond.notify_all()
+                return crossed, value / crossed
+            if self.window <= 0:
+                return 0, None
+            intent = {'strategy': strategy, 'contract': contract, 'direction': direction,
+                      'left': volume, 'price': price}
+            self._book.append(intent)
+            self._cond.wait_for(lambda: intent['left'] == 0, timeout=self.window)
+            self._book.remove(intent)
+            filled = volume - intent['left']
+            return filled, (price if filled else None)
+
+    def save(self, path):
+        """把当前汇总持仓追加写入 csv"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write("timestamp,key,long,short,net,internalized\n")
+            for key, item in self.exposure().items():
+                f.write(f"{timestamp},{key},{item['long']},{item['short']},{item['net']},"
+                        f"{self.internalized.get(key, 0)}\n")
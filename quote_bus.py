@@ -0,0 +1,291 @@
+import math
+import mmap
+import os
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(ROOT, "logs", "quote_bus.mmap")
+MAGIC = b'QBUS'
+VERSION = 1
+BUSY = np.iinfo(np.uint64).max  # 写入中的记录序号
+
+# 行情字段与合约静态信息（写在合约表中），均按浮点存储，INT_FIELDS 读出时转回整数
+FIELDS = ('last_price', 'bid_price1', 'ask_price1', 'bid_volume1', 'ask_volume1', 'open',
+          'upper_limit', 'lower_limit', 'open_interest', 'volume')
+STATIC_FIELDS = ('volume_multiple', 'price_tick', 'expire_rest_days')
+INT_FIELDS = frozenset(('bid_volume1', 'ask_volume1', 'open_interest', 'volume', 'volume_multiple',
+                        'expire_rest_days'))
+
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('capacity', '<u8'), ('count', '<u4'),
+                   ('pad', '<u4'), ('head', '<u8')])
+CONTRACT = np.dtype([('code', 'S32')] + [(f, '<f8') for f in STATIC_FIELDS])
+RECORD = np.dtype([('seq', '<u8'), ('datetime', 'S26'), ('contract', '<u2')] + [(f, '<f8') for f in FIELDS])
+
+
+def bus_path(path=None) -> str:
+    """总线文件路径，相对路径相对于项目目录"""
+    return os.path.join(ROOT, path) if path else DEFAULT_PATH
+
+
+def _layout(count, capacity):
+    """文件布局：头部 | 合约表 | 每个合约的最新快照 | 环形缓冲区，返回各段偏移与文件大小"""
+    contracts = HEADER.itemsize
+    latest = contracts + count * CONTRACT.itemsize
+    ring = latest + count * RECORD.itemsize
+    return contracts, latest, ring, ring + capacity * RECORD.itemsize
+
+
+class _QuoteBusFile:
+    """共享内存文件的 numpy 视图，读写两端共用"""
+
+    def __init__(self, path, mode):
+        self.path = path
+        self._file = open(path, mode)
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_WRITE if '+' in mode else mmap.ACCESS_READ)
+        self.header = np.ndarray(1, HEADER, buffer=self._mmap)
+        if self.header['magic'][0] != MAGIC or self.header['version'][0] != VERSION:
+            raise ValueError(f"{path} 不是有效的行情总线文件")
+        self.capacity = int(self.header['capacity'][0])
+        count = int(self.header['count'][0])
+        contracts, latest, ring, _ = _layout(count, self.capacity)
+        self.contracts = np.ndarray(count, CONTRACT, buffer=self._mmap, offset=contracts)
+        self.snapshots = np.ndarray(count, RECORD, buffer=self._mmap, offset=latest)
+        self.ring = np.ndarray(self.capacity, RECORD, buffer=self._mmap, offset=ring)
+        self.codes = [c.decode() for c in self.contracts['code']]
+        self.index = {code: i for i, code in enumerate(self.codes)}
+
+    def replaced(self) -> bool:
+        """网关重启后文件被替换，已打开的映射不会再有新行情"""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    @property
+    def head(self) -> int:
+        """最近一次写入的序号，0 表示尚无行情"""
+        return int(self.header['head'][0])
+
+    def close(self):
+        # 先释放 numpy 视图，否则 mmap 无法关闭
+        self.header = self.contracts = self.snapshots = self.ring = None
+        self._mmap.close()
+        self._file.close()
+
+
+class QuoteBusWriter(_QuoteBusFile):
+    """
+    行情总线写入端，由唯一的行情网关进程持有
+    每次 publish 先把记录序号置为 BUSY、写完字段后再写入新序号（seqlock），
+    同时更新该合约的最新快照和环形缓冲区，最后推进头部序号
+    """
+
+    def __init__(self, path=None, contracts=(), capacity=65536):
+        path = bus_path(path)
+        contracts = list(dict.fromkeys(contracts))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = _layout(len(contracts), capacity)[3]
+        # 写到临时文件再替换：直接截断正在被读取端映射的旧文件会使读取端进程收到 SIGBUS
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.truncate(size)
+            header = np.zeros(1, HEADER)
+            header[0] = (MAGIC, VERSION, capacity, len(contracts), 0, 0)
+            f.write(header.tobytes())
+            table = np.zeros(len(contracts), CONTRACT)
+            table['code'] = [c.encode() for c in contracts]
+            for field in STATIC_FIELDS:
+                table[field] = math.nan
+            f.write(table.tobytes())
+        os.replace(tmp, path)
+        super().__init__(path, 'r+b')
+
+    def publish(self, contract, quote):
+        """写入一个合约的最新行情，返回序号"""
+        i = self.index[contract]
+        seq = self.head + 1
+        values = (BUSY, quote.datetime.encode(), i, *(getattr(quote, f) for f in FIELDS))
+        for table, slot in ((self.snapshots, i), (self.ring, seq % self.capacity)):
+            table[slot] = values
+            table['seq'][slot] = seq
+        self.contracts[i] = (self.contracts['code'][i], *(getattr(quote, f) for f in STATIC_FIELDS))
+        self.header['head'] = seq
+        return seq
+
+
+class BusQuote:
+    """从行情总线读出的合约行情，属性名与 tqsdk Quote 一致，可直接交给策略、风控与监控使用"""
+
+    def __init__(self, instrument_id):
+        self.instrument_id = instrument_id
+        self.seq = 0
+        self.datetime = ''
+        for field in FIELDS + STATIC_FIELDS:
+            setattr(self, field, math.nan)
+
+    def _update(self, record, static):
+        self.seq = int(record['seq'])
+        self.datetime = record['datetime'].decode()
+        for source, fields in ((record, FIELDS), (static, STATIC_FIELDS)):
+            for field in fields:
+                value = float(source[field])
+                setattr(self, field, int(value) if field in INT_FIELDS and value == value else value)
+
+
+class QuoteBusReader(_QuoteBusFile):
+    """
+    行情总线读取端：策略、监控界面与分析脚本各自打开同一个文件，直接读取共享内存，不再各自订阅行情
+    - get_quote / refresh：按合约最新快照更新 BusQuote，同一次 refresh 内各腿取自同一时刻
+    - poll：按序号读出上次以来环形缓冲区中的全部记录，读取过慢被覆盖的记录计入 overruns
+    """
+
+    def __init__(self, path=None):
+        super().__init__(bus_path(path), 'rb')
+        self.quotes = {}
+        self.read_seq = self.head
+        self.overruns = 0
+
+    def reopen(self):
+        """重新映射被网关替换的文件，已有的 BusQuote 保持不变并在下次 refresh 时更新"""
+        quotes, path = self.quotes, self.path
+        self.close()
+        self.__init__(path)
+        self.quotes = quotes
+        for quote in quotes.values():
+            quote.seq = 0
+
+    def latest(self, contract):
+        """合约最新快照的一致副本，尚无行情时返回 None"""
+        i = self.index[contract]
+        seqs = self.snapshots['seq']
+        while True:
+            seq = seqs[i]
+            if seq == 0:
+                return None
+            record = self.snapshots[i].copy()
+            if seq != BUSY and record['seq'] == seq and seqs[i] == seq:
+                return record
+
+    def get_quote(self, contract) -> BusQuote:
+        quote = self.quotes.get(contract)
+        if quote is None:
+            quote = self.quotes[contract] = BusQuote(contract)
+            self.refresh([quote])
+        return quote
+
+    def refresh(self, quotes=None) -> list:
+        """把有新行情的 BusQuote 更新到最新快照，返回发生变化的行情"""
+        changed = []
+        seqs = self.snapshots['seq']
+        for quote in (self.quotes.values() if quotes is None else quotes):
+            i = self.index[quote.instrument_id]
+            if seqs[i] == quote.seq:
+                continue
+            record = self.latest(quote.instrument_id)
+            if record is not None and record['seq'] != quote.seq:
+                quote._update(record, self.contracts[i])
+                changed.append(quote)
+        return changed
+
+    def poll(self) -> np.ndarray:
+        """读取上次 poll 以来写入环形缓冲区的记录（按序号递增）"""
+        head = self.head
+        if head <= self.read_seq:
+            return self.ring[:0].copy()
+        start = max(self.read_seq + 1, head - self.capacity + 1)
+        self.overruns += start - self.read_seq - 1
+        seqs = np.arange(start, head + 1, dtype=np.uint64)
+        records = self.ring[seqs % self.capacity]
+        self.read_seq = head
+        # 复制期间又被写入端覆盖的记录序号不再匹配，丢弃
+        valid = records['seq'] == seqs
+        self.overruns += int((~valid).sum())
+        return records[valid]
+
+
+class BusApi:
+    """
+    策略使用的行情总线适配器：行情取自总线，委托、持仓、账户等仍由内部的 TqApi 处理
+    wait_update 交替等待 TqApi 的交易推送（最长 poll_interval 秒）与总线上的新行情，
+    任一有更新即返回；is_changing 对总线行情按本次 wait_update 是否更新判断；
+    超过 1 秒没有新行情时检查网关是否重启替换了总线文件，是则重新映射
+    """
+
+    def __init__(self, api, reader, poll_interval=0.002):
+        self.api = api
+        self.reader = reader
+        self.poll_interval = poll_interval
+        self._changing = set()
+        self._last_bus_update = time.time()
+
+    def get_quote(self, contract):
+        if contract in self.reader.index:
+            return self.reader.get_quote(contract)
+        return self.api.get_quote(contract)
+
+    def wait_update(self, deadline=None):
+        while True:
+            timeout = time.time() + self.poll_interval
+            updated = self.api.wait_update(deadline=timeout if deadline is None else min(deadline, timeout))
+            self._changing = {id(q) for q in self.reader.refresh()}
+            now = time.time()
+            if self._changing:
+                self._last_bus_update = now
+            elif now - self._last_bus_update > 1.0 and self.reader.replaced():
+                self.reader.reopen()
+                self._last_bus_update = now
+            if updated or self._changing:
+                return True
+            if deadline is not None and now >= deadline:
+                return False
+
+    def is_changing(self, obj, key=None):
+        if isinstance(obj, BusQuote):
+            return id(obj) in self._changing
+        return self.api.is_changing(obj, key)
+
+    def close(self):
+        self.reader.close()
+        self.api.close()
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+
+def run_gateway(config_path, path=None, capacity=None):
+    """行情网关：订阅配置中全部策略的合约，把每次变化的盘口写入行情总线"""
+    from tqsdk import TqApi
+    from strategy_runner import create_auth_and_account, load_config, resolve_strategies
+
+    config = load_config(config_path)
+    bus_cfg = config.get('quote_bus', {})
+    contracts = sorted({c for s in resolve_strategies(config) for c in s['symbols'].values()})
+    auth, _ = create_auth_and_account(config)
+    api = TqApi(auth=auth)
+    writer = QuoteBusWriter(path or bus_cfg.get('path'), contracts,
+                            capacity or bus_cfg.get('capacity', 65536))
+    quotes = {c: api.get_quote(c) for c in contracts}
+    print(f"行情网关启动，{len(contracts)} 个合约写入 {writer.path}")
+    try:
+        while True:
+            api.wait_update()
+            for contract, quote in quotes.items():
+                if api.is_changing(quote):
+                    writer.publish(contract, quote)
+    finally:
+        writer.close()
+        api.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="启动行情网关，把策略合约的盘口写入共享内存行情总线")
+    parser.add_argument("config", nargs="?", default=os.path.join(ROOT, "strategies.toml"))
+    parser.add_argument("--path", help="总线文件路径，默认取配置 [quote_bus] path")
+    parser.add_argument("--capacity", type=int, help="环形缓冲区记录数")
+    args = parser.parse_args()
+    run_gateway(args.config, args.path, args.capacity)
@@ -0,0 +1,100 @@
+import math
+from collections import Counter
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# 行情时间（quote.datetime）是不带时区的交易所时间
+EXCHANGE_TZ = ZoneInfo('Asia/Shanghai')
+
+
+class QuoteGuard:
+    """
+    加工费计算前的行情校验
+    - 任一腿买一/卖一为 NaN 或非正数（开盘前、盘口清空）时拒绝
+    - 任一腿买一高于卖一（交叉盘口）时拒绝
+    - 各腿行情时间相差超过 max_lag 秒（某条腿滞后）时拒绝
+    - 最新一条腿的行情时间早于当前时间 max_age 秒（整个盘口停止更新）时拒绝
+    - 层数变化需连续 confirm_ticks 次有行情更新的计算都落在同一目标层才放行，过滤单笔跳价；
+      只有委托、账户变化的 wait_update 不计入
+    """
+
+    def __init__(self, max_lag=3.0, confirm_ticks=2, enabled=True, max_age=30.0):
+        self.max_lag = max_lag
+        self.max_age = max_age
+        self.confirm_ticks = max(int(confirm_ticks), 1)
+        self.enabled = enabled
+        self.rejects = Counter()  # 按原因统计被拒绝的次数
+        self._last_str = {}
+        self._last_ts = {}
+        self._pending = {}  # 方向 -> [候选层, 连续次数]
+        self._updated = True  # 最近一次 check 时是否有腿的行情更新
+
+    def _leg_time(self, sym, quote):
+        """解析行情时间，只有时间字符串变化时才重新解析"""
+        s = quote.datetime
+        if s != self._last_str.get(sym):
+            self._last_str[sym] = s
+            self._updated = True
+            try:
+                self._last_ts[sym] = (datetime.fromisoformat(s).replace(tzinfo=EXCHANGE_TZ).timestamp()
+                                      if s else math.nan)
+            except ValueError:
+                self._last_ts[sym] = math.nan
+        return self._last_ts[sym]
+
+    def check(self, quotes: dict, now=None):
+        """
+        校验三腿盘口，通过返回 None，否则返回拒绝原因
+        now 为当前时间，缺省时不检查行情时效；不带时区时按交易所时间（回测的回放时间）处理
+        """
+        if not self.enabled:
+            self._updated = True
+            return None
+        self._updated = False
+        newest = -math.inf
+        oldest = math.inf
+        for sym, quote in quotes.items():
+            bid, ask = quote.bid_price1, quote.ask_price1
+            # NaN 与任何数比较均为 False，not (x > 0) 同时覆盖 NaN 和非正数
+            if not (bid > 0 and ask > 0):
+                return self._reject(f"{sym}盘口无效")
+            if bid > ask:
+                return self._reject(f"{sym}盘口交叉")
+            ts = self._leg_time(sym, quote)
+            if ts != ts:
+                return self._reject(f"{sym}行情时间无效")
+            newest = max(newest, ts)
+            oldest = min(oldest, ts)
+        if self.max_lag is not None and newest - oldest > self.max_lag:
+            return self._reject("行情滞后")
+        if self.max_age is not None and now is not None:
+            if now.tzinfo is None:
+                now = now.replace(tzinfo=EXCHANGE_TZ)
+            if now.timestamp() - newest > self.max_age:
+                return self._reject("行情过期")
+        return None
+
+    def _reject(self, reason):
+        self.rejects[reason] += 1
+        # 行情异常期间的候选层作废，恢复后重新确认
+        self._pending.clear()
+        return reason
+
+    def confirm(self, direction: str, layer) -> bool:
+        """
+        记录本次计算的候选层，连续 confirm_ticks 次相同时返回 True
+        layer 为 None 表示本次没有换层候选，清空该方向的计数
+        """
+        if layer is None:
+            self._pending.pop(direction, None)
+            return False
+        pending = self._pending.get(direction)
+        if pending is None or pending[0] != layer:
+            pending = self._pending[direction] = [layer, 0]
+        elif not self._updated:
+            return False
+        pending[1] += 1
+        if pending[1] >= self.confirm_ticks:
+            del self._pending[direction]
+            return True
+        return False
@@ -0,0 +1,89 @@
+import os
+
+
+class PositionReconciler:
+    """
+    内部持仓与柜台持仓对账
+    - 每次 wait_update 后比较 strategy.position 与 api.get_position 的多空手数
+    - 出现偏差时记录开始时间，偏差在 grace 秒内自行消失（成交回报与持仓推送先后到达）不做处理
+    - 超过 grace 秒仍未消失时，auto_correct 为 True 则以柜台持仓为准修正内部持仓
+    - 每段偏差结束（消失或被修正）时把持续时长写入日志目录下的 drift.csv
+    柜台持仓是账户级的：多个策略在同一 Portfolio 中共用合约时改为比较所有策略合计的净持仓，
+    此时偏差无法归属到单个策略，只记录不修正
+    """
+
+    COLUMNS = ['symbol', 'contract', 'start', 'end', 'duration', 'internal_long', 'internal_short',
+               'broker_long', 'broker_short', 'action']
+
+    def __init__(self, strategy, enabled=True, auto_correct=True, grace=2.0):
+        self.strategy = strategy
+        self.enabled = enabled
+        self.auto_correct = auto_correct
+        self.grace = grace
+        self.positions = {
+            sym: strategy.api.get_position(contract)
+            for sym, contract in strategy.symbols.items()
+        }
+        self.drifts = {}  # sym -> 未结束的偏差
+        self.history = []  # 已结束的偏差记录
+
+    def check(self) -> bool:
+        """对账一次，发生自动修正时返回 True，调用方需重新保存持仓"""
+        if not self.enabled:
+            return False
+        now = self.strategy._now()
+        corrected = False
+        portfolio = self.strategy.portfolio
+        for sym, broker_position in self.positions.items():
+            internal = self.strategy.position[sym]
+            contract = self.strategy.symbols[sym]
+            shared = portfolio is not None and portfolio.shared(contract)
+            if shared:
+                # 内部成交会让各策略的多空与柜台锁仓不一致，只比较净持仓
+                long, short = portfolio.position(contract)
+                net, broker_net = long - short, broker_position.pos_long - broker_position.pos_short
+                mine = (max(net, 0), max(-net, 0))
+                broker = (max(broker_net, 0), max(-broker_net, 0))
+            else:
+                mine = (internal['long'], internal['short'])
+                broker = (broker_position.pos_long, broker_position.pos_short)
+            drift = self.drifts.get(sym)
+            if mine == broker:
+                if drift is not None:
+                    self._close(sym, now, 'resolved')
+                continue
+            if drift is None:
+                drift = self.drifts[sym] = {'start': now}
+                self.strategy._log(f"{sym}持仓偏差：内部 多{mine[0]} 空{mine[1]}，柜台 多{broker[0]} 空{broker[1]}")
+            drift.update(internal=mine, broker=broker)
+            if self.auto_correct and not shared and (now - drift['start']).total_seconds() >= self.grace:
+                internal['long'], internal['short'] = broker
+                self._close(sym, now, 'corrected')
+                self.strategy._log(f"{sym}持仓偏差超过 {self.grace} 秒，已按柜台持仓修正为 多{broker[0]} 空{broker[1]}")
+                corrected = True
+        return corrected
+
+    def _close(self, sym, now, action):
+        drift = self.drifts.pop(sym)
+        record = {
+            'symbol': sym,
+            'contract': self.strategy.symbols[sym],
+            'start': drift['start'].strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'end': now.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'duration': round((now - drift['start']).total_seconds(), 6),
+            'internal_long': drift['internal'][0],
+            'internal_short': drift['internal'][1],
+            'broker_long': drift['broker'][0],
+            'broker_short': drift['broker'][1],
+            'action': action,
+        }
+        self.history.append(record)
+        self._save(record)
+
+    def _save(self, record):
+        path = os.path.join(self.strategy.log_path, "drift.csv")
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(self.COLUMNS) + "\n")
+            f.write(",".join(str(record[k]) for k in self.COLUMNS) + "\n")
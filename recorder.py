@@ -0,0 +1,188 @@
+import json
+import math
+import os
+from operator import attrgetter
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b'TICKREC1'
+HEADER_SIZE = 512  # 文件头：MAGIC + JSON 描述的记录格式，补齐到固定长度，记录区可直接 np.memmap
+NO_LAYER = -32768  # 未触发网格
+_BOOK = attrgetter('bid_price1', 'ask_price1', 'bid_volume1', 'ask_volume1')
+
+
+def record_dtype(keys) -> np.dtype:
+    """
+    一条记录：策略时间、各腿一档盘口（列名与回测行情一致，可直接回放）、
+    买入 / 卖出加工费、两方向所在网格层、本次计算前后的持仓层
+    """
+    fields = [('datetime', '<M8[us]')]
+    for key in keys:
+        fields += [(f'{key}_bid', '<f8'), (f'{key}_ask', '<f8'),
+                   (f'{key}_bid_volume', '<f8'), (f'{key}_ask_volume', '<f8')]
+    fields += [('fee_buy', '<f8'), ('fee_sell', '<f8'), ('grid_buy', '<i2'), ('grid_sell', '<i2'),
+               ('layer_before', '<i2'), ('layer', '<i2')]
+    return np.dtype(fields)
+
+
+class TickRecorder:
+    """
+    一档盘口与网格决策记录器
+    - capture() 在每次 wait_update 后调用：三条腿都没有行情变化时不记录，否则保存当时的盘口与持仓层
+    - record() 在本次计算结束后调用，补上买卖两方向加工费与网格层，放入队列后立即返回
+    - tick() 在下单等待成交、拆单间隔期间的 wait_update 后调用，只记录盘口，保证回放时行情完整；
+      不影响主循环 capture() 的快照，这些行暂存到主循环的记录之后写出，保持时间顺序
+    - 后台线程每 flush_interval 秒把队列中的记录批量追加到 ticks/<交易日>_ticks.bin
+    文件为固定长度二进制记录，可用 load_ticks 读取，或直接作为 backtest.py 的行情输入复盘
+    """
+
+    def __init__(self, strategy, enabled=False, flush_interval=1.0):
+        self.strategy = strategy
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.keys = list(strategy.spread.keys)
+        self.dtype = record_dtype(self.keys)
+        self._body = np.dtype([(name, self.dtype[name]) for name in self.dtype.names[1:]])
+        self.directory = os.path.join(strategy.log_path, "ticks")
+        self.records = 0
+        self._quotes = [strategy.quotes[key] for key in self.keys]
+        self._snapshot = None
+        self._deferred = []  # 主循环快照尚未记录期间 tick() 产生的记录
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._stop = threading.Event()
+        if enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._writer, name=f"{strategy.name}-recorder", daemon=True)
+            self._thread.start()
+
+    def capture(self):
+        if not self.enabled:
+            return
+        # 上一轮没有调用 record 的快照只记录盘口
+        self.record()
+        self._snapshot = self._take(force=True)
+
+    def _take(self, force=False):
+        """
+        盘口快照 (时间, 各腿盘口, 当前层, 行情是否变化)；三条腿都没有行情变化时返回 None，
+        force 时仍返回快照，由 record 决定是否写出（行情未变但本次换层的决策行需要保留）
+        """
+        strategy = self.strategy
+        is_changing = strategy.api.is_changing
+        changed = any(is_changing(q) for q in self._quotes)
+        if not (changed or force):
+            return None
+        # 热路径只取出盘口元组，展开与类型转换留给写线程
+        return strategy._now(), tuple(map(_BOOK, self._quotes)), strategy.layer, changed
+
+    def tick(self):
+        """下单等待期间的行情变化：只记录盘口，加工费与网格层留空"""
+        if not self.enabled:
+            return
+        snapshot = self._take()
+        if snapshot is None:
+            return
+        item = self._item(snapshot)
+        if self._snapshot is None:
+            self._queue.put(item)
+        else:
+            self._deferred.append(item)
+
+    def record(self, fee_buy=math.nan, fee_sell=math.nan, grid_buy=None, grid_sell=None):
+        if self._snapshot is None:
+            return
+        # 只有账户、委托变化且没有换层的更新不记录，避免重复的盘口行
+        if self._snapshot[3] or self._snapshot[2] != self.strategy.layer:
+            self._queue.put(self._item(self._snapshot, fee_buy, fee_sell, grid_buy, grid_sell))
+        self._snapshot = None
+        for item in self._deferred:
+            self._queue.put(item)
+        self._deferred.clear()
+
+    def _item(self, snapshot, fee_buy=math.nan, fee_sell=math.nan, grid_buy=None, grid_sell=None):
+        now, legs, layer_before, _ = snapshot
+        return (now, legs, fee_buy, fee_sell,
+                grid_buy['layer'] if grid_buy else NO_LAYER,
+                grid_sell['layer'] if grid_sell else NO_LAYER,
+                layer_before, self.strategy.layer)
+
+    def close(self):
+        """写完队列中剩余的记录后停止后台线程"""
+        self.record()
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _writer(self):
+        # 定时整批取出而不是阻塞在 get 上：否则每条记录入队都会唤醒写线程，逐条写文件并争抢 GIL
+        stopping = False
+        while not stopping:
+            stopping = self._stop.wait(self.flush_interval)
+            batch = []
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        # 时间列整列转换，逐条 strftime 或逐条转 datetime64 比其余字段加起来还慢
+        times = pd.Series(pd.DatetimeIndex([item[0] for item in batch]))
+        body = np.array([(*(v for book in legs for v in book), *rest) for _, legs, *rest in batch],
+                        dtype=self._body)
+        rows = np.empty(len(batch), self.dtype)
+        rows['datetime'] = times.to_numpy(dtype='M8[us]')
+        for name in self._body.names:
+            rows[name] = body[name]
+        calendar = self.strategy.calendar
+        days = calendar.trading_days_of(times) if calendar else times.dt.date
+        days = days.map(lambda d: d.strftime("%y%m%d")).to_numpy()
+        for day in dict.fromkeys(days):
+            chunk = rows[days == day]
+            path = os.path.join(self.directory, f"{day}_ticks.bin")
+            with open(path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(_header(self.dtype))
+                f.write(chunk.tobytes())
+            self.records += len(chunk)
+
+
+def _header(dtype) -> bytes:
+    descr = json.dumps(np.lib.format.dtype_to_descr(dtype)).encode()
+    if len(MAGIC) + len(descr) > HEADER_SIZE:
+        raise ValueError("记录格式描述过长")
+    return (MAGIC + descr).ljust(HEADER_SIZE, b' ')
+
+
+def read_ticks(path) -> np.memmap:
+    """以只读内存映射打开一个记录文件"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"{path} 不是盘口记录文件")
+    descr = json.loads(header[len(MAGIC):].decode())
+    dtype = np.lib.format.descr_to_dtype([tuple(d) for d in descr])
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE)
+
+
+def load_ticks(path) -> pd.DataFrame:
+    """读取记录文件或目录下全部 *_ticks.bin，返回 DataFrame（未触发网格的层为 NaN）"""
+    path = Path(path)
+    files = sorted(path.glob("*_ticks.bin")) if path.is_dir() else [path]
+    frames = [pd.DataFrame(read_ticks(f)) for f in files]
+    if not frames:
+        return pd.DataFrame(columns=list(record_dtype([]).names))
+    df = pd.concat(frames, ignore_index=True)
+    for col in ('grid_buy', 'grid_sell'):
+        df[col] = df[col].where(df[col] != NO_LAYER)
+    return df
@@ -0,0 +1,235 @@
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+UNWOUND = 2  # 已回撤的交易组：merge_trade 只合并 flag 为 1 的成交，不再报无效交易组
+
+
+class TradeRecovery:
+    """
+    启动时恢复腿数不完整的交易组（进程在两腿之间退出）
+    - 扫描最近 lookback 个交易文件中未合并（flag 为 1）的成交，找出 merge_trade 无法合并的 trade_id：
+      缺少价差腿，或各腿开平不一致（合法的交易组每腿一条共 3 条，或每腿平仓、开仓各一条共 6 条），
+      如进程在某条腿平仓之后、开仓之前退出
+    - 以柜台持仓为准修正内部持仓（柜台持仓是实际成交，日志可能少记一条正在成交的腿），
+      按各腿净持仓换算成持仓单位数，各腿单位数一致时无需处理
+    - mode 为 complete 时补齐缺失的腿：目标单位数取交易组内已成交腿，补单沿用原 trade_id 并写入原交易文件，
+      之后 merge_trade 可按三腿一组正常合并（补单的腿与已成交的腿开平方式不同时按已成交的腿改写，见 _conform）；
+      mode 为 unwind 时回撤已成交的腿：目标单位数与层数恢复为交易组之前的持仓记录，
+      原交易组与回撤成交标记 flag 为 2，不计入利润
+    - 与其他策略共用合约（Portfolio）时柜台持仓无法归属到单个策略，沿用内部持仓
+    每次恢复写入日志目录下的 recovery.csv
+    """
+
+    COLUMNS = ['timestamp', 'trade_id', 'mode', 'missing', 'orders', 'elapsed']
+
+    def __init__(self, strategy, enabled=True, mode='complete', lookback=2, timeout=30.0):
+        if mode not in ('complete', 'unwind'):
+            raise ValueError(f"未知的恢复方式: {mode}")
+        self.strategy = strategy
+        self.enabled = enabled
+        self.mode = mode
+        self.lookback = lookback
+        self.timeout = timeout
+        self.history = []
+
+    def scan(self) -> list:
+        """
+        未完成的交易组 [{'trade_id', 'file', 'rows', 'legs', 'done', 'fee', 'start'}, ...]，按时间先后排列
+        legs 为有成交记录的腿，done 为开平完整的腿：以记录条数最多的腿的开平方式为准，
+        只有平仓、缺少开仓的腿（平仓后进程退出）不计入 done
+        """
+        strategy = self.strategy
+        keys = list(strategy.spread.keys)
+        contracts = {contract.split('.')[-1]: sym for sym, contract in strategy.symbols.items()}
+        files = sorted(Path(strategy.log_path).glob("*_trade.csv"))[-self.lookback:]
+        groups = []
+        for trade_file in files:
+            df = pd.read_csv(trade_file, dtype={'trade_id': str})
+            pending = df[df['flag'] == 1]
+            for trade_id, group in pending.groupby('trade_id', sort=False):
+                offsets = group.groupby(group['contract'].map(contracts))['offset'].agg(sorted).to_dict()
+                patterns = {tuple(offsets[sym]) for sym in keys if sym in offsets}
+                if len(offsets) == len(keys) and len(patterns) == 1 and \
+                        patterns.pop() in (('CLOSE',), ('OPEN',), ('CLOSE', 'OPEN')):
+                    continue
+                reference = max((offsets[sym] for sym in keys if sym in offsets), key=len)
+                done = [sym for sym in keys if offsets.get(sym) == reference]
+                groups.append({'trade_id': trade_id, 'file': str(trade_file), 'rows': group.index,
+                               'legs': set(offsets), 'done': done, 'fee': float(group['fee'].iloc[0]),
+                               'start': group['timestamp'].min()})
+        return sorted(groups, key=lambda g: g['start'])
+
+    def units(self) -> dict:
+        """各腿净持仓换算的持仓单位数（与网格 up / down 同口径，min_unit 已带方向）"""
+        legs = self.strategy.legs
+        return {sym: (pos.long - pos.short) / unit for sym, unit, pos in zip(legs.keys, legs.units, legs.positions)}
+
+    def _sync_broker(self):
+        strategy = self.strategy
+        portfolio = strategy.portfolio
+        for sym, broker in strategy.reconciler.positions.items():
+            if portfolio is not None and portfolio.shared(strategy.symbols[sym]):
+                continue
+            internal = strategy.position[sym]
+            if (internal.long, internal.short) != (broker.pos_long, broker.pos_short):
+                strategy._log(f"{sym}启动时持仓与柜台不一致：内部 多{internal.long} 空{internal.short}，"
+                              f"柜台 多{broker.pos_long} 空{broker.pos_short}，按柜台持仓恢复")
+                internal.long, internal.short = broker.pos_long, broker.pos_short
+
+    def _orders(self, target) -> list:
+        strategy = self.strategy
+        orders = []
+        for sym, unit, pos in zip(strategy.legs.keys, strategy.legs.units, strategy.legs.positions):
+            delta = round(target * unit - (pos.long - pos.short))
+            if delta:
+                orders.append((sym, abs(delta), 'BUY' if delta > 0 else 'SELL'))
+        return orders
+
+    def _wait_quotes(self) -> bool:
+        """等待各腿行情到齐，超过 timeout 秒返回 False"""
+        strategy = self.strategy
+        deadline = time.time() + self.timeout
+        while any(q.bid_price1 != q.bid_price1 or q.ask_price1 != q.ask_price1 for q in strategy.legs.quotes):
+            if time.time() >= deadline:
+                return False
+            strategy._wait_update(deadline=deadline)
+        return True
+
+    async def recover(self) -> int:
+        """启动时调用，返回恢复的交易组数"""
+        if not self.enabled:
+            return 0
+        strategy = self.strategy
+        groups = self.scan()
+        if not groups:
+            return 0
+        self._sync_broker()
+        recovered = 0
+        for group in groups:
+            units = self.units()
+            missing = [sym for sym in strategy.spread.keys if sym not in group['done']]
+            strategy._log(f"交易组 {group['trade_id']} 不完整：{'/'.join(missing)} 缺少成交或开平不完整，"
+                          f"各腿持仓单位 { {sym: round(float(u), 3) for sym, u in units.items()} }")
+            if len(set(units.values())) == 1:
+                strategy._log("各腿持仓已平衡，无需补单，按开平完整的腿改写交易组")
+                self._conform(group)
+                continue
+            # 开平完整的腿均已全部成交；其余的腿可能部分成交，不能用来推断交易组之前的持仓
+            done = group['done'][0]
+            if self.mode == 'complete':
+                target = units[done]
+            else:
+                previous = self._previous(group['start'])
+                target = (previous[f'{done}_long'] - previous[f'{done}_short']) / strategy.min_unit[done]
+            orders = self._orders(target)
+            if not self._wait_quotes():
+                strategy._log(f"{self.timeout} 秒内行情未到齐，放弃恢复交易组 {group['trade_id']}")
+                break
+            await self._execute(group, orders, missing)
+            recovered += 1
+        return recovered
+
+    async def _execute(self, group, orders, missing):
+        strategy = self.strategy
+        started = strategy._now()
+        trade_file = strategy.trade_file
+        if self.mode == 'complete':
+            # 补齐的腿与已成交的腿写入同一交易文件，merge_trade 按文件合并
+            trade_id = group['trade_id']
+            strategy.trade_file = group['file']
+        else:
+            trade_id = f"{group['trade_id']}-unwind-{uuid.uuid4().hex[:8]}"
+            strategy._set_layer(self._previous(group['start'])['layer'])
+        try:
+            # 刷新各腿对手价，成交记录的 quote 列取自其中
+            strategy._calculate_fee('BUY')
+            for sym, volume, direction in orders:
+                strategy._log(f"恢复交易组 {group['trade_id']}：{sym} {direction} {volume} 手")
+                await strategy.place_orders(sym, volume, direction, group['fee'], trade_id)
+        finally:
+            strategy.trade_file = trade_file
+        if self.mode == 'complete':
+            self._conform(group)
+        else:
+            self._mark_unwound(group, trade_id)
+        record = {
+            'timestamp': started.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'trade_id': group['trade_id'],
+            'mode': self.mode,
+            'missing': '/'.join(missing),
+            'orders': ' '.join(f"{sym}:{direction}:{volume}" for sym, volume, direction in orders),
+            'elapsed': (strategy._now() - started).total_seconds(),
+        }
+        self.history.append(record)
+        self._save(record)
+        strategy._log(f"交易组 {group['trade_id']} 已{'补齐' if self.mode == 'complete' else '回撤'}，"
+                      f"用时 {record['elapsed']:.3f}s")
+
+    def _previous(self, start) -> dict:
+        """交易组开始前最后一条持仓记录，没有记录时为空仓、第 0 层"""
+        df = pd.read_csv(self.strategy.position_file)
+        before = df[df['timestamp'] < start]
+        if before.empty:
+            return dict.fromkeys(df.columns, 0)
+        return before.iloc[-1].to_dict()
+
+    def _conform(self, group):
+        """
+        补齐后的交易组须为每腿一条（3 条）或每腿平仓、开仓各一条（6 条），merge_trade 才能合并
+        补单的腿按柜台持仓下单，可能拆成平仓 + 开仓而已成交的腿只有一种开平（或相反）：
+        该腿的全部成交（含补单前已记录的）合并后按开平完整腿的开平方式与手数比例重新拆分，
+        价格取成交均价，手续费按手数分摊；开平已经一致的腿不改写
+        """
+        strategy = self.strategy
+        contracts = {contract.split('.')[-1]: sym for sym, contract in strategy.symbols.items()}
+        df = pd.read_csv(group['file'], dtype={'trade_id': str})
+        rows = df[(df['trade_id'] == group['trade_id']) & (df['flag'] == 1)]
+        legs = rows['contract'].map(contracts)
+        done = legs.isin(group['done']).to_numpy()
+        # 以第一条已成交腿的开平方式为准：{开平: 手数}，平仓在前
+        reference = rows[done & (legs == legs[done].iloc[0])].groupby('offset', sort=True)['volume'].sum()
+        replaced, added = [], []
+        for sym in legs[~done].unique():
+            leg = rows[~done & (legs == sym)]
+            if sorted(leg['offset']) == list(reference.index):
+                continue
+            total = leg['volume'].sum()
+            volumes = (reference / reference.sum() * total).round().astype(int).astype(object)
+            volumes.iloc[-1] = total - volumes.iloc[:-1].sum()
+            if (volumes <= 0).any():
+                strategy._log(f"交易组 {group['trade_id']} 的 {sym} 成交 {total} 手无法按 {reference.to_dict()} 拆分，保留原记录")
+                continue
+            base = leg.iloc[-1].copy()
+            base['timestamp'] = leg['timestamp'].iloc[0]
+            base['price'] = (leg['price'] * leg['volume']).sum() / total
+            for offset, volume in volumes.items():
+                row = base.copy()
+                row['offset'] = offset
+                row['volume'] = volume
+                row['commission'] = leg['commission'].sum() * volume / total
+                added.append(row)
+            replaced.extend(leg.index)
+            strategy._log(f"交易组 {group['trade_id']} 的 {sym} 成交按 {volumes.to_dict()} 改写，与已成交的腿开平一致")
+        if replaced:
+            df = pd.concat([df.drop(index=replaced), pd.DataFrame(added)], ignore_index=True)
+            df.to_csv(group['file'], index=False)
+
+    def _mark_unwound(self, group, unwind_id):
+        strategy = self.strategy
+        for path, mask in ((group['file'], lambda df: df.index.isin(group['rows'])),
+                           (strategy.trade_file, lambda df: df['trade_id'] == unwind_id)):
+            df = pd.read_csv(path, dtype={'trade_id': str})
+            df.loc[mask(df), 'flag'] = UNWOUND
+            df.to_csv(path, index=False)
+
+    def _save(self, record):
+        path = os.path.join(self.strategy.log_path, "recovery.csv")
+        write_header = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if write_header:
+                f.write(",".join(self.COLUMNS) + "\n")
+            f.write(",".join(str(record[k]) for k in self.COLUMNS) + "\n")
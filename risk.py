@@ -0,0 +1,146 @@
+import math
+from collections import Counter
+
+# 触发后禁止开仓（仍允许减仓）与禁止一切交易的合约状态
+BLOCK_OPEN = 'open'
+BLOCK_ALL = 'all'
+
+
+def contract_alerts(quotes: dict, min_expire_days=40, limit_distance=0.01, min_open_interest=None) -> dict:
+    """
+    检查各腿合约状态，返回 {sym: [(级别, 描述), ...]}
+    - 剩余交割天数少于 min_expire_days：临近交割，禁止开仓
+    - 持仓量低于阈值：流动性不足，禁止开仓；阈值缺省为 min(10000 * pr乘数 / 本腿乘数, 10000)
+    - 最新价距涨跌停不足 limit_distance：禁止交易
+    """
+    pr_multiple = quotes['pr'].volume_multiple if 'pr' in quotes else None
+    alerts = {}
+    for sym, quote in quotes.items():
+        threshold = min_open_interest
+        if threshold is None and pr_multiple and quote.volume_multiple:
+            threshold = min(10000 * pr_multiple / quote.volume_multiple, 10000)
+        alerts[sym] = quote_alerts(sym, quote, min_expire_days, limit_distance, threshold)
+    return alerts
+
+
+def quote_alerts(sym, quote, min_expire_days=40, limit_distance=0.01, min_open_interest=None) -> list:
+    """单个合约的状态检查，字段为 NaN（行情未推送）时不触发"""
+    result = []
+    if quote.expire_rest_days < min_expire_days:
+        result.append((BLOCK_OPEN, f"{sym}临近交割"))
+    if min_open_interest is not None and quote.open_interest < min_open_interest:
+        result.append((BLOCK_OPEN, f"{sym}持仓量{quote.open_interest}过低"))
+    last = quote.last_price
+    if (last - quote.lower_limit) / quote.lower_limit < limit_distance:
+        result.append((BLOCK_ALL, f"{sym}接近跌停"))
+    if (quote.upper_limit - last) / quote.upper_limit < limit_distance:
+        result.append((BLOCK_ALL, f"{sym}接近涨停"))
+    return result
+
+
+class RiskEngine:
+    """
+    下单前风控：合约状态与账户资金在每次 wait_update 后按变化增量刷新并缓存，
+    下单时只读缓存，对三腿调仓整体放行、按单位缩量或拦截
+    - 任一腿临近涨跌停时拦截；临近交割、持仓量过低或报单次数达到当日预算（OrderScheduler）时只允许减仓
+    - max_position：各腿净持仓上限（手），超出时按网格单位缩量
+    - margin_rate：各腿保证金率，开仓所需保证金超过可用资金扣除 margin_buffer 比例后缩量
+    """
+
+    def __init__(self, strategy, enabled=True, min_expire_days=40, limit_distance=0.01,
+                 min_open_interest=None, max_position=None, margin_rate=0.12, margin_buffer=0.2):
+        self.strategy = strategy
+        self.enabled = enabled
+        self.min_expire_days = min_expire_days
+        self.limit_distance = limit_distance
+        self.max_position = dict(max_position or {})
+        self.margin_buffer = margin_buffer
+        syms = list(strategy.symbols)
+        if not isinstance(margin_rate, dict):
+            margin_rate = {sym: margin_rate for sym in syms}
+        self.margin_rate = margin_rate
+        self.vetoes = Counter()  # 按原因统计被拦截的次数
+        self.scaled = 0  # 被缩量的次数
+        self.last_reason = None
+        self._min_open_interest = {}
+        self._alerts = {sym: [] for sym in syms}
+        self._margin_per_lot = {sym: math.nan for sym in syms}
+        self._available = math.nan
+        if min_open_interest is not None:
+            self._min_open_interest = {sym: min_open_interest for sym in syms}
+        self.update(force=True)
+
+    def update(self, force=False):
+        """行情或账户有变化时刷新缓存，未变化的合约不重新计算"""
+        if not self.enabled:
+            return
+        api = self.strategy.api
+        quotes = self.strategy.quotes
+        for sym, quote in quotes.items():
+            if not force and not api.is_changing(quote):
+                continue
+            if sym not in self._min_open_interest and quote.volume_multiple and 'pr' in quotes:
+                self._min_open_interest[sym] = min(
+                    10000 * quotes['pr'].volume_multiple / quote.volume_multiple, 10000)
+            self._alerts[sym] = quote_alerts(sym, quote, self.min_expire_days, self.limit_distance,
+                                             self._min_open_interest.get(sym))
+            self._margin_per_lot[sym] = quote.last_price * quote.volume_multiple * self.margin_rate.get(sym, 0)
+        account = self.strategy.account
+        if force or api.is_changing(account):
+            self._available = account.available
+
+    def alerts(self) -> dict:
+        """当前缓存的合约状态，{sym: [描述, ...]}"""
+        return {sym: [text for _, text in items] for sym, items in self._alerts.items()}
+
+    def check(self, orders):
+        """
+        检查一次三腿调仓 [(sym, volume, direction), ...]
+        全部放行时原样返回，超限时返回按网格单位缩量后的订单，拦截时返回 None 并记录 last_reason
+        """
+        self.last_reason = None
+        if not self.enabled:
+            return orders
+        position = self.strategy.position
+        min_unit = self.strategy.min_unit
+        ratio = 1.0
+        margin = 0.0
+        for sym, volume, direction in orders:
+            current = position[sym].net
+            signed = volume if direction == 'BUY' else -volume
+            increasing = abs(current + signed) > abs(current)
+            for level, text in self._alerts[sym]:
+                if level == BLOCK_ALL or increasing:
+                    return self._veto(text)
+            scheduler = self.strategy.scheduler
+            if increasing and scheduler is not None and scheduler.exhausted(self.strategy.symbols[sym]):
+                return self._veto(f"{sym}报单 / 撤单次数达到当日预算")
+            limit = self.max_position.get(sym)
+            if limit is not None and increasing and abs(current + signed) > limit:
+                room = max(limit - abs(current), 0) if current * signed >= 0 else limit + abs(current)
+                ratio = min(ratio, room / volume)
+            # 先平后开，只有超出反向持仓的部分占用保证金
+            opening = volume - min(volume, max(-current if signed > 0 else current, 0))
+            if opening > 0:
+                margin += opening * self._margin_per_lot[sym]
+        budget = self._available * (1 - self.margin_buffer)
+        if margin > 0 and margin > budget:
+            ratio = min(ratio, max(budget, 0) / margin)
+        if ratio >= 1:
+            return orders
+        return self._scale(orders, ratio, min_unit)
+
+    def _scale(self, orders, ratio, min_unit):
+        """按网格单位缩量，保持三腿比例；缩到不足一个单位时拦截"""
+        units = min(volume // abs(min_unit[sym]) for sym, volume, _ in orders)
+        allowed = math.floor(units * ratio)
+        if allowed <= 0:
+            return self._veto("超出持仓上限或可用保证金")
+        self.scaled += 1
+        cut = units - allowed
+        return [(sym, volume - cut * abs(min_unit[sym]), direction) for sym, volume, direction in orders]
+
+    def _veto(self, reason):
+        self.vetoes[reason] += 1
+        self.last_reason = reason
+        return None
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+import uuid
+
+import pandas as pd
+
+from strategy_runner import ConfigGridStrategy, symbols_for_month
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# 米筐品种代码与策略腿的对应关系
+PRODUCTS = {'pr': 'PR', 'ta': 'TA', 'eg': 'EG'}
+
+
+def load_dominant_contracts(cache_path=None, max_age_days=1.0, products=None) -> pd.DataFrame:
+    """
+    读取各品种每日主力合约（四位年月，如 2509），列为 pr / ta / eg
+    缓存不超过 max_age_days 天时直接读取缓存，否则用 MultiDominantAnalyzer 一次取数、并行分析全部品种并写回缓存；
+    rqdatac 不可用时退回到过期缓存，没有缓存时返回 None
+    """
+    cache_path = cache_path or os.path.join(ROOT, "logs", "dominant_contracts.csv")
+    products = products or PRODUCTS
+    fresh = os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < max_age_days * 86400
+    if not fresh:
+        try:
+            from RiceQuantDB import MultiDominantAnalyzer
+            dominant = MultiDominantAnalyzer(list(products.values())).get_dominant_contract(rank=0, start_date=None)
+            signal = dominant.rename(columns={code: sym for sym, code in products.items()}).sort_index()
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            signal.to_csv(cache_path)
+            return signal
+        except Exception as e:
+            # 数据源的任何错误都不应中断启动：退回到缓存，没有缓存时不换月
+            print(f"无法更新主力合约信号（{type(e).__name__}: {e}），使用缓存 {cache_path}")
+    if not os.path.exists(cache_path):
+        return None
+    return pd.read_csv(cache_path, index_col=0, dtype=str).sort_index()
+
+
+def last_position(settings) -> dict:
+    """读取策略日志目录下 position.csv 的最后一行，没有记录时返回 None"""
+    log_root = settings.get('log_root') or os.path.join(ROOT, "logs")
+    path = os.path.join(log_root, settings['name'], "position.csv")
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path)
+    return None if df.empty else df.iloc[-1].to_dict()
+
+
+def plan_rolls(strategies, signal: pd.DataFrame, driver='pr') -> list:
+    """
+    按最新主力合约为每个策略决定是否换月，返回 [(旧策略参数, 新策略参数), ...]
+    以 driver 腿（默认流动性最差的 pr）的主力月为准，主力月晚于策略月份时换到主力月；
+    配置中已有新月份的策略时持仓并入该策略，否则沿用旧策略的网格与手数生成新策略，
+    多个旧策略换到同一个未配置的月份时共用同一个新策略
+    迁移后新策略的持仓须与其网格一致，以下情况不换月（旧策略照常启动）并打印原因：
+    - 旧策略与新策略（或同时换入的其他旧策略）的 grid / min_unit 不同
+    - 同一新策略有多个旧策略带持仓换入，或新策略已有持仓时再换入持仓
+    """
+    if signal is None or signal.empty:
+        return []
+    latest = signal[driver].dropna()
+    if latest.empty:
+        return []
+    dominant = str(latest.iloc[-1])
+    by_month = {s['month']: s for s in strategies}
+    sources = [s for s in strategies if int(dominant) > int(s['month'])]
+    if not sources:
+        return []
+    new = by_month.get(dominant)
+    if new is None:
+        first = sources[0]
+        new = {**first, 'month': dominant, 'name': f"pr{dominant}Strategy",
+               'symbols': symbols_for_month(dominant, first.get('symbol_template'))}
+    reason = _roll_conflict(sources, new, dominant in by_month)
+    if reason:
+        print(f"不换月至 {dominant}：{reason}")
+        return []
+    return [(settings, new) for settings in sources]
+
+
+def _has_position(settings) -> bool:
+    p = last_position(settings)
+    return bool(p) and any(p[f"{s}_{d}"] for s in PRODUCTS for d in ('long', 'short'))
+
+
+def _roll_conflict(sources, new, configured) -> str:
+    """换入同一新策略的旧策略之间、以及与新策略之间的冲突原因，没有冲突时返回空字符串"""
+    for settings in sources:
+        for key in ('grid', 'min_unit'):
+            if settings[key] != new[key]:
+                return f"{settings['name']} 的 {key} 与 {new['name']} 不同，迁移后的持仓与网格不一致"
+    holders = [s['name'] for s in sources if _has_position(s)]
+    if len(holders) > 1:
+        return f"{'/'.join(holders)} 均有持仓，合并后超出 {new['name']} 网格的持仓单位"
+    if holders and configured and _has_position(new):
+        return f"{new['name']} 已有持仓，不能再并入 {holders[0]} 的持仓"
+    return ''
+
+
+async def migrate(api, old_settings, new_settings, auth=None):
+    """
+    用跨期价差单把旧月份策略的持仓移到新月份：每条腿先平旧月、紧接着开新月，按流动性从差到好依次执行
+    平仓成交记入旧策略、开仓成交记入新策略，两边使用同一个 trade_id，可分别被 merge_trade 合并为三腿一组
+    """
+    old = ConfigGridStrategy(old_settings, auth, api=api)
+    new = ConfigGridStrategy(new_settings, auth, api=api)
+    try:
+        api.wait_update()
+        legs = []
+        for sym, pos in old.position.items():
+            net = pos['long'] - pos['short']
+            if net != 0:
+                legs.append((sym, abs(net), 'SELL' if net > 0 else 'BUY'))
+        if not legs:
+            return None
+        if all(p['long'] == p['short'] == 0 for p in new.position.values()):
+            new.layer = old.layer
+        trade_id = f"roll-{uuid.uuid4()}"
+        # 价差方向以 pr 腿为准：平旧月与开新月方向相反
+        close_side = legs[0][2]
+        fee_close = old._calculate_fee(close_side)
+        fee_open = new._calculate_fee('SELL' if close_side == 'BUY' else 'BUY')
+        print(f"换月 {old.name} -> {new.name}：{legs}")
+        for sym, volume, close_direction in old.executor.sequence(legs):
+            open_direction = 'BUY' if close_direction == 'SELL' else 'SELL'
+            await old.place_orders(sym, volume, close_direction, fee_close, trade_id)
+            await new.place_orders(sym, volume, open_direction, fee_open, trade_id)
+        return trade_id
+    finally:
+        # 迁移用的临时策略与调用方共用 api，只停止记录线程等，不关闭 api
+        await old.stop(close_api=False)
+        await new.stop(close_api=False)
+
+
+def roll_strategies(strategies, roll_cfg: dict, auth, make_account) -> list:
+    """
+    启动前执行换月：有持仓的旧月份策略迁移到主力月，返回实际需要启动的策略列表
+    已换月的旧策略不再启动，避免其网格在临近交割的合约上重新开仓
+    """
+    signal = load_dominant_contracts(roll_cfg.get('cache'), roll_cfg.get('max_age_days', 1.0))
+    rolls = plan_rolls(strategies, signal, roll_cfg.get('driver', 'pr'))
+    if not rolls:
+        return strategies
+    pending = [(old, new) for old, new in rolls if _has_position(old)]
+    if pending:
+        from tqsdk import TqApi
+        api = TqApi(make_account(), auth)
+        try:
+            for old, new in pending:
+                asyncio.run(migrate(api, old, new, auth))
+        finally:
+            api.close()
+    rolled = {old['name'] for old, _ in rolls}
+    result = [s for s in strategies if s['name'] not in rolled]
+    names = {s['name'] for s in result}
+    for old, new in rolls:
+        print(f"策略 {old['name']} 已换月至 {new['month']}，不再启动")
+        if new['name'] not in names:
+            result.append(new)
+            names.add(new['name'])
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    from strategy_runner import load_config, resolve_strategies
+
+    parser = argparse.ArgumentParser(description="按主力合约信号检查需要换月的策略")
+    parser.add_argument("config", nargs="?", default=os.path.join(ROOT, "strategies.toml"))
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    roll_cfg = config.get('roll', {})
+    signal = load_dominant_contracts(roll_cfg.get('cache'), roll_cfg.get('max_age_days', 1.0))
+    rolls = plan_rolls(resolve_strategies(config), signal, roll_cfg.get('driver', 'pr'))
+    if not rolls:
+        print("没有需要换月的策略")
+    for old, new in rolls:
+        print(f"{old['name']} -> {new['name']}，旧持仓 {last_position(old)}")
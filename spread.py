@@ -0,0 +1,90 @@
+from operator import mul
+
+import numpy as np
+
+
+class SpreadLeg:
+    """
+    价差的一条腿
+    - key: 腿名称，与策略的 symbols / position / 日志列名一致（如 pr / ta / eg）
+    - product: 天勤合约前缀，如 CZCE.PR；month_digits 为合约代码中年月的位数（郑商所 3 位，大商所 4 位）
+    - coefficient: 加工费系数，正数腿买入价差时买入，负数腿买入价差时卖出
+    - volume_multiple / price_tick: 合约乘数与最小变动价位
+    - price_field: 离线分析（K线）取价字段
+    """
+
+    def __init__(self, key, product, coefficient, volume_multiple, price_tick, month_digits=3, price_field='close'):
+        self.key = key
+        self.product = product
+        self.coefficient = float(coefficient)
+        self.volume_multiple = volume_multiple
+        self.price_tick = price_tick
+        self.month_digits = month_digits
+        self.price_field = price_field
+
+    def symbol(self, month: str) -> str:
+        """四位年月对应的合约代码，如 2509 -> CZCE.PR509"""
+        return f"{self.product}{month[-self.month_digits:]}"
+
+
+class SpreadDefinition:
+    """
+    价差定义：加工费 = Σ 系数 × 腿价格
+    实盘、成交合并与离线分析都通过同一组系数计算：
+    批量计算按列向量化，实盘逐笔只有三个标量，用系数元组直接累加以避免数组构造开销
+    """
+
+    def __init__(self, name, legs):
+        self.name = name
+        self.legs = list(legs)
+        self.keys = [leg.key for leg in self.legs]
+        self.coefficients = tuple(leg.coefficient for leg in self.legs)
+        self.multipliers = {leg.key: leg.volume_multiple for leg in self.legs}
+
+    def coefficient(self, key) -> float:
+        return self.coefficients[self.keys.index(key)]
+
+    def symbols(self, month: str) -> dict:
+        return {leg.key: leg.symbol(month) for leg in self.legs}
+
+    def price_fields(self, side: str) -> tuple:
+        """
+        按价差方向各腿取价的盘口字段（按 keys 顺序）：
+        买入价差时正系数腿取卖一、负系数腿取买一，卖出价差相反
+        """
+        lift = side == 'BUY'
+        return tuple('ask_price1' if (c > 0) == lift else 'bid_price1' for c in self.coefficients)
+
+    def fee(self, prices) -> float:
+        """单组价格（按 keys 顺序）的加工费"""
+        return sum(map(mul, self.coefficients, prices))
+
+    def fees(self, prices) -> np.ndarray:
+        """
+        批量计算：prices 为 (n, 腿数) 的矩阵或按 keys 顺序取列的 DataFrame
+        按腿逐列累加而不用 prices @ vector：矩阵乘法的求和顺序（及 FMA）会让恰好落在 0.005 的结果
+        在保留两位小数时与逐笔公式相差一分
+        """
+        prices = np.asarray(prices, dtype=float)
+        total = np.zeros(len(prices))
+        for i, coef in enumerate(self.coefficients):
+            total += coef * prices[:, i]
+        return total
+
+    def frame_fees(self, df, template='{key}') -> np.ndarray:
+        """按列名模板从 DataFrame 取各腿价格批量计算，如 template='{key}_quote'"""
+        return self.fees(df[[template.format(key=key) for key in self.keys]].to_numpy(dtype=float))
+
+
+# 瓶片加工费 = pr - 0.857 * ta - 0.335 * eg
+PR_SPREAD = SpreadDefinition('pr', [
+    SpreadLeg('pr', 'CZCE.PR', 1.0, 15, 2),
+    SpreadLeg('ta', 'CZCE.TA', -0.857, 5, 2),
+    SpreadLeg('eg', 'DCE.eg', -0.335, 10, 1, month_digits=4),
+])
+# 短纤加工费 = pf - 0.857 * ta - 0.335 * eg
+PF_SPREAD = SpreadDefinition('pf', [
+    SpreadLeg('pf', 'CZCE.PF', 1.0, 5, 2),
+    SpreadLeg('ta', 'CZCE.TA', -0.857, 5, 2),
+    SpreadLeg('eg', 'DCE.eg', -0.335, 10, 1, month_digits=4),
+])
@@ -0,0 +1,60 @@
+class LegPosition:
+    """单腿持仓，固定 long / short 两个字段；保留 position[sym]['long'] 的下标写法与 dict(pos) 转换"""
+    __slots__ = ('long', 'short')
+
+    def __init__(self, long=0, short=0):
+        self.long = long
+        self.short = short
+
+    @property
+    def net(self):
+        return self.long - self.short
+
+    def keys(self):
+        return self.__slots__
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __repr__(self):
+        return f"LegPosition(long={self.long}, short={self.short})"
+
+
+class LegBook:
+    """
+    按价差腿顺序排列的定长策略状态：每条腿的单位手数、持仓与行情在构造时按下标对齐，
+    每次行情的取价、加工费与调仓计算只按下标遍历定长元组，不再按腿名查字典、构造嵌套 dict
+    持仓与行情对象与 strategy.position / strategy.quotes 共用，两边的修改互相可见
+    """
+    __slots__ = ('keys', 'index', 'units', 'positions', 'quotes', '_fields')
+
+    def __init__(self, spread, min_unit, position, quotes):
+        self.keys = tuple(spread.keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.units = tuple(min_unit[key] for key in self.keys)
+        self.positions = tuple(position[key] for key in self.keys)
+        self.quotes = tuple(quotes[key] for key in self.keys)
+        self._fields = {side: spread.price_fields(side) for side in ('BUY', 'SELL')}
+
+    def take_prices(self, side) -> list:
+        """按价差方向取各腿对手价（按 keys 顺序）"""
+        return list(map(getattr, self.quotes, self._fields[side]))
+
+    def rebalance(self, units):
+        """
+        目标持仓单位数对应的三腿调仓 [(sym, volume, direction), ...]
+        任一腿无需调整时返回 None（视为无需调整持仓）
+        """
+        orders = []
+        for key, unit, pos in zip(self.keys, self.units, self.positions):
+            delta = unit * units - (pos.long - pos.short)
+            if delta > 0:
+                orders.append((key, delta, 'BUY'))
+            elif delta == 0:
+                return None
+            else:
+                orders.append((key, -delta, 'SELL'))
+        return orders
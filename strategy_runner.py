@@ -0,0 +1,268 @@
+import asyncio
+import os
+import threading
+import tomllib
+from getpass import getpass
+
+from tqsdk import TqApi, TqAuth, TqAccount, TqKq
+
+from base_strategy import BaseGridStrategy
+from grid_sweep import candidate_grid_settings
+from order_scheduler import OrderScheduler
+from portfolio import Portfolio
+from quote_bus import BusApi, QuoteBusReader
+from trading_calendar import TradingCalendar
+
+# 合约代码模板：{m3} 为月份后三位（郑商所），{m4} 为四位年月（大商所）
+DEFAULT_SYMBOL_TEMPLATE = {
+    'pr': "CZCE.PR{m3}",
+    'ta': "CZCE.TA{m3}",
+    'eg': "DCE.eg{m4}",
+}
+GRID_KEYS = ('layer', 'min', 'max', 'up', 'down')
+
+
+def load_config(path) -> dict:
+    """读取 TOML / YAML 策略配置"""
+    if str(path).endswith(('.yaml', '.yml')):
+        import yaml
+        with open(path, encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def symbols_for_month(month: str, template=None) -> dict:
+    """按合约月份生成三腿合约代码，如 2507 -> CZCE.PR507 / CZCE.TA507 / DCE.eg2507"""
+    template = template or DEFAULT_SYMBOL_TEMPLATE
+    return {sym: fmt.format(m3=month[-3:], m4=month) for sym, fmt in template.items()}
+
+
+def build_grid(grid) -> list:
+    """网格既可逐层列出，也可用 center/width/ladder_above/ladder_below 生成（同 grid_sweep）"""
+    if isinstance(grid, dict):
+        return candidate_grid_settings({
+            'center': float(grid['center']),
+            'width': float(grid['width']),
+            'ladder_above': tuple(grid['ladder_above']),
+            'ladder_below': tuple(grid['ladder_below']),
+        })
+    return [{k: (float(g[k]) if k in ('min', 'max') else g[k]) for k in GRID_KEYS} for g in grid]
+
+
+def resolve_strategies(config: dict) -> list:
+    """
+    校验配置并展开为每个策略的完整参数，配置有误时抛出 ValueError 并列出全部问题
+    每个 [[strategy]] 继承 [defaults] 中未覆盖的字段
+    """
+    defaults = config.get('defaults', {})
+    errors = []
+    resolved = []
+    names = set()
+    for i, raw in enumerate(config.get('strategy', [])):
+        item = {**defaults, **raw}
+        if not item.get('enabled', True):
+            continue
+        where = f"strategy[{i}]"
+        month = str(item.get('month', ''))
+        if len(month) != 4 or not month.isdigit():
+            errors.append(f"{where}: month 必须为四位年月，如 2507，当前为 {month!r}")
+            continue
+        name = item.get('name') or f"pr{month}Strategy"
+        if name in names:
+            errors.append(f"{where}: 策略名 {name} 重复")
+        names.add(name)
+
+        symbols = item.get('symbols') or symbols_for_month(month, item.get('symbol_template'))
+        min_unit = item.get('min_unit', {})
+        if set(min_unit) != set(symbols) or not all(isinstance(v, int) for v in min_unit.values()):
+            errors.append(f"{where}: min_unit 必须为 {sorted(symbols)} 的整数手数")
+
+        try:
+            grid = build_grid(item.get('grid', []))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(f"{where}: grid 格式错误 {e!r}")
+            continue
+        if not grid:
+            errors.append(f"{where}: grid 不能为空")
+            continue
+        grid = sorted(grid, key=lambda g: g['min'])
+        layers = [g['layer'] for g in grid]
+        if len(set(layers)) != len(layers):
+            errors.append(f"{where}: grid 层号重复")
+        for a, b in zip(grid[:-1], grid[1:]):
+            if a['max'] != b['min']:
+                errors.append(f"{where}: 第 {a['layer']} 层与第 {b['layer']} 层区间不连续")
+            if a['layer'] >= b['layer']:
+                errors.append(f"{where}: 层号应随区间递增（第 {a['layer']} 层）")
+        if any(g['min'] >= g['max'] for g in grid):
+            errors.append(f"{where}: grid 存在 min >= max 的区间")
+
+        resolved.append({**item, 'name': name, 'month': month, 'symbols': symbols,
+                         'grid': grid, 'min_unit': dict(min_unit)})
+    if errors:
+        raise ValueError("策略配置校验失败：\n" + "\n".join(errors))
+    return resolved
+
+
+class ConfigGridStrategy(BaseGridStrategy):
+    """由配置驱动的网格策略：每个合约月份只需在 strategies.toml 中声明一份配置"""
+
+    def __init__(self, settings: dict, auth: TqAuth, account=None, api=None, log_root=None):
+        self.settings = settings
+        super().__init__(auth, account, api=api, log_root=log_root or settings.get('log_root'))
+
+    def _get_name(self) -> str:
+        return self.settings['name']
+
+    def _get_symbols(self) -> dict:
+        return dict(self.settings['symbols'])
+
+    def _get_grid_settings(self) -> list:
+        return [dict(g) for g in self.settings['grid']]
+
+    def _get_min_unit(self) -> dict:
+        return dict(self.settings['min_unit'])
+
+    def _get_guard_settings(self) -> dict:
+        return dict(self.settings.get('quote_guard', {}))
+
+    def _get_hysteresis_settings(self) -> dict:
+        return dict(self.settings.get('hysteresis', {}))
+
+    def _get_execution_settings(self) -> dict:
+        return dict(self.settings.get('execution', {}))
+
+    def _get_slicing_settings(self) -> dict:
+        return dict(self.settings.get('slicing', {}))
+
+    def _get_latency_settings(self) -> dict:
+        return dict(self.settings.get('latency', {}))
+
+    def _get_risk_settings(self) -> dict:
+        return dict(self.settings.get('risk', {}))
+
+    def _get_reconcile_settings(self) -> dict:
+        return dict(self.settings.get('reconcile', {}))
+
+    def _get_recorder_settings(self) -> dict:
+        return dict(self.settings.get('recorder', {}))
+
+    def _get_fee_stats_settings(self) -> dict:
+        return dict(self.settings.get('fee_stats', {}))
+
+    def _get_recovery_settings(self) -> dict:
+        return dict(self.settings.get('recovery', {}))
+
+    def _get_commission_settings(self) -> dict:
+        return dict(self.settings.get('commission', {}))
+
+
+def _credential(section: dict, key: str, prompt: str, secret=False) -> str:
+    """优先读取配置中 {key}_env 指定的环境变量，其次是配置值，最后交互输入"""
+    env = section.get(f"{key}_env")
+    if env and os.environ.get(env):
+        return os.environ[env]
+    if section.get(key):
+        return str(section[key])
+    return getpass(prompt) if secret else input(prompt)
+
+
+def create_auth_and_account(config: dict):
+    """按配置创建天勤账号与交易账户，整个进程只询问一次"""
+    auth_cfg = config.get('auth', {})
+    auth = TqAuth(_credential(auth_cfg, 'user', "请输入天勤账号: "),
+                  _credential(auth_cfg, 'password', "请输入天勤密码: ", secret=True))
+    account_cfg = config.get('account', {})
+    if account_cfg.get('type', 'kq') == 'real':
+        broker_id = _credential(account_cfg, 'broker_id', "请输入期货公司代码: ")
+        account_id = _credential(account_cfg, 'account_id', "请输入账号: ")
+        password = _credential(account_cfg, 'password', "请输入密码: ", secret=True)
+
+        def make_account():
+            return TqAccount(broker_id, account_id, password)
+    else:
+        def make_account():
+            return TqKq()
+    return auth, make_account
+
+
+def run_strategies(config_path, only=None):
+    """
+    在同一进程中启动配置里的全部策略
+    TqApi 不能跨线程使用，每个策略在独立线程中创建自己的 TqApi 与事件循环
+    [quote_bus] 开启时各策略从行情网关（python quote_bus.py）的共享内存读取行情，不再各自订阅
+    所有策略注册到同一个 Portfolio，主线程定期把汇总持仓写入 logs/portfolio.csv
+    所有策略共用同一个 OrderScheduler 限速报单、撤单，当日计数随持仓快照写入 logs/order_counts.csv；
+    计数按交易日切换，交易日历在启动时用临时的行情连接加载一次
+    """
+    config = load_config(config_path)
+    strategies = resolve_strategies(config)
+    if only:
+        strategies = [s for s in strategies if s['name'] in only or s['month'] in only]
+    if not strategies:
+        print("没有需要启动的策略")
+        return
+    auth, make_account = create_auth_and_account(config)
+    if config.get('roll', {}).get('enabled'):
+        from roll import roll_strategies
+        strategies = roll_strategies(strategies, config['roll'], auth, make_account)
+
+    portfolio = Portfolio(**config.get('portfolio', {}))
+    logs = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    calendar_api = TqApi(auth=auth)
+    try:
+        calendar = TradingCalendar.load(calendar_api)
+    finally:
+        calendar_api.close()
+    scheduler = OrderScheduler(**config.get('order_scheduler', {}), counter_file=os.path.join(logs, "order_counts.csv"),
+                               calendar=calendar)
+    bus_cfg = config.get('quote_bus', {})
+
+    def worker(settings):
+        async def main():
+            account = make_account()
+            api = None
+            if bus_cfg.get('enabled'):
+                # 行情取自 quote_bus 网关写入的共享内存，TqApi 只用于交易
+                api = BusApi(TqApi(account, auth), QuoteBusReader(bus_cfg.get('path')),
+                             bus_cfg.get('poll_interval', 0.002))
+            strategy = ConfigGridStrategy(settings, auth, account, api=api)
+            portfolio.register(strategy)
+            scheduler.register(strategy)
+            try:
+                await strategy.run()
+            finally:
+                await strategy.stop()
+        try:
+            asyncio.run(main())
+        except Exception as e:
+            print(f"策略 {settings['name']} 退出，异常类型: {type(e)}，信息：{str(e)}")
+
+    threads = [threading.Thread(target=worker, args=(s,), name=s['name'], daemon=True) for s in strategies]
+    for t in threads:
+        print(f"启动策略 {t.name}")
+        t.start()
+    snapshot = os.path.join(logs, "portfolio.csv")
+    os.makedirs(logs, exist_ok=True)
+    while any(t.is_alive() for t in threads):
+        next(t for t in threads if t.is_alive()).join(portfolio.snapshot_interval)
+        if portfolio.strategies:
+            portfolio.save(snapshot)
+        scheduler.save()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="按配置文件启动网格策略")
+    parser.add_argument("config", nargs="?", default=os.path.join(os.path.dirname(__file__), "strategies.toml"))
+    parser.add_argument("--only", nargs="*", help="只启动指定策略名或合约月份")
+    parser.add_argument("--check", action="store_true", help="只校验配置并打印展开结果")
+    args = parser.parse_args()
+
+    if args.check:
+        for s in resolve_strategies(load_config(args.config)):
+            print(f"{s['name']}: {s['symbols']} min_unit={s['min_unit']} 共 {len(s['grid'])} 层")
+    else:
+        run_strategies(args.config, args.only)
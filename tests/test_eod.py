@@ -0,0 +1,25 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+
+from benchmark import ROOT
+from eod import run_eod
+from trading_calendar import TradingCalendar
+
+
+def test_empty_first_merge(tmp_path):
+    """第一个交易文件没有完整交易组时不能写出没有表头的 merged_data.csv"""
+    log_path = tmp_path / "pr2505Strategy"
+    log_path.mkdir()
+    for path in glob.glob(os.path.join(ROOT, "2505*_trade.csv")):
+        shutil.copy(path, log_path)
+    calendar = TradingCalendar(pd.bdate_range('2025-01-01', '2025-12-31'))
+
+    summary = run_eod(str(tmp_path), workers=1, calendar=calendar)
+    assert (summary['error'] == '').all()
+    assert summary['profit_rows'].iloc[0] > 0
+    merged = pd.read_csv(log_path / "merged_data.csv")
+    assert 'flag' in merged.columns
+    assert len(merged) == summary['merged_rows'].iloc[0]
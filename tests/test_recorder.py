@@ -0,0 +1,25 @@
+import glob
+import os
+from functools import partial
+
+import numpy as np
+
+from backtest import Backtester
+from benchmark import ROOT, synthetic_quotes
+from recorder import load_ticks
+from strategy_runner import ConfigGridStrategy, load_config, resolve_strategies
+
+
+def test_rebalance_tick_is_recorded(tmp_path):
+    """下单期间 _wait_update 的盘口记录不能覆盖触发换层那次计算的记录"""
+    settings = resolve_strategies(load_config(os.path.join(ROOT, "strategies.toml")))[0]
+    settings = {**settings, 'recorder': {'enabled': True, 'flush_interval': 0.05}}
+    summary = Backtester(partial(ConfigGridStrategy, settings), synthetic_quotes(3000, seed=1),
+                         output_dir=str(tmp_path)).run()
+    assert summary['orders'] > 0
+
+    ticks = load_ticks(glob.glob(os.path.join(str(tmp_path), "*", "ticks"))[0])
+    changed = ticks[ticks['layer_before'] != ticks['layer']]
+    assert len(changed) > 0
+    assert not np.isnan(changed['fee_buy']).any()
+    assert ticks['datetime'].is_monotonic_increasing
@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import pandas as pd
+
+from benchmark import make_strategy
+from profit import merge_trade
+
+COLUMNS = ['trade_id', 'timestamp', 'contract', 'action', 'price', 'volume', 'offset', 'commission', 'fee',
+           'quote', 'pr_long', 'pr_short', 'ta_long', 'ta_short', 'eg_long', 'eg_short', 'flag']
+
+
+def test_close_without_open_is_completed(tmp_path):
+    """价差由 -1 单位换到 +1 单位，eg 平仓后、开仓前进程退出：5 条成交，各腿都有记录"""
+    strategy = make_strategy(str(tmp_path))
+    unit = {sym: abs(u) for sym, u in strategy.min_unit.items()}
+    contract = {sym: c.split('.')[1] for sym, c in strategy.symbols.items()}
+    trade_file = os.path.join(strategy.log_path, "250430_trade.csv")
+    rows = [
+        ('pr', 'BUY', 'CLOSE', 6000), ('pr', 'BUY', 'OPEN', 6000),
+        ('ta', 'SELL', 'CLOSE', 4500), ('ta', 'SELL', 'OPEN', 4500),
+        ('eg', 'SELL', 'CLOSE', 4300),
+    ]
+    pd.DataFrame([['abc', f'2025-04-30 10:00:0{i}.000000', contract[sym], action, price, unit[sym], offset,
+                   1.0, 420, price, 0, 0, 0, 0, 0, 0, 1]
+                  for i, (sym, action, offset, price) in enumerate(rows)], columns=COLUMNS).to_csv(trade_file,
+                                                                                                   index=False)
+    with open(strategy.position_file, 'a') as f:
+        f.write(f"2025-04-30 09:00:00.000000,0,{unit['pr']},{unit['ta']},0,{unit['eg']},0,-1\n")
+
+    strategy = make_strategy(str(tmp_path))
+    api = strategy.api
+    api.get_position(strategy.symbols['pr']).pos_long = unit['pr']
+    api.get_position(strategy.symbols['ta']).pos_short = unit['ta']
+
+    groups = strategy.recovery.scan()
+    assert [g['trade_id'] for g in groups] == ['abc']
+    assert groups[0]['done'] == ['pr', 'ta']
+
+    assert asyncio.run(strategy.recovery.recover()) == 1
+    assert strategy.position['eg'].short == unit['eg']
+    assert len(merge_trade(trade_file)) == 2  # 平仓、开仓各一组
+    assert strategy.recovery.scan() == []
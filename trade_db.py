@@ -0,0 +1,179 @@
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(ROOT, "logs", "trades.db")
+
+# 交易文件中的列（flag 是 merge_trade 的处理标记，不属于成交本身，不入库）
+COLUMNS = {
+    'trade_id': 'TEXT', 'timestamp': 'TEXT', 'contract': 'TEXT', 'action': 'TEXT',
+    'price': 'REAL', 'volume': 'INTEGER', 'offset': 'TEXT', 'commission': 'REAL', 'fee': 'REAL', 'quote': 'REAL',
+    'pr_long': 'INTEGER', 'pr_short': 'INTEGER', 'ta_long': 'INTEGER', 'ta_short': 'INTEGER',
+    'eg_long': 'INTEGER', 'eg_short': 'INTEGER',
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trades (
+    strategy TEXT NOT NULL,
+    file TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    trading_day TEXT NOT NULL,
+    {', '.join(f'"{name}" {kind}' for name, kind in COLUMNS.items())},
+    PRIMARY KEY (strategy, file, row)
+);
+CREATE INDEX IF NOT EXISTS trades_trade_id ON trades (trade_id);
+CREATE INDEX IF NOT EXISTS trades_contract_time ON trades (contract COLLATE NOCASE, timestamp);
+CREATE INDEX IF NOT EXISTS trades_offset_time ON trades ("offset", timestamp);
+CREATE INDEX IF NOT EXISTS trades_time ON trades (timestamp);
+CREATE TABLE IF NOT EXISTS journal (
+    strategy TEXT NOT NULL,
+    file TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (strategy, file)
+);
+"""
+
+
+class TradeDB:
+    """
+    跨交易日的成交数据库（SQLite）：按策略目录下的 YYMMDD_trade.csv 增量入库，
+    对 trade_id、合约 + 时间、开平 + 时间、时间建索引，查询不再逐个打开交易文件
+    - sync：只读取交易文件中上次入库之后追加的行（journal 表记录每个文件已入库的行数）
+    - legs / fills / incomplete：供利润计算、监控界面与临时分析使用的查询，返回 DataFrame
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # 入库
+    def sync(self, log_root=None) -> int:
+        """同步日志根目录下全部策略的交易文件，返回新入库的行数"""
+        log_root = Path(log_root or os.path.join(ROOT, "logs"))
+        return sum(self.sync_strategy(d) for d in sorted({p.parent for p in log_root.glob("*/*_trade.csv")}))
+
+    def sync_strategy(self, log_path) -> int:
+        log_path = Path(log_path)
+        strategy = log_path.name
+        done = dict(((f, (rows, size)) for f, rows, size in self.conn.execute(
+            "SELECT file, rows, size FROM journal WHERE strategy = ?", (strategy,))))
+        added = 0
+        with self.conn:
+            for trade_file in sorted(log_path.glob("*_trade.csv")):
+                rows, size = done.get(trade_file.name, (0, 0))
+                current = trade_file.stat().st_size
+                if current == size:
+                    continue
+                if current < size:
+                    # 文件被截断或重写，整个文件重新入库
+                    self.conn.execute("DELETE FROM trades WHERE strategy = ? AND file = ?",
+                                      (strategy, trade_file.name))
+                    rows = 0
+                added += self._ingest(strategy, trade_file, rows)
+        return added
+
+    def _ingest(self, strategy, trade_file, skip) -> int:
+        df = pd.read_csv(trade_file, skiprows=range(1, skip + 1), dtype={'trade_id': str})
+        day = trade_file.name.split('_')[0]
+        trading_day = f"20{day[:2]}-{day[2:4]}-{day[4:6]}"
+        if not df.empty:
+            df = df.reindex(columns=list(COLUMNS))
+            df.insert(0, 'trading_day', trading_day)
+            df.insert(0, 'row', range(skip + 1, skip + 1 + len(df)))
+            df.insert(0, 'file', trade_file.name)
+            df.insert(0, 'strategy', strategy)
+            names = ', '.join(f'"{c}"' for c in df.columns)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO trades ({names}) VALUES ({', '.join('?' * len(df.columns))})",
+                df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+        self.conn.execute("INSERT OR REPLACE INTO journal VALUES (?, ?, ?, ?)",
+                          (strategy, trade_file.name, skip + len(df), trade_file.stat().st_size))
+        return len(df)
+
+    # 查询
+    def query(self, sql, params=()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def legs(self, trade_id, splits=True) -> pd.DataFrame:
+        """一笔交易的全部腿；splits 时包含拆单后的子组（trade_id-1、trade_id-2 ...）"""
+        if splits:
+            # 范围条件可以走 trade_id 索引，LIKE 前缀匹配默认不走索引
+            return self.query("SELECT * FROM trades WHERE trade_id = ? OR (trade_id >= ? AND trade_id < ?) "
+                              "ORDER BY strategy, timestamp, row", (trade_id, f"{trade_id}-", f"{trade_id}."))
+        return self.query("SELECT * FROM trades WHERE trade_id = ? ORDER BY strategy, timestamp, row", (trade_id,))
+
+    def fills(self, strategy=None, contract=None, offset=None, action=None, start=None, end=None) -> pd.DataFrame:
+        """
+        按条件筛选成交，条件为 None 时不限制；合约代码不区分大小写（郑商所 PR509、大商所 eg2509）
+        start / end 为时间下限（含）与上限（不含），可以是日期字符串或 datetime
+        """
+        clauses, params = [], []
+        for column, value in (('strategy', strategy), ('offset', offset), ('action', action)):
+            if value is not None:
+                clauses.append(f'"{column}" = ?')
+                params.append(value)
+        if contract is not None:
+            clauses.append("contract = ? COLLATE NOCASE")
+            params.append(contract)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(_timestamp(end))
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self.query(f"SELECT * FROM trades {where}ORDER BY timestamp, row", params)
+
+    def incomplete(self, strategy=None, legs=3) -> pd.DataFrame:
+        """腿数不完整的交易组（不是 legs 或 2 * legs 条成交）：trade_id、策略、腿数与最后成交时间"""
+        where, params = ("WHERE strategy = ? ", (strategy,)) if strategy else ("", ())
+        return self.query(
+            f"SELECT trade_id, strategy, COUNT(*) AS legs, MAX(timestamp) AS timestamp FROM trades {where}"
+            f"GROUP BY strategy, trade_id HAVING COUNT(*) NOT IN (?, ?) ORDER BY timestamp",
+            (*params, legs, 2 * legs))
+
+
+def _timestamp(value) -> str:
+    return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="同步交易文件到成交数据库并查询")
+    parser.add_argument("--db", default=DEFAULT_PATH)
+    parser.add_argument("--log-root", default=os.path.join(ROOT, "logs"))
+    parser.add_argument("--trade-id", help="查询一笔交易的全部腿")
+    parser.add_argument("--strategy")
+    parser.add_argument("--contract")
+    parser.add_argument("--offset", choices=['OPEN', 'CLOSE'])
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--incomplete", action="store_true", help="列出腿数不完整的交易组")
+    args = parser.parse_args()
+    with TradeDB(args.db) as db:
+        print(f"新入库 {db.sync(args.log_root)} 条成交")
+        if args.trade_id:
+            result = db.legs(args.trade_id)
+        elif args.incomplete:
+            result = db.incomplete(args.strategy)
+        else:
+            result = db.fills(args.strategy, args.contract, args.offset, start=args.start, end=args.end)
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(result.to_string(index=False))
@@ -0,0 +1,135 @@
+import bisect
+import os
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE = os.path.join(ROOT, "logs", "trading_calendar.csv")
+
+# 晚于 NIGHT_START 的时间属于下一个交易日的夜盘；早于 NIGHT_END 的凌晨时间属于前一晚夜盘
+NIGHT_START = time(20, 0)
+NIGHT_END = time(3, 0)
+# 已公布节假日之后按周一至周五近似延伸的天数，年末夜盘可以映射到下一年的第一个交易日
+PAD_DAYS = 31
+
+
+class TradingCalendar:
+    """
+    交易日历：由天勤 get_trading_calendar 生成并缓存到本地 csv（date, trading）
+    构造时为区间内每个自然日预先算好“当日或之后第一个交易日”和“之后第一个交易日”，
+    trading_day(ts) 把任意时间戳映射到所属交易日只需两次字典查找：
+    - 夜盘（NIGHT_START 之后）属于下一个交易日，周五夜盘属于下周一，节前无夜盘也不影响映射
+    - 凌晨（NIGHT_END 之前）属于前一自然日夜盘对应的交易日
+    - 其余时间属于当日，非交易日顺延到下一个交易日
+    """
+
+    def __init__(self, trading_days):
+        self.days = sorted({pd.Timestamp(d).date() for d in trading_days})
+        if not self.days:
+            raise ValueError("交易日历为空")
+        self._set = set(self.days)
+        self._on_or_after = {}
+        self._after = {}
+        following = None
+        d = self.days[-1]
+        while d >= self.days[0]:
+            self._after[d] = following
+            if d in self._set:
+                following = d
+            self._on_or_after[d] = following
+            d -= timedelta(days=1)
+
+    @classmethod
+    def load(cls, api=None, cache_path=None, start=date(2020, 1, 1), end=None, max_age_days=7.0):
+        """
+        读取交易日历：本地缓存未过期且覆盖所需区间时直接使用，否则用 api 重新获取并写回缓存
+        - end 缺省为当年年末：天勤只能查询到已公布节假日的年份，更晚的 end_dt 会报错
+        - 获取失败或没有 api 时使用（可能过期的）缓存；没有缓存时按周一至周五近似（不含节假日）并给出提示
+        已知区间之后按周一至周五近似延伸 PAD_DAYS 天
+        """
+        cache_path = cache_path or DEFAULT_CACHE
+        end = end or date(date.today().year, 12, 31)
+        cached = None
+        if os.path.exists(cache_path):
+            cached = pd.read_csv(cache_path)
+            fresh = _time.time() - os.path.getmtime(cache_path) < max_age_days * 86400
+            covered = not cached.empty and cached['date'].min() <= str(start) and cached['date'].max() >= str(end)
+            if (fresh and covered) or api is None:
+                return cls._padded(cached)
+        if api is not None:
+            try:
+                df = api.get_trading_calendar(start_dt=start, end_dt=end)
+            except Exception as e:
+                print(f"获取交易日历失败：{e}")
+            else:
+                df = df[['date', 'trading']]
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                df.to_csv(cache_path, index=False)
+                return cls._padded(df)
+            if cached is not None:
+                print(f"使用交易日历缓存 {cache_path}")
+                return cls._padded(cached)
+        print(f"未找到交易日历缓存 {cache_path}，按周一至周五近似交易日")
+        return cls(pd.bdate_range(start, end + timedelta(days=PAD_DAYS)))
+
+    @classmethod
+    def _padded(cls, df):
+        days = pd.to_datetime(df.loc[df['trading'].astype(bool), 'date'])
+        last = pd.to_datetime(df['date']).max()
+        pad = pd.bdate_range(last + timedelta(days=1), last + timedelta(days=PAD_DAYS))
+        return cls(list(days) + list(pad))
+
+    def is_trading_day(self, d) -> bool:
+        return _as_date(d) in self._set
+
+    def next_trading_day(self, d) -> date:
+        """严格晚于 d 的第一个交易日"""
+        d = _as_date(d)
+        result = self._after.get(d)
+        if result is None:
+            i = bisect.bisect_right(self.days, d)
+            result = self.days[i] if i < len(self.days) else None
+        return result
+
+    def previous_trading_day(self, d) -> date:
+        """严格早于 d 的最后一个交易日"""
+        i = bisect.bisect_left(self.days, _as_date(d))
+        return self.days[i - 1] if i > 0 else None
+
+    def trading_day(self, ts) -> date:
+        """时间戳所属交易日"""
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts)
+        d, t = ts.date(), ts.time()
+        if t >= NIGHT_START:
+            return self.next_trading_day(d)
+        if t < NIGHT_END:
+            d -= timedelta(days=1)
+            return self.next_trading_day(d)
+        result = self._on_or_after.get(d)
+        if result is None:
+            i = bisect.bisect_left(self.days, d)
+            result = self.days[i] if i < len(self.days) else None
+        return result
+
+    def trading_days_of(self, timestamps: pd.Series) -> pd.Series:
+        """批量映射时间戳到交易日：所属交易日只取决于日期与小时，每个整点只计算一次"""
+        hours = pd.to_datetime(timestamps).dt.floor('h')
+        mapping = {h: self.trading_day(h) for h in hours.unique()}
+        return hours.map(mapping)
+
+    def trading_days(self, start, end) -> list:
+        """区间 [start, end] 内的交易日"""
+        lo = bisect.bisect_left(self.days, _as_date(start))
+        hi = bisect.bisect_right(self.days, _as_date(end))
+        return self.days[lo:hi]
+
+
+def _as_date(d) -> date:
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return pd.Timestamp(d).date()